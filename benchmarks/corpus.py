@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Synthetic schema corpora.
+
+Every generator returns a list of ``(schema, uri)`` tuples. The schemas of a
+corpus are compatible with each other, so the whole corpus can be validated
+one schema after another without errors. Generators are deterministic, a
+given size always builds the same corpus.
+"""
+
+import random
+
+TYPES = ('string', 'integer', 'number', 'boolean')
+"""Types of the leaf fields."""
+
+
+def _leaf(rand):
+    """Return the schema of a leaf field with a random type."""
+    return {'type': rand.choice(TYPES)}
+
+
+def _uri(name, index):
+    """Return the URI of a schema of a corpus."""
+    return 'http://example.org/{0}/v{1}.json'.format(name, index)
+
+
+def wide(size, versions=3):
+    """Build schemas with many properties on two levels.
+
+    :param size: Number of properties of the root and of every object field.
+    :param versions: Number of schemas.
+    """
+    rand = random.Random(size)
+    properties = {}
+    for index in range(size):
+        properties['field_{0}'.format(index)] = {
+            'type': 'object',
+            'properties': dict(
+                ('sub_{0}'.format(sub), _leaf(rand)) for sub in range(size)
+            )
+        }
+    schema = {'type': 'object', 'properties': properties}
+    return [(schema, _uri('wide', index)) for index in range(versions)]
+
+
+def deep(size, versions=3):
+    """Build schemas with nested objects.
+
+    :param size: Depth of the nested objects.
+    :param versions: Number of schemas.
+    """
+    rand = random.Random(size)
+    schema = _leaf(rand)
+    for level in reversed(range(size)):
+        schema = {
+            'type': 'object',
+            'properties': {
+                'level_{0}'.format(level): schema,
+                'value_{0}'.format(level): _leaf(rand),
+            }
+        }
+    return [(schema, _uri('deep', index)) for index in range(versions)]
+
+
+def ref_heavy(size, versions=3):
+    """Build schemas where most fields are references to definitions.
+
+    :param size: Number of definitions, each referenced from several fields
+                 and referencing the previous definition.
+    :param versions: Number of schemas.
+    """
+    rand = random.Random(size)
+    definitions = {}
+    properties = {}
+    for index in range(size):
+        definition = {
+            'type': 'object',
+            'properties': {'value': _leaf(rand)}
+        }
+        if index:
+            definition['properties']['previous'] = {
+                '$ref': '#/definitions/def_{0}'.format(index - 1)
+            }
+        definitions['def_{0}'.format(index)] = definition
+        for copy in range(3):
+            properties['field_{0}_{1}'.format(index, copy)] = {
+                '$ref': '#/definitions/def_{0}'.format(index)
+            }
+    schema = {
+        'type': 'object',
+        'definitions': definitions,
+        'properties': properties,
+    }
+    return [(schema, _uri('ref_heavy', index)) for index in range(versions)]
+
+
+def combinators(size, versions=3):
+    """Build schemas made of ``allOf``, ``anyOf`` and ``oneOf`` branches.
+
+    :param size: Number of fields, each described by three combinators of
+                 three branches.
+    :param versions: Number of schemas.
+    """
+    rand = random.Random(size)
+    properties = {}
+    for index in range(size):
+        field_type = rand.choice(TYPES)
+        properties['field_{0}'.format(index)] = dict(
+            (keyword, [{'type': field_type} for _ in range(3)])
+            for keyword in ('allOf', 'anyOf', 'oneOf')
+        )
+    schema = {
+        'type': 'object',
+        'properties': properties,
+        'anyOf': [
+            {'properties': {'branch_{0}'.format(index): _leaf(rand)}}
+            for index in range(size)
+        ],
+    }
+    return [(schema, _uri('combinators', index)) for index in range(versions)]
+
+
+def many_versions(size, fields=50):
+    """Build successive versions of a schema, each adding a field.
+
+    :param size: Number of versions.
+    :param fields: Number of fields of the first version.
+    """
+    rand = random.Random(size)
+    properties = dict(
+        ('field_{0}'.format(index), _leaf(rand)) for index in range(fields)
+    )
+    corpus = []
+    for version in range(size):
+        properties = dict(properties)
+        properties['added_{0}'.format(version)] = {
+            'type': 'array',
+            'items': {
+                'type': 'object',
+                'properties': {'value': _leaf(rand)}
+            }
+        }
+        corpus.append((
+            {'type': 'object', 'properties': properties},
+            _uri('many_versions', version)
+        ))
+    return corpus
+
+
+CORPORA = {
+    'wide': (wide, (10, 20, 40)),
+    'deep': (deep, (50, 100, 200)),
+    'ref_heavy': (ref_heavy, (25, 50, 100)),
+    'combinators': (combinators, (50, 100, 200)),
+    'many_versions': (many_versions, (25, 50, 100)),
+}
+"""Generators of the corpora with the sizes benchmarked by default."""
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Import time benchmark.
+
+Every module is imported in a new interpreter, so nothing is imported
+already, and the best time of several runs is kept. The heavy modules which
+the import pulled in are listed as well::
+
+    $ python -m benchmarks.imports --save benchmarks/baselines/imports.json
+    $ python -m benchmarks.imports --compare benchmarks/baselines/imports.json
+
+The command exits with status 1 if an import got slower than the threshold
+allows or if it imports a heavy module which it did not import before.
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+
+MODULES = (
+    'doschema',
+    'doschema.validation',
+    'doschema.transform',
+    'doschema.registry',
+    'doschema.snapshot',
+    'doschema.stream',
+)
+"""Benchmarked modules."""
+
+HEAVY_MODULES = ('jsonschema', 'logging', 'multiprocessing')
+"""Modules which should only be imported when they are used."""
+
+_SCRIPT = '''
+import sys, time
+timer = getattr(time, 'perf_counter', time.time)
+start = timer()
+import {module}
+seconds = timer() - start
+print(seconds)
+print(' '.join(name for name in {heavy!r} if name in sys.modules))
+'''
+
+
+def measure(module, repeat):
+    """Return the best import time of a module and the heavy modules.
+
+    :param module: Name of the imported module.
+    :param repeat: Number of interpreters importing the module.
+    :returns: Tuple with the time in seconds and the sorted list of the
+              names of the heavy modules imported with the module.
+    """
+    script = _SCRIPT.format(module=module, heavy=HEAVY_MODULES)
+    best = None
+    for _ in range(repeat):
+        output = subprocess.check_output(
+            [sys.executable, '-c', script]
+        ).decode('utf-8').splitlines()
+        seconds = float(output[0])
+        if best is None or seconds < best:
+            best = seconds
+        heavy = sorted(output[1].split()) if len(output) > 1 else []
+    return best, heavy
+
+
+def run(modules=None, repeat=5):
+    """Run the benchmark.
+
+    :param modules: Names of the modules to import, all if not provided.
+    :param repeat: Number of imports of every module.
+    :returns: List of result dicts.
+    """
+    results = []
+    for module in modules or MODULES:
+        seconds, heavy = measure(module, repeat)
+        results.append({
+            'module': module,
+            'seconds': seconds,
+            'heavy_modules': heavy,
+        })
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Compare results to a baseline.
+
+    :param results: List of result dicts.
+    :param baseline: List of result dicts of the baseline.
+    :param threshold: Ratio to the baseline above which a time is a
+                      regression.
+    :returns: List of regression messages.
+    """
+    regressions = []
+    previous = dict((result['module'], result) for result in baseline)
+    for result in results:
+        module = result['module']
+        if module not in previous:
+            continue
+        added = set(result['heavy_modules']).difference(
+            previous[module]['heavy_modules']
+        )
+        if added:
+            regressions.append('{0} now imports {1}'.format(
+                module, ', '.join(sorted(added))
+            ))
+        if previous[module]['seconds']:
+            ratio = result['seconds'] / previous[module]['seconds']
+            if ratio > threshold:
+                regressions.append(
+                    '{0}: {1:.2f}x slower'.format(module, ratio)
+                )
+    return regressions
+
+
+def main(argv=None):
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description='DoSchema import time.')
+    parser.add_argument('--module', action='append',
+                        help='module to import, can be repeated')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of imports of every module')
+    parser.add_argument('--save', metavar='FILE',
+                        help='save the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare the results to a baseline')
+    parser.add_argument('--threshold', type=float, default=2.0,
+                        help='ratio to the baseline reported as regression')
+    args = parser.parse_args(argv)
+
+    results = run(args.module, args.repeat)
+    for result in results:
+        print('{module:>20} {ms:8.1f} ms  {heavy}'.format(
+            module=result['module'], ms=result['seconds'] * 1000,
+            heavy=' '.join(result['heavy_modules'])))
+
+    if args.save:
+        with open(args.save, 'w') as fp:
+            json.dump({
+                'python': platform.python_version(),
+                'results': results,
+            }, fp, indent=2, sort_keys=True)
+            fp.write('\n')
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        regressions = compare(results, baseline['results'], args.threshold)
+        for regression in regressions:
+            print('Regression: ' + regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
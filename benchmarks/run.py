@@ -0,0 +1,272 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Benchmark runner.
+
+Times :meth:`doschema.validation.JSONSchemaValidator.validate` and
+:func:`doschema.transform.resolve_references` on the corpora of
+:mod:`benchmarks.corpus` at several sizes, and measures the peak of the
+memory allocated while doing so.
+
+Results can be saved as a baseline and later runs compared to it::
+
+    $ python -m benchmarks.run --save benchmarks/baselines/reference.json
+    $ python -m benchmarks.run --compare benchmarks/baselines/reference.json
+
+A run is compared both on the time of every benchmark and on its scaling,
+the time at the largest size divided by the time at the smallest one, which
+does not depend much on the speed of the machine. The command exits with
+status 1 if one of them grew more than the threshold.
+"""
+
+from __future__ import print_function
+
+import argparse
+import gc
+import json
+import platform
+import sys
+
+from benchmarks.corpus import CORPORA
+from doschema.stats import timer
+from doschema.transform import resolve_references
+from doschema.validation import JSONSchemaValidator
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+
+def validate_corpus(corpus):
+    """Validate the schemas of a corpus one after another."""
+    validator = JSONSchemaValidator()
+    for schema, uri in corpus:
+        validator.validate(schema, uri)
+
+
+def resolve_corpus(corpus):
+    """Resolve the references of the schemas of a corpus."""
+    for schema, uri in corpus:
+        resolve_references(schema, uri)
+
+
+TARGETS = {
+    'validate': validate_corpus,
+    'resolve': resolve_corpus,
+}
+"""Benchmarked functions, called with a corpus."""
+
+
+MIN_SECONDS = 0.1
+"""Minimum duration of a timing, fast functions are called several times."""
+
+
+def _time_calls(func, corpus, calls):
+    """Return the time of calling a function several times."""
+    gc.collect()
+    start = timer()
+    for _ in range(calls):
+        func(corpus)
+    return timer() - start
+
+
+def measure(func, corpus, repeat):
+    """Return the best time and the peak of allocated memory of a function.
+
+    As with :mod:`timeit`, the number of calls of every timing is doubled
+    until it lasts at least :data:`MIN_SECONDS`, so that the short
+    benchmarks are not dominated by the noise of the clock.
+
+    :param func: Function called with the corpus.
+    :param corpus: List of ``(schema, uri)`` tuples.
+    :param repeat: Number of timings.
+    :returns: Tuple with the time of one call in seconds and the peak in
+              bytes, which is None if :mod:`tracemalloc` is not available.
+    """
+    calls = 1
+    seconds = _time_calls(func, corpus, calls)
+    while seconds < MIN_SECONDS:
+        calls *= 2
+        seconds = _time_calls(func, corpus, calls)
+
+    best = seconds
+    for _ in range(repeat - 1):
+        best = min(best, _time_calls(func, corpus, calls))
+    best /= calls
+
+    peak = None
+    if tracemalloc is not None:
+        gc.collect()
+        tracemalloc.start()
+        try:
+            func(corpus)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return best, peak
+
+
+def run(corpora=None, targets=None, quick=False, repeat=5):
+    """Run the benchmarks.
+
+    :param corpora: Names of the corpora to use, all if not provided.
+    :param targets: Names of the benchmarked functions, all if not provided.
+    :param quick: If set to True only the smallest size of every corpus is
+                  used and every benchmark runs once.
+    :param repeat: Number of timings of every benchmark.
+    :returns: List of result dicts.
+    """
+    results = []
+    for name in sorted(corpora or CORPORA):
+        generator, sizes = CORPORA[name]
+        if quick:
+            sizes, repeat = sizes[:1], 1
+        for size in sizes:
+            corpus = generator(size)
+            for target in sorted(targets or TARGETS):
+                seconds, peak = measure(TARGETS[target], corpus, repeat)
+                results.append({
+                    'corpus': name,
+                    'size': size,
+                    'target': target,
+                    'seconds': seconds,
+                    'peak_bytes': peak,
+                })
+    return results
+
+
+def _scaling(results):
+    """Return the scaling of every corpus and target.
+
+    :param results: List of result dicts.
+    :returns: Dict of ``(corpus, target)`` to the time at the largest size
+              divided by the time at the smallest one.
+    """
+    by_benchmark = {}
+    for result in results:
+        key = (result['corpus'], result['target'])
+        by_benchmark.setdefault(key, []).append(
+            (result['size'], result['seconds'])
+        )
+    scaling = {}
+    for key, times in by_benchmark.items():
+        times.sort()
+        if len(times) > 1 and times[0][1] > 0:
+            scaling[key] = times[-1][1] / times[0][1]
+    return scaling
+
+
+def compare(results, baseline, threshold):
+    """Compare results to a baseline.
+
+    :param results: List of result dicts.
+    :param baseline: List of result dicts of the baseline.
+    :param threshold: Ratio to the baseline above which a time or a scaling
+                      is a regression.
+    :returns: List of regression messages.
+    """
+    regressions = []
+    previous = dict(
+        ((result['corpus'], result['target'], result['size']), result)
+        for result in baseline
+    )
+    for result in results:
+        key = (result['corpus'], result['target'], result['size'])
+        if key not in previous or not previous[key]['seconds']:
+            continue
+        ratio = result['seconds'] / previous[key]['seconds']
+        if ratio > threshold:
+            regressions.append(
+                '{0} {1} at size {2}: {3:.2f}x slower'.format(
+                    key[0], key[1], key[2], ratio
+                )
+            )
+
+    previous_scaling = _scaling(baseline)
+    for key, scaling in sorted(_scaling(results).items()):
+        if key in previous_scaling and \
+                scaling / previous_scaling[key] > threshold:
+            regressions.append(
+                '{0} {1}: scaling {2:.1f}x, was {3:.1f}x'.format(
+                    key[0], key[1], scaling, previous_scaling[key]
+                )
+            )
+    return regressions
+
+
+def _format_bytes(size):
+    """Format a number of bytes."""
+    if size is None:
+        return '-'
+    return '{0:.1f} KiB'.format(size / 1024.0)
+
+
+def main(argv=None):
+    """Run the benchmarks from the command line."""
+    parser = argparse.ArgumentParser(description='DoSchema benchmarks.')
+    parser.add_argument('--corpus', action='append', choices=sorted(CORPORA),
+                        help='corpus to use, can be repeated')
+    parser.add_argument('--target', action='append', choices=sorted(TARGETS),
+                        help='function to benchmark, can be repeated')
+    parser.add_argument('--quick', action='store_true',
+                        help='only use the smallest size once')
+    parser.add_argument('--repeat', type=int, default=5,
+                        help='number of timings of every benchmark')
+    parser.add_argument('--save', metavar='FILE',
+                        help='save the results as a baseline')
+    parser.add_argument('--compare', metavar='FILE',
+                        help='compare the results to a baseline')
+    parser.add_argument('--threshold', type=float, default=2.0,
+                        help='ratio to the baseline reported as regression')
+    args = parser.parse_args(argv)
+
+    results = run(args.corpus, args.target, args.quick, args.repeat)
+    for result in results:
+        print('{corpus:>14} {target:>9} {size:>5} {seconds:10.4f} s '
+              '{peak:>12}'.format(
+                  peak=_format_bytes(result['peak_bytes']), **result))
+
+    if args.save:
+        with open(args.save, 'w') as fp:
+            json.dump({
+                'python': platform.python_version(),
+                'results': results,
+            }, fp, indent=2, sort_keys=True)
+            fp.write('\n')
+
+    if args.compare:
+        with open(args.compare) as fp:
+            baseline = json.load(fp)
+        regressions = compare(results, baseline['results'], args.threshold)
+        for regression in regressions:
+            print('Regression: ' + regression)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
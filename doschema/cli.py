@@ -0,0 +1,392 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Command line interface.
+
+The ``doschema`` command validates the schemas of a directory tree, one
+version after another, and can write them with their references resolved::
+
+    $ doschema --jobs 4 --cache-dir .doschema --output build/schemas schemas
+
+Schemas are ordered by their path, numbers being compared by value, so
+``v2/`` comes before ``v10/``. Files which are only referenced by the
+schemas, such as shared definitions, are left out with ``--exclude`` or by
+listing the versions with ``--include``::
+
+    $ doschema --exclude 'common/*' schemas
+
+The excluded files are still used to resolve references.
+
+Worker processes read and walk the schemas while the main process checks
+them against the previous versions in order, therefore conflicts are the
+same as when validating them one by one. The command exits with status 1 if
+a conflict or an error was found.
+
+References are resolved from the files of the tree only, see
+:class:`~doschema.store.SchemaStore`. With a cache directory the fields of
+the schemas and the identifiers of the files are kept between runs, so only
+the schemas which changed are walked again.
+"""
+
+from __future__ import print_function
+
+import argparse
+import fnmatch
+import io
+import json
+import os
+import re
+import sys
+
+from six.moves.urllib.parse import urldefrag, urljoin
+from six.moves.urllib.request import pathname2url
+
+from doschema.errors import DoSchemaError
+from doschema.plan import ERROR, DiskPlanCache
+from doschema.report import write_json_lines
+from doschema.resolver import path_uri, resolution_error
+from doschema.store import SchemaStore, document_id
+from doschema.transform import resolve_references
+from doschema.validation import JSONSchemaValidator
+
+_worker = {}
+"""State of the current process, set by :func:`_init_worker`."""
+
+
+def _natural_key(path):
+    """Return a sort key comparing the numbers of a path by value."""
+    return [
+        int(part) if part.isdigit() else part
+        for part in re.split(r'(\d+)', path)
+    ]
+
+
+def _matches(path, patterns):
+    """Check if a relative path matches one of glob patterns.
+
+    The patterns are matched against the path with ``/`` separators, where
+    ``*`` also matches ``/``.
+    """
+    path = path.replace(os.sep, '/')
+    return any(fnmatch.fnmatchcase(path, pattern) for pattern in patterns)
+
+
+def schema_files(directory, include=None, exclude=()):
+    """Return the relative paths of the schema files of a directory.
+
+    :param directory: Root of the tree of schemas.
+    :param include: Glob patterns of the paths of the schemas, relative to
+                    the tree. If not provided all the ``.json`` files are
+                    schemas.
+    :param exclude: Glob patterns of the paths of the files which are not
+                    schemas.
+    :returns: List of paths, sorted by :func:`_natural_key`.
+    """
+    paths = []
+    for root, dirs, files in os.walk(directory):
+        for name in files:
+            if not name.endswith('.json'):
+                continue
+            path = os.path.relpath(os.path.join(root, name), directory)
+            if include and not _matches(path, include):
+                continue
+            if not _matches(path, exclude):
+                paths.append(path)
+    return sorted(paths, key=_natural_key)
+
+
+def _init_worker(store, directory, base_uri, ignore_index, cache_dir,
+                 output=None):
+    """Prepare the state of a process reading schemas.
+
+    :param store: :class:`~doschema.store.SchemaStore` of the tree.
+    :param directory: Root of the tree of schemas.
+    :param base_uri: Base URI of the tree or None.
+    :param ignore_index: ``ignore_index`` of the validator.
+    :param cache_dir: Cache directory or None.
+    :param output: Directory receiving the resolved schemas or None.
+    """
+    plan_cache = None
+    if cache_dir is not None:
+        plan_cache = DiskPlanCache(os.path.join(cache_dir, 'plans'))
+    _worker.update(
+        store=store,
+        directory=directory,
+        base_uri=base_uri,
+        output=output,
+        validator=JSONSchemaValidator(
+            ignore_index, resolver_factory=store.resolver,
+            plan_cache=plan_cache
+        ),
+    )
+
+
+def load_schema(directory, path, base_uri=None):
+    """Read a schema of a tree.
+
+    The URI of the schema is its ``$id`` or ``id`` if it has one, relative
+    to the URI of its file.
+
+    :param directory: Root of the tree of schemas.
+    :param path: Path of the schema relative to the tree.
+    :param base_uri: URI the tree is published under. If not provided the
+                     ``file`` URI of the schema is used.
+    :returns: Tuple with the schema and its URI.
+    """
+    filename = os.path.join(directory, path)
+    with io.open(filename, encoding='utf-8') as fp:
+        schema = json.load(fp)
+    if base_uri is None:
+        uri = path_uri(filename)
+    else:
+        uri = urljoin(base_uri, pathname2url(path))
+    schema_id = document_id(schema)
+    if schema_id is not None:
+        uri = urldefrag(urljoin(uri, schema_id))[0]
+    return schema, uri
+
+
+def _load(path):
+    """Read a schema of the tree of the current process."""
+    return load_schema(_worker['directory'], path, _worker['base_uri'])
+
+
+def _compile(path):
+    """Return the field contributions of a schema of the tree.
+
+    :param path: Path of the schema relative to the tree.
+    :returns: Tuple with the path, the URI and the contributions.
+    """
+    try:
+        schema, uri = _load(path)
+    except (IOError, OSError, ValueError) as exc:
+        return path, path, [(ERROR, None, exc)]
+    plan = _worker['validator'].compile(schema, uri)
+    return path, uri, plan.contributions
+
+
+def _resolve(path):
+    """Write a schema of the tree with its references resolved.
+
+    :param path: Path of the schema relative to the tree.
+    :returns: The path.
+    """
+    schema, uri = _load(path)
+    store = _worker['store']
+    schema = resolve_references(
+        schema, uri, store.resolver(uri, schema), in_place=True
+    )
+    filename = os.path.join(_worker['output'], path)
+    if not os.path.isdir(os.path.dirname(filename)):
+        try:
+            os.makedirs(os.path.dirname(filename))
+        except OSError:
+            # Created by another worker.
+            if not os.path.isdir(os.path.dirname(filename)):
+                raise
+    with io.open(filename, 'w', encoding='utf-8') as fp:
+        fp.write(json.dumps(schema, indent=2, sort_keys=True,
+                            ensure_ascii=False) + u'\n')
+    return path
+
+
+def _map(func, items, jobs, initargs):
+    """Call a function on every item, in worker processes if ``jobs > 1``.
+
+    :returns: Iterator of the results, in the order of the items.
+    """
+    if jobs == 1:
+        _init_worker(*initargs)
+        for item in items:
+            yield func(item)
+        return
+
+    import multiprocessing
+
+    pool = multiprocessing.Pool(jobs or None, _init_worker, initargs)
+    try:
+        for result in pool.imap(func, items):
+            yield result
+    finally:
+        pool.terminate()
+
+
+def validate_tree(directory, jobs=1, output=None, cache_dir=None,
+                  base_uri=None, ignore_index=True, report=None,
+                  out=None, include=None, exclude=()):
+    """Validate the schemas of a directory tree in order.
+
+    :param directory: Root of the tree of schemas.
+    :param jobs: Number of worker processes, 0 for the number of CPUs.
+    :param output: Directory receiving the schemas with their references
+                   resolved. Nothing is written if a conflict is found.
+    :param cache_dir: Directory keeping data between runs or None.
+    :param base_uri: URI the tree is published under. If not provided the
+                     ``file`` URIs of the schemas are used.
+    :param ignore_index: ``ignore_index`` of the validator.
+    :param report: Text file receiving the conflicts as JSON lines or None.
+    :param out: Text file receiving the messages, standard output if not
+                provided.
+    :param include: Glob patterns of the schemas, see :func:`schema_files`.
+    :param exclude: Glob patterns of the files which are not schemas.
+    :returns: Number of schemas with a conflict or an error.
+    """
+    out = out or sys.stdout
+    paths = schema_files(directory, include, exclude)
+    index_file = None
+    if cache_dir is not None:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        index_file = os.path.join(cache_dir, 'index.json')
+    if base_uri is None:
+        store = SchemaStore([directory], index_file)
+    else:
+        store = SchemaStore([(directory, base_uri)], index_file)
+    initargs = (store, directory, base_uri, ignore_index, cache_dir)
+
+    validator = JSONSchemaValidator(ignore_index, collect_conflicts=True)
+    failed = 0
+    for path, uri, contributions in _map(_compile, paths, jobs, initargs):
+        try:
+            result = validator.merge_fields(contributions, uri)
+        except (DoSchemaError, NotImplementedError, ValueError,
+                resolution_error()) as exc:
+            failed += 1
+            print(u'{0}: {1}'.format(path, exc), file=out)
+            continue
+        if result.conflicts:
+            failed += 1
+            for conflict in result.conflicts:
+                print(u'{0}: {1}'.format(path, conflict.message), file=out)
+            if report is not None:
+                write_json_lines([result], report)
+
+    if output is not None and not failed:
+        for _ in _map(_resolve, paths, jobs, initargs + (output, )):
+            pass
+    print(u'{0} schemas checked, {1} failed.'.format(len(paths), failed),
+          file=out)
+    return failed
+
+
+def watch_tree(directory, base_uri=None, ignore_index=True, out=None,
+               timeout=None, include=None, exclude=()):
+    """Check the schemas of a directory tree every time files change.
+
+    :param directory: Root of the tree of schemas.
+    :param base_uri: URI the tree is published under or None.
+    :param ignore_index: ``ignore_index`` of the validator.
+    :param out: Text file receiving the messages, standard output if not
+                provided.
+    :param timeout: Stop after waiting this many seconds for a change,
+                    never if not provided.
+    :param include: Glob patterns of the schemas, see :func:`schema_files`.
+    :param exclude: Glob patterns of the files which are not schemas.
+    :returns: Number of failed schemas when the watch stopped.
+    """
+    from doschema.watch import SchemaWatcher
+
+    out = out or sys.stdout
+    watcher = SchemaWatcher(directory, base_uri, ignore_index, include,
+                            exclude)
+    for line in watcher.messages():
+        print(line, file=out)
+    print(u'{0} schemas checked, {1} failed.'.format(
+        len(watcher), len(watcher.failures)
+    ), file=out)
+    try:
+        for walked, seconds in watcher.watch(timeout=timeout):
+            for line in watcher.messages():
+                print(line, file=out)
+            print(u'{0} schemas walked in {1:.0f} ms, {2} failed.'.format(
+                len(walked), seconds * 1000, len(watcher.failures)
+            ), file=out)
+            out.flush()
+    except KeyboardInterrupt:
+        pass
+    return len(watcher.failures)
+
+
+def main(argv=None):
+    """Run the ``doschema`` command."""
+    parser = argparse.ArgumentParser(
+        prog='doschema',
+        description='Check that the versions of a tree of JSON schemas are '
+                    'compatible with each other.'
+    )
+    parser.add_argument('directory', help='root of the tree of schemas')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='number of worker processes, 0 for one per CPU')
+    parser.add_argument('-o', '--output', metavar='DIR',
+                        help='write the schemas with resolved references')
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        help='keep data between runs in this directory')
+    parser.add_argument('--base-uri', metavar='URI',
+                        help='URI the tree of schemas is published under')
+    parser.add_argument('--keep-index', action='store_true',
+                        help='check the items of arrays by their position')
+    parser.add_argument('--report', metavar='FILE',
+                        help='write the conflicts to a JSON lines file')
+    parser.add_argument('--include', action='append', metavar='PATTERN',
+                        help='check only the schemas matching this glob '
+                             'pattern, relative to the directory')
+    parser.add_argument('--exclude', action='append', default=[],
+                        metavar='PATTERN',
+                        help='do not check the files matching this glob '
+                             'pattern, e.g. shared definitions')
+    parser.add_argument('--watch', action='store_true',
+                        help='check the schemas again when files change')
+    args = parser.parse_args(argv)
+    if args.jobs < 0:
+        parser.error('--jobs cannot be negative')
+    if not os.path.isdir(args.directory):
+        parser.error('{0} is not a directory'.format(args.directory))
+    if args.watch and (args.output or args.report):
+        parser.error('--output and --report cannot be used with --watch')
+
+    if args.watch:
+        failed = watch_tree(
+            args.directory, args.base_uri, not args.keep_index,
+            include=args.include, exclude=args.exclude
+        )
+        return 1 if failed else 0
+
+    report = None
+    if args.report is not None:
+        report = io.open(args.report, 'w', encoding='utf-8')
+    try:
+        failed = validate_tree(
+            args.directory, args.jobs, args.output, args.cache_dir,
+            args.base_uri, not args.keep_index, report,
+            include=args.include, exclude=args.exclude
+        )
+    finally:
+        if report is not None:
+            report.close()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
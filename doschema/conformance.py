@@ -0,0 +1,260 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Document type conformance.
+
+A :class:`DocumentChecker` is compiled from the registry of a
+:class:`~doschema.validation.JSONSchemaValidator` and checks that the values
+of JSON documents have the types registered for their fields::
+
+    checker = DocumentChecker(validator.fields_types_dict,
+                              validator.ignore_index)
+    for mismatch in checker.check(record):
+        print(mismatch.message)
+
+The registry is turned into a tree of nodes dispatching on the keys of the
+objects and the positions of the items, so a document is checked in one walk
+without looking its paths up in the registry. Paths are only turned into
+JSON pointers for the values which do not conform. Values of fields which
+are not registered, or registered without a type, are not checked.
+"""
+
+import six
+
+_PYTHON_TYPES = {
+    'object': frozenset([dict]),
+    'array': frozenset([list]),
+    'string': frozenset(six.string_types) | frozenset([six.text_type]),
+    'integer': frozenset(six.integer_types),
+    'number': frozenset(six.integer_types) | frozenset([float]),
+    'boolean': frozenset([bool]),
+}
+"""Python types of the values of the JSON types, when decoded by json."""
+
+
+def json_type(value):
+    """Return the JSON type of a decoded value or None if it has none."""
+    if value is None:
+        return 'null'
+    elif isinstance(value, bool):
+        return 'boolean'
+    elif isinstance(value, six.integer_types):
+        return 'integer'
+    elif isinstance(value, float):
+        return 'number'
+    elif isinstance(value, six.string_types):
+        return 'string'
+    elif isinstance(value, dict):
+        return 'object'
+    elif isinstance(value, (list, tuple)):
+        return 'array'
+    return None
+
+
+def _conforms(value, field_type):
+    """Check a value whose Python type is not one of :data:`_PYTHON_TYPES`.
+
+    Subclasses such as :class:`collections.OrderedDict` and integral
+    numbers written as floats are accepted.
+    """
+    found_type = json_type(value)
+    if found_type == field_type:
+        return True
+    if field_type == 'number':
+        return found_type == 'integer'
+    if field_type == 'integer' and found_type == 'number':
+        return value.is_integer()
+    return False
+
+
+class _CheckNode(object):
+    """Node of the field tree of :class:`DocumentChecker`."""
+
+    __slots__ = ('field_type', 'types', 'uri', 'children')
+
+    def __init__(self):
+        """Constructor."""
+        self.field_type = None
+        self.types = None
+        self.uri = None
+        self.children = None
+
+
+class DocumentChecker(object):
+    """Checker of the types of the values of documents."""
+
+    def __init__(self, fields_types_dict, ignore_index=True):
+        """Constructor.
+
+        :param fields_types_dict: Registry of a validator, mapping field
+                                  paths to
+                                  :class:`~doschema.validation.FieldToAdd`.
+                                  It is read once, later changes are not
+                                  seen by the checker.
+        :param ignore_index: ``ignore_index`` of the validator. If False the
+                             items of arrays are checked by their position.
+        """
+        self.ignore_index = ignore_index
+        self.root = _CheckNode()
+        """Node of the root of the documents."""
+        for path, field in six.iteritems(fields_types_dict):
+            node = self.root
+            for segment in path:
+                if node.children is None:
+                    node.children = {}
+                child = node.children.get(segment)
+                if child is None:
+                    child = node.children[segment] = _CheckNode()
+                node = child
+            if field.field_type is not None:
+                node.field_type = field.field_type
+                node.types = _PYTHON_TYPES.get(field.field_type)
+                node.uri = field.schema_index
+
+    def _item_nodes(self, node):
+        """Return the nodes of positional items and of the other items.
+
+        :param node: Node of an array field.
+        :returns: Tuple with the dict of the nodes by position or None, and
+                  the node of the items not found in it or None.
+        """
+        children = node.children
+        if children is None:
+            return None, None
+        items = children.get('items')
+        if self.ignore_index or items is None:
+            return None, items
+        positions = items.children
+        additional = children.get('additionalItems')
+        if additional is None and not (
+                positions and any(isinstance(key, six.integer_types)
+                                  for key in positions)):
+            # Items described by one schema.
+            additional = items
+        return positions, additional
+
+    def _mismatches(self, document):
+        """Yield the values which do not have their registered type."""
+        # Every entry is (value, node, path) where the path is a linked
+        # tuple (parent path, segment), () for the root.
+        stack = [(document, self.root, ())]
+        while stack:
+            value, node, path = stack.pop()
+            types = node.types
+            if types is not None and type(value) not in types and \
+                    not _conforms(value, node.field_type):
+                yield TypeMismatch(_unlink(path), node.field_type,
+                                   json_type(value), node.uri)
+                continue
+
+            children = node.children
+            if children is None:
+                continue
+            # Pushed in reverse, so the values are checked in their order.
+            if isinstance(value, dict):
+                keys = [key for key in value if key in children]
+                for key in reversed(keys):
+                    stack.append((value[key], children[key], (path, key)))
+            elif isinstance(value, (list, tuple)):
+                positions, child = self._item_nodes(node)
+                for index in range(len(value) - 1, -1, -1):
+                    item_node = child
+                    if positions is not None:
+                        item_node = positions.get(index, child)
+                    if item_node is not None:
+                        stack.append((value[index], item_node, (path, index)))
+
+    def check(self, document):
+        """Return the values of a document not having their registered type.
+
+        A value which does not conform is reported and the values it
+        contains are not checked.
+
+        :param document: Decoded JSON document.
+        :returns: List of :class:`TypeMismatch`.
+        """
+        return list(self._mismatches(document))
+
+    def conforms(self, document):
+        """Check that all the values of a document have their registered type.
+
+        The walk stops at the first value which does not conform.
+
+        :param document: Decoded JSON document.
+        """
+        return next(self._mismatches(document), None) is None
+
+
+def _unlink(path):
+    """Return the tuple of segments of a linked path."""
+    segments = []
+    while path:
+        path, segment = path
+        segments.append(segment)
+    segments.reverse()
+    return tuple(segments)
+
+
+class TypeMismatch(object):
+    """Value of a document which does not have the registered type."""
+
+    __slots__ = ('path', 'expected_type', 'found_type', 'uri')
+
+    def __init__(self, path, expected_type, found_type, uri):
+        """Constructor.
+
+        :param path: Tuple with the keys and positions leading to the value.
+        :param expected_type: Type registered for the field.
+        :param found_type: JSON type of the value.
+        :param uri: URI of the schema which registered the field.
+        """
+        self.path = path
+        self.expected_type = expected_type
+        self.found_type = found_type
+        self.uri = uri
+
+    @property
+    def pointer(self):
+        """JSON pointer of the value in the document."""
+        return '/' + '/'.join(
+            six.text_type(segment).replace('~', '~0').replace('/', '~1')
+            for segment in self.path
+        )
+
+    @property
+    def message(self):
+        """Message of the mismatch."""
+        return '{0} is of type {1} instead of {2} registered by {3}.'.format(
+            self.pointer, self.found_type, self.expected_type, self.uri
+        )
+
+    def to_dict(self):
+        """Return the mismatch as a JSON serializable dict."""
+        return {
+            'pointer': self.pointer,
+            'expected_type': self.expected_type,
+            'found_type': self.found_type,
+            'uri': self.uri,
+        }
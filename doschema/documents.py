@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Shared cache of referenced documents.
+
+Every :meth:`~doschema.validation.JSONSchemaValidator.validate` and every
+:func:`~doschema.transform.resolve_references` call creates a new resolver,
+which retrieves and parses again the documents the schema references.
+A :class:`DocumentCache` keeps the parsed documents for all the resolvers
+created by a :class:`CachingResolverFactory`::
+
+    factory = CachingResolverFactory(DocumentCache(directory='.cache'))
+    validator = JSONSchemaValidator(resolver_factory=factory)
+    resolve_references(schema, uri, factory(base_uri=uri, referrer=schema))
+
+Cached documents are shared and must not be modified.
+"""
+
+import collections
+import hashlib
+import json
+import os
+import threading
+import time
+
+import jsonschema
+
+
+class DocumentCache(object):
+    """Cache of parsed documents bounded in size, optionally on disk.
+
+    Documents are kept in memory and the least recently used ones are
+    evicted when their total size, measured as the length of their JSON
+    serialization, goes over ``maxsize``. With a ``directory``, documents
+    are also stored as JSON files there, so that other processes and later
+    runs do not retrieve them again.
+    """
+
+    def __init__(self, maxsize=64 * 1024 * 1024, directory=None,
+                 max_age=None):
+        """Constructor.
+
+        :param maxsize: Maximum total size of the documents kept in memory.
+        :param directory: Directory storing the documents. It is created if
+                          it does not exist. If not provided documents are
+                          only kept in memory.
+        :param max_age: Number of seconds after which a document stored in
+                        the directory is retrieved again. If not provided
+                        stored documents are always used.
+        """
+        self.maxsize = maxsize
+        self.directory = directory
+        self.max_age = max_age
+        if directory is not None and not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.size = 0
+        """Total size of the documents kept in memory."""
+        self.hits = 0
+        """Number of documents found in the cache."""
+        self.misses = 0
+        """Number of documents not found in the cache."""
+        self._documents = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        """Pickle the cache settings, without the documents in memory."""
+        return {
+            'maxsize': self.maxsize,
+            'directory': self.directory,
+            'max_age': self.max_age,
+        }
+
+    def __setstate__(self, state):
+        """Restore a pickled cache."""
+        self.__init__(**state)
+
+    def _filename(self, uri):
+        """Return the name of the file of a document."""
+        name = hashlib.sha1(uri.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + '.json')
+
+    def get(self, uri):
+        """Return the document cached under the URI or None."""
+        with self._lock:
+            try:
+                document, size = self._documents.pop(uri)
+            except KeyError:
+                pass
+            else:
+                self._documents[uri] = (document, size)
+                self.hits += 1
+                return document
+
+        data = self._read(uri)
+        if data is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        document = json.loads(data)
+        with self._lock:
+            self.hits += 1
+            self._keep(uri, document, len(data))
+        return document
+
+    def __setitem__(self, uri, document):
+        """Cache a document."""
+        data = json.dumps(document, sort_keys=True)
+        with self._lock:
+            self._keep(uri, document, len(data))
+        if self.directory is not None:
+            filename = self._filename(uri)
+            tmp_filename = '{0}.{1}.{2}.tmp'.format(
+                filename, os.getpid(), threading.current_thread().ident
+            )
+            with open(tmp_filename, 'wb') as fp:
+                fp.write(data.encode('utf-8'))
+            getattr(os, 'replace', os.rename)(tmp_filename, filename)
+
+    def _read(self, uri):
+        """Return the JSON data of a document stored on disk or None."""
+        if self.directory is None:
+            return None
+        filename = self._filename(uri)
+        try:
+            if self.max_age is not None and \
+                    time.time() - os.path.getmtime(filename) > self.max_age:
+                return None
+            with open(filename, 'rb') as fp:
+                return fp.read().decode('utf-8')
+        except (IOError, OSError):
+            return None
+
+    def _keep(self, uri, document, size):
+        """Keep a document in memory, evicting the least recently used."""
+        previous = self._documents.pop(uri, None)
+        if previous is not None:
+            self.size -= previous[1]
+        if size > self.maxsize:
+            return
+        self._documents[uri] = (document, size)
+        self.size += size
+        while self.size > self.maxsize:
+            _, (_, evicted_size) = self._documents.popitem(last=False)
+            self.size -= evicted_size
+
+    def __contains__(self, uri):
+        """Check if a document is kept in memory under the URI."""
+        return uri in self._documents
+
+    def __len__(self):
+        """Return the number of documents kept in memory."""
+        return len(self._documents)
+
+    def clear(self):
+        """Remove the documents kept in memory."""
+        with self._lock:
+            self._documents.clear()
+            self.size = 0
+
+
+class CachingRefResolver(jsonschema.RefResolver):
+    """Resolver retrieving the remote documents through a shared cache."""
+
+    def __init__(self, base_uri, referrer, cache=None, **kwargs):
+        """Constructor.
+
+        :param base_uri: URI of the referring document.
+        :param referrer: Referring document.
+        :param cache: :class:`DocumentCache` of the retrieved documents. If
+                      not provided a new one is used.
+        :param kwargs: Other arguments of :class:`jsonschema.RefResolver`.
+        """
+        super(CachingRefResolver, self).__init__(
+            base_uri, referrer, **kwargs
+        )
+        self.cache = DocumentCache() if cache is None else cache
+
+    def resolve_remote(self, uri):
+        """Return a cached document or retrieve and cache it."""
+        document = self.cache.get(uri)
+        if document is None:
+            document = super(CachingRefResolver, self).resolve_remote(uri)
+            self.cache[uri] = document
+        elif self.cache_remote:
+            self.store[uri] = document
+        return document
+
+
+class CachingResolverFactory(object):
+    """Resolver factory sharing one document cache between resolvers."""
+
+    def __init__(self, cache=None):
+        """Constructor.
+
+        :param cache: :class:`DocumentCache` shared by the created resolvers.
+                      If not provided a new one is used.
+        """
+        self.cache = DocumentCache() if cache is None else cache
+
+    def __call__(self, base_uri, referrer):
+        """Return a resolver using the shared cache.
+
+        :param base_uri: URI of the referring document.
+        :param referrer: Referring document.
+        """
+        return CachingRefResolver(base_uri, referrer, cache=self.cache)
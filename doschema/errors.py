@@ -45,3 +45,7 @@ class JSONSchemaCompatibilityError(DoSchemaError):
         """Index of schema in which field occurs now."""
         self.prev_schema = prev_schema
         """Index of schema in which field has occured before."""
+
+    def __reduce__(self):
+        """Keep the schema indexes when the exception is pickled."""
+        return self.__class__, (self.args[0], self.schema, self.prev_schema)
@@ -0,0 +1,204 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Compiled field plans module."""
+
+import collections
+import hashlib
+import json
+import os
+
+TYPED, OBJECT, UNTYPED, ERROR, CONFLICT = range(5)
+"""Kinds of field contributions.
+
+Every contribution is a tuple ``(kind, path, value)``:
+
+* ``TYPED``: the field at ``path`` has the type ``value``.
+* ``OBJECT``: the keyword ``value`` implies type ``object`` at ``path``.
+* ``UNTYPED``: the field at ``path`` is mentioned without a type; if it is
+  unknown, the field at path ``value`` is registered without a type.
+* ``ERROR``: the exception ``value`` found in the schema, ``path`` is None.
+* ``CONFLICT``: the :class:`~doschema.validation.Conflict` ``value`` found
+  at ``path`` without looking at the registry.
+"""
+
+
+def schema_digest(schema):
+    """Return a hash of the schema content which ignores the keys order.
+
+    :param schema: Schema or subschema to hash.
+    :returns: Hexadecimal digest or None if the schema is not serializable
+              to JSON.
+    """
+    try:
+        data = json.dumps(schema, sort_keys=True, separators=(',', ':'))
+    except (TypeError, ValueError):
+        return None
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
+class FieldPlan(object):
+    """Fields contributed by a schema, ready to be checked and registered.
+
+    A plan is created by
+    :meth:`~doschema.validation.JSONSchemaValidator.compile` and applied with
+    :meth:`~doschema.validation.JSONSchemaValidator.apply_plan`, which only
+    loops over the contributions without looking at the schema again.
+    """
+
+    __slots__ = ('contributions', 'key', 'documents')
+
+    def __init__(self, contributions, key=None, documents=None):
+        """Constructor.
+
+        :param contributions: Field contributions returned by
+            :meth:`~doschema.validation.JSONSchemaValidator.extract_fields`.
+        :param key: Key of the plan in a :class:`PlanCache`.
+        :param documents: Dict of the URIs of the other documents referenced
+                          by the schema to their :func:`schema_digest`.
+        """
+        self.contributions = tuple(contributions)
+        self.key = key
+        self.documents = documents or {}
+
+    @property
+    def failed(self):
+        """Check if an error or a conflict was found in the schema."""
+        if self.contributions and self.contributions[-1][0] == ERROR:
+            return True
+        return any(kind == CONFLICT for kind, _, _ in self.contributions)
+
+    def __len__(self):
+        """Return the number of contributions."""
+        return len(self.contributions)
+
+
+class PlanCache(object):
+    """In-memory cache of field plans, keeping the most recently used ones."""
+
+    def __init__(self, maxsize=128):
+        """Constructor.
+
+        :param maxsize: Maximum number of cached plans.
+        """
+        self.maxsize = maxsize
+        self._plans = collections.OrderedDict()
+        self.hits = 0
+        """Number of plans found in the cache."""
+        self.misses = 0
+        """Number of plans not found in the cache."""
+
+    def get(self, key):
+        """Return the plan cached under the key or None."""
+        try:
+            plan = self._plans.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._plans[key] = plan
+        self.hits += 1
+        return plan
+
+    def __setitem__(self, key, plan):
+        """Cache a plan, evicting the least recently used one if full."""
+        self._plans.pop(key, None)
+        self._plans[key] = plan
+        while len(self._plans) > self.maxsize:
+            self._plans.popitem(last=False)
+
+    def __contains__(self, key):
+        """Check if a plan is cached under the key."""
+        return key in self._plans
+
+    def __len__(self):
+        """Return the number of cached plans."""
+        return len(self._plans)
+
+    def clear(self):
+        """Remove all cached plans."""
+        self._plans.clear()
+
+
+class DiskPlanCache(object):
+    """Cache of field plans stored as JSON files in a directory.
+
+    The cache can be shared by successive runs and by several processes.
+    Files are written under a temporary name and then renamed, so readers
+    never see a partially written plan.
+    """
+
+    def __init__(self, directory):
+        """Constructor.
+
+        :param directory: Directory holding the cached plans. It is created
+                          if it does not exist.
+        """
+        self.directory = directory
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.hits = 0
+        """Number of plans found in the cache."""
+        self.misses = 0
+        """Number of plans not found in the cache."""
+
+    def _filename(self, key):
+        """Return the name of the file of a plan."""
+        name = hashlib.sha1(json.dumps(list(key)).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, name + '.json')
+
+    def get(self, key):
+        """Return the plan cached under the key or None."""
+        try:
+            with open(self._filename(key), 'rb') as fp:
+                data = json.loads(fp.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+
+        contributions = [
+            (kind, tuple(path),
+             tuple(value) if kind == UNTYPED else value)
+            for kind, path, value in data['contributions']
+        ]
+        self.hits += 1
+        return FieldPlan(contributions, key, data['documents'])
+
+    def __setitem__(self, key, plan):
+        """Store a plan which does not end with an error."""
+        data = json.dumps({
+            'contributions': [
+                (kind, list(path), list(value) if kind == UNTYPED else value)
+                for kind, path, value in plan.contributions
+            ],
+            'documents': plan.documents,
+        })
+        filename = self._filename(key)
+        tmp_filename = '{0}.{1}.tmp'.format(filename, os.getpid())
+        with open(tmp_filename, 'wb') as fp:
+            fp.write(data.encode('utf-8'))
+        getattr(os, 'replace', os.rename)(tmp_filename, filename)
+
+    def __contains__(self, key):
+        """Check if a plan is cached under the key."""
+        return os.path.exists(self._filename(key))
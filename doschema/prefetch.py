@@ -0,0 +1,307 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Concurrent prefetching of remote referenced documents.
+
+:class:`jsonschema.RefResolver` retrieves a remote document when the walk
+reaches a reference to it, one document at a time. :class:`RemotePrefetcher`
+instead finds all the remote documents a schema references, directly or
+through other documents, and fetches them concurrently in a pool of threads
+before the walk starts. HTTP connections are kept open and reused for the
+following documents of the same host.
+
+:class:`PrefetchResolverFactory` can be given as ``resolver_factory`` to
+:class:`~doschema.validation.JSONSchemaValidator`, and the resolvers it
+creates can be given to :func:`~doschema.transform.resolve_references`::
+
+    factory = PrefetchResolverFactory(RemotePrefetcher(concurrency=8))
+    validator = JSONSchemaValidator(resolver_factory=factory)
+    resolve_references(schema, uri, factory(base_uri=uri, referrer=schema))
+"""
+
+import json
+import socket
+import threading
+
+import jsonschema
+import six
+from six.moves import http_client, queue
+from six.moves.urllib.parse import urldefrag, urljoin, urlsplit
+
+FETCHED_SCHEMES = frozenset(['http', 'https'])
+"""Schemes of the documents which are prefetched."""
+
+
+def iter_references(document, uri):
+    """Return the absolute URIs of the references found in a document.
+
+    Scopes changed by ``id`` or ``$id`` keywords are followed.
+
+    :param document: Schema or any JSON document.
+    :param uri: URI of the document.
+    """
+    stack = [(document, uri)]
+    while stack:
+        node, base_uri = stack.pop()
+        if isinstance(node, dict):
+            for keyword in ('id', '$id'):
+                if isinstance(node.get(keyword), six.string_types):
+                    base_uri = urljoin(base_uri, node[keyword])
+            if isinstance(node.get('$ref'), six.string_types):
+                yield urljoin(base_uri, node['$ref'])
+            stack.extend((value, base_uri) for value in node.values())
+        elif isinstance(node, list):
+            stack.extend((value, base_uri) for value in node)
+
+
+class RemotePrefetcher(object):
+    """Fetch the remote documents referenced by schemas, concurrently."""
+
+    def __init__(self, concurrency=10, timeout=10, store=None):
+        """Constructor.
+
+        :param concurrency: Maximum number of documents fetched at once.
+        :param timeout: Timeout of the HTTP connections in seconds.
+        :param store: Dict of URIs to documents already retrieved. Fetched
+                      documents are added to it.
+        """
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.store = {} if store is None else store
+        """Dict of URIs to the retrieved documents."""
+        self.errors = {}
+        """Dict of URIs to the exceptions raised when fetching them."""
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        """Pickle the prefetcher without its open connections."""
+        state = self.__dict__.copy()
+        del state['_idle'], state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        """Restore a pickled prefetcher."""
+        self.__dict__.update(state)
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    def missing(self, document, uri):
+        """Return the remote documents referenced by a document not fetched.
+
+        :param document: Schema or any JSON document.
+        :param uri: URI of the document.
+        :returns: Set of document URIs, without fragment.
+        """
+        own_uri = urldefrag(uri)[0]
+        missing = set()
+        for reference in iter_references(document, uri):
+            document_uri = urldefrag(reference)[0]
+            if document_uri != own_uri \
+                    and document_uri not in self.store \
+                    and document_uri not in self.errors \
+                    and urlsplit(document_uri).scheme in FETCHED_SCHEMES:
+                missing.add(document_uri)
+        return missing
+
+    def prefetch(self, schema, uri):
+        """Fetch all the remote documents referenced by a schema.
+
+        Documents which cannot be fetched are recorded in :attr:`errors`,
+        the resolver then raises the usual error when it reaches them.
+
+        :param schema: Schema whose references are prefetched.
+        :param uri: URI of the schema.
+        :returns: :attr:`store`.
+        """
+        missing = self.missing(schema, uri)
+        if missing:
+            self._fetch_all(missing)
+        return self.store
+
+    def close(self):
+        """Close the idle HTTP connections."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
+
+    def _fetch_all(self, uris):
+        """Fetch documents and the documents they reference.
+
+        :param uris: URIs of the documents to fetch.
+        """
+        tasks = queue.Queue()
+        results = queue.Queue()
+        threads = [
+            threading.Thread(target=self._work, args=(tasks, results))
+            for _ in range(self.concurrency)
+        ]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        scheduled = set(uris)
+        for uri in uris:
+            tasks.put(uri)
+        pending = len(uris)
+        try:
+            while pending:
+                result = results.get()
+                pending -= 1
+                if isinstance(result, Exception):
+                    raise result
+                uri, document = result
+                if document is None:
+                    continue
+                for missing in self.missing(document, uri) - scheduled:
+                    scheduled.add(missing)
+                    tasks.put(missing)
+                    pending += 1
+        finally:
+            for thread in threads:
+                tasks.put(None)
+            for thread in threads:
+                thread.join()
+
+    def _work(self, tasks, results):
+        """Fetch the documents of a queue until None is found in it.
+
+        :param tasks: Queue of the URIs to fetch.
+        :param results: Queue receiving the results of :meth:`_fetch`, or
+                        the unexpected exceptions.
+        """
+        while True:
+            uri = tasks.get()
+            if uri is None:
+                return
+            try:
+                result = self._fetch(uri)
+            except Exception as exc:
+                result = exc
+            results.put(result)
+
+    def _fetch(self, uri):
+        """Fetch one document, in a thread of the pool.
+
+        :param uri: URI of the document, without fragment.
+        :returns: Tuple with the URI and the document or None on error.
+        """
+        try:
+            document = self._get(uri)
+        except (EnvironmentError, ValueError,
+                http_client.HTTPException) as exc:
+            self.errors[uri] = exc
+            return uri, None
+        self.store[uri] = document
+        return uri, document
+
+    def _get(self, uri):
+        """Retrieve a JSON document with a reused connection to its host.
+
+        :param uri: URI of the document, without fragment.
+        """
+        scheme, netloc, path, query, _ = urlsplit(uri)
+        target = (path or '/') + ('?' + query if query else '')
+        host = (scheme, netloc)
+
+        connection = self._acquire(host)
+        try:
+            try:
+                response = self._request(connection, target)
+            except (http_client.HTTPException, socket.error):
+                # The server may have closed an idle kept-alive connection.
+                connection.close()
+                connection = self._connect(host)
+                response = self._request(connection, target)
+        except Exception:
+            connection.close()
+            raise
+        self._release(host, connection)
+
+        status, body = response
+        if status != 200:
+            raise IOError('HTTP status {0} for {1}'.format(status, uri))
+        return json.loads(body.decode('utf-8'))
+
+    @staticmethod
+    def _request(connection, target):
+        """Send a GET request and read the whole response.
+
+        :returns: Tuple with the status and the body of the response.
+        """
+        connection.request('GET', target, headers={
+            'Accept': 'application/schema+json, application/json',
+        })
+        response = connection.getresponse()
+        return response.status, response.read()
+
+    def _connect(self, host):
+        """Open a connection to a host."""
+        scheme, netloc = host
+        if scheme == 'https':
+            return http_client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http_client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _acquire(self, host):
+        """Return an idle connection to a host or a new one."""
+        with self._lock:
+            connections = self._idle.get(host)
+            if connections:
+                return connections.pop()
+        return self._connect(host)
+
+    def _release(self, host, connection):
+        """Keep a connection to be reused for the same host."""
+        with self._lock:
+            self._idle.setdefault(host, []).append(connection)
+
+
+class PrefetchResolverFactory(object):
+    """Resolver factory prefetching the remote documents of every schema."""
+
+    def __init__(self, prefetcher=None, resolver_class=jsonschema.RefResolver):
+        """Constructor.
+
+        :param prefetcher: :class:`RemotePrefetcher` shared by the created
+                           resolvers. If not provided a default one is used.
+        :param resolver_class: Class of the created resolvers, it has to
+                               accept a ``store`` like
+                               :class:`jsonschema.RefResolver`.
+        """
+        self.prefetcher = prefetcher or RemotePrefetcher()
+        self.resolver_class = resolver_class
+
+    def __call__(self, base_uri, referrer):
+        """Prefetch the documents referenced by a schema and return a resolver.
+
+        :param base_uri: URI of the schema.
+        :param referrer: Schema whose references are resolved.
+        """
+        store = self.prefetcher.prefetch(referrer, base_uri)
+        return self.resolver_class(
+            base_uri=base_uri, referrer=referrer, store=store
+        )
@@ -0,0 +1,378 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Field registry module.
+
+The registry of :class:`~doschema.validation.JSONSchemaValidator` is a plain
+dict by default. :class:`CompactRegistry` is a drop-in replacement using
+much less memory for large schema families. It can be installed with
+:meth:`~doschema.validation.JSONSchemaValidator.set_registry`.
+
+Its trie also answers queries by JSON pointer without scanning the fields::
+
+    registry.lookup('/metadata/title').field_type
+    for field in registry.subtree('/metadata/creators'):
+        ...
+"""
+
+import six
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # pragma: no cover
+    from collections import MutableMapping
+
+from doschema.validation import FieldToAdd
+
+_UNREGISTERED = -1
+"""URI index of a node which only leads to other fields."""
+
+
+def pointer_path(pointer):
+    """Return the segments of a JSON pointer.
+
+    Both ``''`` and ``'/'`` stand for the root, as
+    :meth:`~doschema.validation.JSONSchemaValidator.make_json_pointer` gives
+    ``'/'`` for it. ``~1`` and ``~0`` are decoded as ``/`` and ``~``.
+
+    :param pointer: JSON pointer of a field.
+    :returns: Tuple of strings.
+    """
+    if pointer in ('', '/'):
+        return ()
+    if pointer[0] != '/':
+        raise ValueError('{0!r} is not a JSON pointer.'.format(pointer))
+    segments = pointer[1:].split('/')
+    if '~' in pointer:
+        segments = [
+            segment.replace('~1', '/').replace('~0', '~')
+            for segment in segments
+        ]
+    return tuple(segments)
+
+
+def _segment_key(segment):
+    """Return a sort key ordering indexes before names."""
+    return (isinstance(segment, six.string_types), segment)
+
+
+class FieldNode(object):
+    """Node of the path trie of :class:`CompactRegistry`."""
+
+    __slots__ = (
+        'segment', 'parent', 'children', 'uri_id', 'field_type', '_pointer'
+    )
+
+    def __init__(self, segment, parent):
+        """Constructor.
+
+        :param segment: Last segment of the path of the node.
+        :param parent: Parent node or None for the root.
+        """
+        self.segment = segment
+        self.parent = parent
+        self.children = None
+        self.uri_id = _UNREGISTERED
+        self.field_type = None
+        self._pointer = None
+
+    @property
+    def registered(self):
+        """Check if a field is registered under the path of the node."""
+        return self.uri_id != _UNREGISTERED
+
+    @property
+    def path(self):
+        """Tuple with the path of the node."""
+        segments = []
+        node = self
+        while node.parent is not None:
+            segments.append(node.segment)
+            node = node.parent
+        segments.reverse()
+        return tuple(segments)
+
+    @property
+    def pointer(self):
+        """JSON pointer of the node, built once from the parent's one."""
+        if self._pointer is None:
+            if self.parent is None:
+                self._pointer = '/'
+            else:
+                prefix = self.parent.pointer
+                if prefix == '/':
+                    prefix = ''
+                self._pointer = prefix + '/' + six.text_type(self.segment)
+        return self._pointer
+
+
+class CompactRegistry(MutableMapping):
+    """Registry storing fields in a trie of interned path segments.
+
+    The paths are not stored as tuples, every segment is stored once per
+    trie node and the segment values themselves are interned. The URIs are
+    kept in a side table and nodes only refer to them by index. Looking up a
+    path returns a :class:`~doschema.validation.FieldToAdd` as a dict
+    registry does.
+    """
+
+    def __init__(self, fields=()):
+        """Constructor.
+
+        :param fields: Mapping or iterable of ``(path, field)`` tuples to
+                       register.
+        """
+        self.root = FieldNode(None, None)
+        """Node of the empty path."""
+        self._segments = {}
+        self._uris = []
+        self._uri_ids = {}
+        self._types = {}
+        self._count = 0
+        self.update(fields)
+
+    def _find(self, path):
+        """Return the node of a path or None if there is none."""
+        node = self.root
+        for segment in path:
+            children = node.children
+            if children is None:
+                return None
+            node = children.get(segment)
+            if node is None:
+                return None
+        return node
+
+    def _insert(self, path):
+        """Return the node of a path, creating the missing nodes."""
+        node = self.root
+        for segment in path:
+            children = node.children
+            if children is None:
+                children = node.children = {}
+            child = children.get(segment)
+            if child is None:
+                segment = self._segments.setdefault(segment, segment)
+                child = children[segment] = FieldNode(segment, node)
+            node = child
+        return node
+
+    def _field(self, node, path):
+        """Return the field registered in a node."""
+        return FieldToAdd(self._uris[node.uri_id], path, node.field_type)
+
+    @staticmethod
+    def _child(children, segment):
+        """Return the child node under a pointer segment or None.
+
+        Item indexes are integers in the paths, so a segment made of digits
+        also matches the integer it stands for.
+
+        :param children: Children of a node or None.
+        :param segment: Segment of a JSON pointer.
+        """
+        if children is None:
+            return None
+        child = children.get(segment)
+        if child is None and segment.isdigit():
+            child = children.get(int(segment))
+        return child
+
+    def _find_pointer(self, pointer):
+        """Return the node of a JSON pointer or None if there is none."""
+        node = self.root
+        for segment in pointer_path(pointer):
+            node = self._child(node.children, segment)
+            if node is None:
+                return None
+        return node
+
+    def _walk(self, nodes):
+        """Yield the fields of the subtrees of nodes, sorted by path.
+
+        :param nodes: List of ``(path, node)`` tuples, sorted by path.
+        """
+        stack = [iter(nodes)]
+        while stack:
+            for path, node in stack[-1]:
+                if node.registered:
+                    yield self._field(node, path)
+                if node.children:
+                    stack.append(iter(sorted(
+                        ((path + (segment, ), child) for segment, child
+                         in six.iteritems(node.children)),
+                        key=lambda item: _segment_key(item[0][-1])
+                    )))
+                break
+            else:
+                stack.pop()
+
+    def lookup(self, pointer):
+        """Return the field registered under a JSON pointer or None.
+
+        The time taken depends on the length of the pointer only.
+
+        :param pointer: JSON pointer of the field, see :func:`pointer_path`.
+        """
+        node = self.root
+        path = []
+        for segment in pointer_path(pointer):
+            children = node.children
+            if children is None:
+                return None
+            node = children.get(segment)
+            if node is None:
+                node = self._child(children, segment)
+                if node is None:
+                    return None
+            path.append(node.segment)
+        if not node.registered:
+            return None
+        return self._field(node, tuple(path))
+
+    def subtree(self, pointer):
+        """Iterate over the fields under a JSON pointer, sorted by path.
+
+        The field of the pointer itself comes first if it is registered.
+        Indexes of items come before names, which are in string order.
+
+        :param pointer: JSON pointer of the field, see :func:`pointer_path`.
+        :returns: Iterator of :class:`~doschema.validation.FieldToAdd`.
+        """
+        node = self._find_pointer(pointer)
+        if node is None:
+            return iter(())
+        return self._walk([(node.path, node)])
+
+    def prefix(self, prefix):
+        """Iterate over the fields whose JSON pointer starts with a prefix.
+
+        ``'/metadata/cre'`` matches ``/metadata/creators`` and
+        ``/metadata/credits`` and all the fields under them.
+
+        :param prefix: Start of the JSON pointers, see :func:`pointer_path`.
+        :returns: Iterator of :class:`~doschema.validation.FieldToAdd`,
+                  sorted by path.
+        """
+        segments = pointer_path(prefix)
+        if not segments:
+            return self.subtree(prefix)
+        node = self.root
+        for segment in segments[:-1]:
+            node = self._child(node.children, segment)
+            if node is None:
+                return iter(())
+        path = node.path
+        start = segments[-1]
+        children = [
+            (path + (segment, ), child) for segment, child in six.iteritems(
+                node.children or {}
+            ) if six.text_type(segment).startswith(start)
+        ]
+        children.sort(key=lambda item: _segment_key(item[0][-1]))
+        return self._walk(children)
+
+    def uris(self):
+        """Return the URIs of the schemas which registered fields."""
+        return list(self._uris)
+
+    def json_pointer(self, path):
+        """Return the JSON pointer of a registered path.
+
+        The pointer is cached in the trie, so it is built only once.
+
+        :param path: Tuple with path to a registered field.
+        """
+        node = self._find(path)
+        if node is None or not node.registered:
+            raise KeyError(path)
+        return node.pointer
+
+    def __getitem__(self, path):
+        """Return the field registered under the path."""
+        node = self._find(path)
+        if node is None or not node.registered:
+            raise KeyError(path)
+        return self._field(node, tuple(path))
+
+    def get(self, path, default=None):
+        """Return the field registered under the path or the default."""
+        node = self._find(path)
+        if node is None or not node.registered:
+            return default
+        return self._field(node, tuple(path))
+
+    def __contains__(self, path):
+        """Check if a field is registered under the path."""
+        node = self._find(path)
+        return node is not None and node.registered
+
+    def __setitem__(self, path, field):
+        """Register a field under the path."""
+        node = self._insert(path)
+        uri_id = self._uri_ids.get(field.schema_index)
+        if uri_id is None:
+            uri_id = self._uri_ids[field.schema_index] = len(self._uris)
+            self._uris.append(field.schema_index)
+        if not node.registered:
+            self._count += 1
+        node.uri_id = uri_id
+        field_type = field.field_type
+        if isinstance(field_type, six.string_types):
+            field_type = self._types.setdefault(field_type, field_type)
+        node.field_type = field_type
+
+    def __delitem__(self, path):
+        """Remove the field registered under the path."""
+        node = self._find(path)
+        if node is None or not node.registered:
+            raise KeyError(path)
+        node.uri_id = _UNREGISTERED
+        node.field_type = None
+        self._count -= 1
+
+        while node.parent is not None and not node.registered \
+                and not node.children:
+            parent = node.parent
+            del parent.children[node.segment]
+            if not parent.children:
+                parent.children = None
+            node = parent
+
+    def __iter__(self):
+        """Iterate over the registered paths, depth first."""
+        stack = [(self.root, ())]
+        while stack:
+            node, path = stack.pop()
+            if node.registered:
+                yield path
+            if node.children:
+                stack.extend(
+                    (child, path + (segment, ))
+                    for segment, child in six.iteritems(node.children)
+                )
+
+    def __len__(self):
+        """Return the number of registered fields."""
+        return self._count
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Conflict report module.
+
+Conflicts collected by a :class:`~doschema.validation.JSONSchemaValidator`
+created with ``collect_conflicts=True`` are written as JSON lines, one
+conflict per line, while the results are produced. A large batch of schemas
+is thus reported without keeping all its conflicts in memory.
+"""
+
+import json
+
+
+def iter_conflicts(results):
+    """Return the conflicts of validation results, in order.
+
+    :param results: Iterable of :class:`~doschema.validation.ValidationResult`.
+    """
+    for result in results:
+        for conflict in result.conflicts:
+            yield conflict
+
+
+def write_json_lines(results, fp):
+    """Write the conflicts of validation results as JSON lines.
+
+    :param results: Iterable of :class:`~doschema.validation.ValidationResult`,
+                    for instance the generator returned by
+                    :meth:`~doschema.validation.JSONSchemaValidator.validate_many`.
+    :param fp: Text file the lines are written to.
+    :returns: Number of written conflicts.
+    """
+    count = 0
+    for conflict in iter_conflicts(results):
+        data = conflict.to_dict()
+        data['message'] = conflict.message
+        fp.write(json.dumps(data, sort_keys=True) + '\n')
+        count += 1
+    return count
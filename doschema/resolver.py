@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Reference resolvers module.
+
+:mod:`jsonschema` takes long to import, so it is only imported when one of
+its resolvers is created or when a reference cannot be resolved.
+:class:`LocalRefResolver` resolves references within the documents it is
+given without using :mod:`jsonschema` at all::
+
+    validator = JSONSchemaValidator(resolver_factory=LocalRefResolver)
+"""
+
+import os
+
+from six.moves.urllib.parse import unquote, urldefrag, urljoin
+
+
+def path_uri(filename):
+    """Return the ``file`` URI of a file.
+
+    :param filename: Path of the file.
+    """
+    from six.moves.urllib.request import pathname2url
+    return 'file://' + pathname2url(os.path.abspath(filename))
+
+
+def resolution_error():
+    """Return the exception raised when a reference cannot be resolved.
+
+    The exception is :class:`jsonschema.RefResolutionError`, whatever the
+    resolver is. The expression of an ``except`` clause is only evaluated
+    when an exception is raised, so ``except resolution_error():`` does not
+    import :mod:`jsonschema` otherwise.
+    """
+    import jsonschema
+    return jsonschema.RefResolutionError
+
+
+def default_resolver_factory(base_uri, referrer):
+    """Create a :class:`jsonschema.RefResolver`.
+
+    :param base_uri: URI of the referring document.
+    :param referrer: Referring document.
+    """
+    import jsonschema
+    return jsonschema.RefResolver(base_uri=base_uri, referrer=referrer)
+
+
+class LocalRefResolver(object):
+    """Resolver of references within known documents.
+
+    Documents are never retrieved, a reference to a document which is not
+    in :attr:`store` raises :func:`resolution_error`. The resolver provides
+    the ``store``, ``push_scope``, ``pop_scope`` and ``resolve`` members of
+    :class:`jsonschema.RefResolver` used by the validator and by
+    :func:`~doschema.transform.resolve_references`.
+    """
+
+    def __init__(self, base_uri, referrer, store=()):
+        """Constructor.
+
+        :param base_uri: URI of the referring document.
+        :param referrer: Referring document.
+        :param store: Mapping or iterable of ``(uri, document)`` tuples of
+                      the other known documents.
+        """
+        self.referrer = referrer
+        self.store = dict(store)
+        """Dict of the URIs of the known documents to the documents."""
+        self.store[urldefrag(base_uri)[0]] = referrer
+        self._scopes_stack = [base_uri]
+
+    @property
+    def resolution_scope(self):
+        """URI against which references are resolved."""
+        return self._scopes_stack[-1]
+
+    @property
+    def base_uri(self):
+        """URI of the document of the resolution scope."""
+        return urldefrag(self.resolution_scope)[0]
+
+    def push_scope(self, scope):
+        """Enter a new resolution scope, relative to the current one."""
+        self._scopes_stack.append(urljoin(self.resolution_scope, scope))
+
+    def pop_scope(self):
+        """Leave the current resolution scope."""
+        self._scopes_stack.pop()
+
+    def resolve(self, ref):
+        """Resolve a reference.
+
+        :param ref: Value of the ``$ref`` keyword.
+        :returns: Tuple with the URL of the reference and its schema.
+        """
+        url = urljoin(self.resolution_scope, ref)
+        return url, self.resolve_from_url(url)
+
+    def resolve_from_url(self, url):
+        """Return the schema of an absolute URL in the known documents."""
+        document_url, fragment = urldefrag(url)
+        try:
+            document = self.store[document_url]
+        except KeyError:
+            raise resolution_error()(
+                '{0} is not a local document.'.format(document_url)
+            )
+        return self.resolve_fragment(document, fragment)
+
+    @staticmethod
+    def resolve_fragment(document, fragment):
+        """Return the part of a document a JSON pointer fragment points to.
+
+        :param document: Referenced document.
+        :param fragment: Fragment of the reference, without ``#``.
+        """
+        fragment = unquote(fragment).lstrip('/')
+        parts = fragment.split('/') if fragment else []
+        for part in parts:
+            part = part.replace('~1', '/').replace('~0', '~')
+            if isinstance(document, list):
+                try:
+                    part = int(part)
+                except ValueError:
+                    pass
+            try:
+                document = document[part]
+            except (TypeError, LookupError):
+                raise resolution_error()(
+                    'Unresolvable JSON pointer: {0!r}'.format(fragment)
+                )
+        return document
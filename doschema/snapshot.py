@@ -0,0 +1,305 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+"""Registry snapshot module.
+
+A snapshot stores the fields registered by a
+:class:`~doschema.validation.JSONSchemaValidator` so that they can be loaded
+back instead of validating all the previous schemas again. The file contains
+a header, a table of fixed size records sorted by field path, the encoded
+paths and a JSON trailer holding the URIs and types the records point to.
+The file is memory-mapped when loaded and a record is decoded only when its
+field is looked up.
+"""
+
+import json
+import mmap
+import os
+import struct
+
+try:
+    from collections.abc import Mapping, MutableMapping
+except ImportError:  # pragma: no cover
+    from collections import Mapping, MutableMapping
+
+from doschema.errors import DoSchemaError
+from doschema.validation import FieldToAdd
+
+MAGIC = b'DOSCHEMA'
+"""Bytes starting every snapshot file."""
+
+VERSION = 1
+"""Version of the snapshot format."""
+
+_HEADER = struct.Struct('<8sIIQQ')
+"""Magic, version, number of fields, offset of paths and of the trailer."""
+
+_RECORD = struct.Struct('<QIIH')
+"""Offset and length of the encoded path, URI index and type index."""
+
+
+def encode_path(path):
+    """Encode a field path as it is stored in a snapshot.
+
+    :param path: Tuple with path to a field.
+    """
+    return json.dumps(
+        list(path), ensure_ascii=False, separators=(',', ':')
+    ).encode('utf-8')
+
+
+def decode_path(data):
+    """Decode a field path stored in a snapshot.
+
+    :param data: Bytes returned by :func:`encode_path`.
+    """
+    return tuple(json.loads(data.decode('utf-8')))
+
+
+def dump_registry(validator, filename):
+    """Write the registry of a validator to a snapshot file.
+
+    The file is written next to its final location and then renamed, so a
+    snapshot which is memory-mapped by a running process is not modified.
+
+    :param validator: :class:`~doschema.validation.JSONSchemaValidator`
+                      whose registry is saved.
+    :param filename: Path of the snapshot file.
+    """
+    uris = {}
+    types = {}
+    untyped = []
+    records = sorted(
+        (encode_path(path), field)
+        for path, field in validator.fields_types_dict.items()
+    )
+
+    index = []
+    paths = []
+    offset = 0
+    for position, (key, field) in enumerate(records):
+        uri_id = uris.setdefault(field.schema_index, len(uris))
+        type_key = json.dumps(field.field_type)
+        type_id = types.setdefault(type_key, len(types))
+        if field.field_type is None:
+            untyped.append(position)
+        index.append(_RECORD.pack(offset, len(key), uri_id, type_id))
+        paths.append(key)
+        offset += len(key)
+
+    trailer = json.dumps({
+        'uris': sorted(uris, key=uris.get),
+        'types': [json.loads(key) for key in sorted(types, key=types.get)],
+        'untyped': untyped,
+    }).encode('utf-8')
+
+    paths_offset = _HEADER.size + _RECORD.size * len(records)
+    trailer_offset = paths_offset + offset
+
+    tmp_filename = filename + '.tmp'
+    with open(tmp_filename, 'wb') as fp:
+        fp.write(_HEADER.pack(
+            MAGIC, VERSION, len(records), paths_offset, trailer_offset
+        ))
+        fp.write(b''.join(index))
+        fp.write(b''.join(paths))
+        fp.write(trailer)
+    getattr(os, 'replace', os.rename)(tmp_filename, filename)
+
+
+def load_registry(validator, filename):
+    """Replace the registry of a validator with a snapshot file.
+
+    Fields registered afterwards are kept in memory on top of the snapshot,
+    which itself is not modified.
+
+    :param validator: :class:`~doschema.validation.JSONSchemaValidator`
+                      receiving the registry.
+    :param filename: Path of a file written by :func:`dump_registry`.
+    :returns: The loaded :class:`RegistrySnapshot`.
+    """
+    snapshot = RegistrySnapshot(filename)
+    validator.set_registry(
+        SnapshotRegistry(snapshot), snapshot.untyped_paths()
+    )
+    return snapshot
+
+
+class SnapshotError(DoSchemaError):
+    """Exception raised when a file is not a valid registry snapshot."""
+
+    pass
+
+
+class RegistrySnapshot(Mapping):
+    """Read-only mapping of field paths to fields stored in a snapshot."""
+
+    def __init__(self, filename):
+        """Constructor.
+
+        :param filename: Path of a file written by :func:`dump_registry`.
+        """
+        with open(filename, 'rb') as fp:
+            self._mmap = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, self._count, self._paths_offset, trailer_offset = \
+            _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise SnapshotError(
+                '{0} is not a registry snapshot.'.format(filename)
+            )
+
+        trailer = json.loads(self._mmap[trailer_offset:].decode('utf-8'))
+        self._uris = trailer['uris']
+        self._types = trailer['types']
+        self._untyped = trailer['untyped']
+
+    def close(self):
+        """Release the memory-mapped file."""
+        self._mmap.close()
+
+    def untyped_paths(self):
+        """Return the paths of the fields stored without a type."""
+        return [self._key(position) for position in self._untyped]
+
+    def _record(self, position):
+        """Return offset, length, URI index and type index of a record."""
+        return _RECORD.unpack_from(
+            self._mmap, _HEADER.size + _RECORD.size * position
+        )
+
+    def _raw_key(self, position):
+        """Return the encoded path of a record."""
+        offset, length, _, _ = self._record(position)
+        offset += self._paths_offset
+        return self._mmap[offset:offset + length]
+
+    def _key(self, position):
+        """Return the path of a record."""
+        return decode_path(self._raw_key(position))
+
+    def _find(self, path):
+        """Return the position of the record of a path or None."""
+        try:
+            key = encode_path(path)
+        except TypeError:
+            return None
+
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            if self._raw_key(middle) < key:
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._count and self._raw_key(low) == key:
+            return low
+        return None
+
+    def __getitem__(self, path):
+        """Return the field registered under the path."""
+        position = self._find(path)
+        if position is None:
+            raise KeyError(path)
+        _, _, uri_id, type_id = self._record(position)
+        return FieldToAdd(
+            self._uris[uri_id], tuple(path), self._types[type_id]
+        )
+
+    def __contains__(self, path):
+        """Check if a field is registered under the path."""
+        return self._find(path) is not None
+
+    def __iter__(self):
+        """Iterate over the paths, in the order of their encoding."""
+        for position in range(self._count):
+            yield self._key(position)
+
+    def __len__(self):
+        """Return the number of stored fields."""
+        return self._count
+
+
+class SnapshotRegistry(MutableMapping):
+    """Registry keeping changes in memory on top of a snapshot."""
+
+    def __init__(self, snapshot):
+        """Constructor.
+
+        :param snapshot: :class:`RegistrySnapshot` with the previous fields.
+        """
+        self.snapshot = snapshot
+        """Snapshot holding the fields loaded from a file."""
+        self._changes = {}
+        self._deleted = set()
+
+    def __getitem__(self, path):
+        """Return the field registered under the path."""
+        try:
+            return self._changes[path]
+        except KeyError:
+            if path in self._deleted:
+                raise
+        return self.snapshot[path]
+
+    def get(self, path, default=None):
+        """Return the field registered under the path or the default."""
+        try:
+            return self[path]
+        except KeyError:
+            return default
+
+    def __contains__(self, path):
+        """Check if a field is registered under the path."""
+        if path in self._changes:
+            return True
+        return path not in self._deleted and path in self.snapshot
+
+    def __setitem__(self, path, field):
+        """Register a field under the path."""
+        self._changes[path] = field
+        self._deleted.discard(path)
+
+    def __delitem__(self, path):
+        """Remove the field registered under the path."""
+        if path not in self:
+            raise KeyError(path)
+        self._changes.pop(path, None)
+        if path in self.snapshot:
+            self._deleted.add(path)
+
+    def __iter__(self):
+        """Iterate over the registered paths."""
+        for path in self._changes:
+            yield path
+        for path in self.snapshot:
+            if path not in self._changes and path not in self._deleted:
+                yield path
+
+    def __len__(self):
+        """Return the number of registered fields."""
+        return len(self.snapshot) - len(self._deleted) + sum(
+            1 for path in self._changes if path not in self.snapshot
+        )
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Statistics module.
+
+A :class:`Stats` collector can be given to
+:class:`~doschema.validation.JSONSchemaValidator` and to
+:func:`~doschema.transform.resolve_references`. Without one, nothing is
+counted nor timed.
+"""
+
+import collections
+import time
+
+timer = getattr(time, 'perf_counter', time.time)
+"""Clock used to time the keyword handlers and the schemas."""
+
+
+class Stats(object):
+    """Counters and timers of validation and reference resolution."""
+
+    def __init__(self):
+        """Constructor."""
+        self.nodes = 0
+        """Number of schema nodes visited."""
+        self.ref_hits = 0
+        """Number of references found in the cache of resolved ones."""
+        self.ref_misses = 0
+        """Number of references retrieved with a resolver."""
+        self.keyword_calls = collections.defaultdict(int)
+        """Number of calls of the handler of each keyword."""
+        self.keyword_seconds = collections.defaultdict(float)
+        """Time spent in the handler of each keyword."""
+        self.schemas = 0
+        """Number of processed schemas."""
+        self.schemas_seconds = 0.0
+        """Time spent processing all the schemas."""
+        self.schema_seconds = collections.OrderedDict()
+        """Time spent processing each schema, by URI."""
+        self.registry_size = 0
+        """Number of registered fields after the last schema."""
+
+    def add_time(self, keyword, seconds):
+        """Add the duration of one call of a keyword handler.
+
+        :param keyword: Keyword the handler processes.
+        :param seconds: Duration of the call.
+        """
+        self.keyword_calls[keyword] += 1
+        self.keyword_seconds[keyword] += seconds
+
+    def timed(self, keyword, func, *args):
+        """Call a keyword handler and add the time it took.
+
+        :param keyword: Keyword the handler processes.
+        :param func: Handler called with ``args``.
+        :returns: Value returned by the handler.
+        """
+        start = timer()
+        try:
+            return func(*args)
+        finally:
+            self.add_time(keyword, timer() - start)
+
+    def add_schema(self, uri, seconds, registry_size=None):
+        """Add the duration of processing one schema.
+
+        :param uri: URI of the schema.
+        :param seconds: Wall time spent on the schema.
+        :param registry_size: Number of registered fields afterwards, if the
+                              schema was validated.
+        """
+        self.schemas += 1
+        self.schemas_seconds += seconds
+        self.schema_seconds[uri] = seconds
+        if registry_size is not None:
+            self.registry_size = registry_size
+
+    def to_dict(self):
+        """Return the statistics as a JSON serializable dict."""
+        return {
+            'nodes': self.nodes,
+            'ref_hits': self.ref_hits,
+            'ref_misses': self.ref_misses,
+            'keyword_calls': dict(self.keyword_calls),
+            'keyword_seconds': dict(self.keyword_seconds),
+            'schemas': self.schemas,
+            'schemas_seconds': self.schemas_seconds,
+            'schema_seconds': dict(self.schema_seconds),
+            'registry_size': self.registry_size,
+        }
+
+    def to_prometheus(self, prefix='doschema'):
+        """Return the statistics in the Prometheus text exposition format.
+
+        The time of each schema is not exported, only their count and sum.
+
+        :param prefix: Prefix of the metric names.
+        """
+        lines = []
+
+        def metric(name, metric_type, help_text, samples):
+            name = '{0}_{1}'.format(prefix, name)
+            lines.append('# HELP {0} {1}'.format(name, help_text))
+            lines.append('# TYPE {0} {1}'.format(name, metric_type))
+            for suffix, labels, value in samples:
+                lines.append('{0}{1}{2} {3}'.format(
+                    name, suffix, _format_labels(labels), value
+                ))
+
+        metric('nodes_total', 'counter', 'Schema nodes visited.', [
+            ('', {}, self.nodes)
+        ])
+        metric('ref_resolutions_total', 'counter', 'References resolved.', [
+            ('', {'result': 'hit'}, self.ref_hits),
+            ('', {'result': 'miss'}, self.ref_misses),
+        ])
+        metric('keyword_calls_total', 'counter', 'Keyword handler calls.', [
+            ('', {'keyword': keyword}, calls)
+            for keyword, calls in sorted(self.keyword_calls.items())
+        ])
+        metric('keyword_seconds_total', 'counter',
+               'Time spent in keyword handlers.', [
+                   ('', {'keyword': keyword}, seconds)
+                   for keyword, seconds in sorted(self.keyword_seconds.items())
+               ])
+        metric('schema_seconds', 'summary', 'Time spent per schema.', [
+            ('_count', {}, self.schemas),
+            ('_sum', {}, self.schemas_seconds),
+        ])
+        metric('registry_fields', 'gauge', 'Registered fields.', [
+            ('', {}, self.registry_size)
+        ])
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(labels):
+    """Format the labels of a Prometheus sample.
+
+    :param labels: Dict of label names to values.
+    """
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{0}="{1}"'.format(name, value.replace('\\', '\\\\')
+                           .replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in sorted(labels.items())
+    ) + '}'
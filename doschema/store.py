@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Offline schema store.
+
+A :class:`SchemaStore` indexes the JSON schemas found in local directories
+by their path and by their ``$id`` or ``id``. Referenced schemas are then
+resolved from the store without any network access::
+
+    store = SchemaStore(['schemas'], index_file='schemas-index.json')
+    validator = JSONSchemaValidator(resolver_factory=store.resolver)
+    resolve_references(schema, uri, store.resolver(uri, schema))
+
+Schemas are parsed when they are first referenced. With an ``index_file``,
+the identifiers of the schemas are saved, and later stores only parse the
+files which changed since.
+"""
+
+import json
+import os
+
+import six
+from six.moves.urllib.parse import urldefrag, urljoin
+from six.moves.urllib.request import pathname2url
+
+from doschema.resolver import LocalRefResolver, path_uri, resolution_error
+
+INDEX_VERSION = 1
+"""Version of the format of the index files."""
+
+
+def _read_json(filename):
+    """Return the parsed content of a JSON file."""
+    with open(filename, 'rb') as fp:
+        return json.loads(fp.read().decode('utf-8'))
+
+
+def document_id(document):
+    """Return the ``$id`` or ``id`` of a schema or None.
+
+    :param document: Schema or any JSON document.
+    """
+    if isinstance(document, dict):
+        for keyword in ('$id', 'id'):
+            value = document.get(keyword)
+            if isinstance(value, six.string_types):
+                return value
+    return None
+
+
+class SchemaStore(object):
+    """Local schemas indexed by URI and loaded on first use."""
+
+    def __init__(self, directories=(), index_file=None):
+        """Constructor.
+
+        :param directories: Directories to scan, as paths or as tuples of a
+                            path and the base URI its files are published
+                            under.
+        :param index_file: File keeping the identifiers of the schemas
+                           between runs. If not provided all the schemas are
+                           parsed when scanned, to read their identifiers.
+        """
+        self.index_file = index_file
+        self._files = {}
+        self._documents = {}
+        self._index = {}
+        if index_file is not None:
+            self._index = self._read_index(index_file)
+
+        self._directories = []
+        seen = set()
+        changed = False
+        for directory in directories:
+            if isinstance(directory, tuple):
+                directory, base_uri = directory
+            else:
+                base_uri = None
+            self._directories.append((os.path.abspath(directory), base_uri))
+            changed |= self._scan(directory, base_uri, seen)
+
+        stale = set(self._index) - seen
+        for filename in stale:
+            del self._index[filename]
+        if index_file is not None and (changed or stale):
+            self.save_index()
+
+    @staticmethod
+    def _read_index(index_file):
+        """Return the entries of an index file or an empty index."""
+        try:
+            with open(index_file, 'rb') as fp:
+                data = json.loads(fp.read().decode('utf-8'))
+        except (IOError, OSError, ValueError):
+            return {}
+        if data.get('version') != INDEX_VERSION:
+            return {}
+        return data['files']
+
+    def _scan(self, directory, base_uri, seen):
+        """Index the schemas of a directory.
+
+        :param directory: Directory to scan.
+        :param base_uri: Base URI of the files of the directory or None.
+        :param seen: Set receiving the names of the indexed files.
+        :returns: True if the index changed.
+        """
+        changed = False
+        directory = os.path.abspath(directory)
+        index_file = self.index_file and os.path.abspath(self.index_file)
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for name in sorted(files):
+                if not name.endswith('.json'):
+                    continue
+                filename = os.path.join(root, name)
+                if filename == index_file:
+                    continue
+                changed |= self._add_file(filename, directory, base_uri, seen)
+        return changed
+
+    def _add_file(self, filename, directory, base_uri, seen):
+        """Index one schema file.
+
+        :param filename: Absolute path of the file.
+        :param directory: Scanned directory containing the file.
+        :param base_uri: Base URI of the files of the directory or None.
+        :param seen: Set receiving the names of the indexed files.
+        :returns: True if the index changed.
+        """
+        changed = False
+        entry = self._index.get(filename)
+        if filename not in seen:
+            seen.add(filename)
+            stat = os.stat(filename)
+            metadata = [stat.st_mtime, stat.st_size]
+            if entry is None or entry[:2] != metadata:
+                # Only the identifier is kept, the document is loaded again
+                # when it is first referenced.
+                try:
+                    document = _read_json(filename)
+                except ValueError:
+                    # Reported if the file is referenced.
+                    document = None
+                entry = metadata + [document_id(document)]
+                self._index[filename] = entry
+                changed = True
+
+        uri = path_uri(filename)
+        self._files.setdefault(uri, filename)
+        if base_uri is not None:
+            relative = os.path.relpath(filename, directory)
+            uri = urljoin(base_uri, pathname2url(relative))
+            self._files.setdefault(uri, filename)
+        if entry[2] is not None:
+            self._files.setdefault(
+                urldefrag(urljoin(uri, entry[2]))[0], filename
+            )
+        return changed
+
+    def update(self, filename):
+        """Index again a schema file which was modified, added or removed.
+
+        The loaded content of the file is dropped, so the file is read again
+        when it is next referenced.
+
+        :param filename: Path of the file.
+        """
+        filename = os.path.abspath(filename)
+        self._documents.pop(filename, None)
+        self._index.pop(filename, None)
+        for uri in [uri for uri, name in six.iteritems(self._files)
+                    if name == filename]:
+            del self._files[uri]
+
+        if os.path.isfile(filename):
+            seen = set()
+            for directory, base_uri in self._directories:
+                if filename.startswith(os.path.join(directory, '')):
+                    self._add_file(filename, directory, base_uri, seen)
+        if self.index_file is not None:
+            self.save_index()
+
+    def save_index(self):
+        """Write the identifiers of the schemas to the index file."""
+        data = json.dumps({'version': INDEX_VERSION, 'files': self._index})
+        tmp_filename = '{0}.{1}.tmp'.format(self.index_file, os.getpid())
+        with open(tmp_filename, 'wb') as fp:
+            fp.write(data.encode('utf-8'))
+        getattr(os, 'replace', os.rename)(tmp_filename, self.index_file)
+
+    def __getstate__(self):
+        """Pickle the store without the loaded schemas."""
+        state = self.__dict__.copy()
+        state['_documents'] = {}
+        return state
+
+    def __contains__(self, uri):
+        """Check if a schema is stored under the URI."""
+        return urldefrag(uri)[0] in self._files
+
+    def __len__(self):
+        """Return the number of stored schemas."""
+        return len(set(self._files.values()))
+
+    def uris(self):
+        """Return the URIs of the stored schemas."""
+        return sorted(self._files)
+
+    def filename(self, uri):
+        """Return the file of the schema stored under the URI or None.
+
+        :param uri: URI of the schema. A fragment is ignored.
+        """
+        return self._files.get(urldefrag(uri)[0])
+
+    def load(self, uri):
+        """Return the schema stored under the URI.
+
+        :param uri: URI of the schema. A fragment is ignored.
+        :raises KeyError: If no schema is stored under the URI.
+        """
+        filename = self._files[urldefrag(uri)[0]]
+        try:
+            return self._documents[filename]
+        except KeyError:
+            document = self._documents[filename] = _read_json(filename)
+            return document
+
+    def resolver(self, base_uri, referrer):
+        """Return a resolver retrieving the referenced schemas from the store.
+
+        The method can be given as ``resolver_factory`` to
+        :class:`~doschema.validation.JSONSchemaValidator`.
+
+        :param base_uri: URI of the referring document.
+        :param referrer: Referring document.
+        """
+        return StoreRefResolver(base_uri, referrer, self)
+
+
+class StoreRefResolver(LocalRefResolver):
+    """Resolver retrieving documents from a :class:`SchemaStore` only."""
+
+    def __init__(self, base_uri, referrer, schema_store, store=()):
+        """Constructor.
+
+        :param base_uri: URI of the referring document.
+        :param referrer: Referring document.
+        :param schema_store: :class:`SchemaStore` holding the documents.
+        :param store: Mapping or iterable of ``(uri, document)`` tuples of
+                      the other known documents.
+        """
+        super(StoreRefResolver, self).__init__(base_uri, referrer, store)
+        self.schema_store = schema_store
+
+    def resolve_from_url(self, url):
+        """Return the schema of a URL, loading its document from the store.
+
+        The network is never accessed.
+        """
+        document_url = urldefrag(url)[0]
+        if document_url not in self.store:
+            try:
+                self.store[document_url] = self.schema_store.load(document_url)
+            except KeyError:
+                raise resolution_error()(
+                    '{0} is not in the schema store.'.format(document_url)
+                )
+        return super(StoreRefResolver, self).resolve_from_url(url)
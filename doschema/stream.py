@@ -0,0 +1,398 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Streaming schema ingestion.
+
+:func:`load_structure` reads a schema file in chunks and keeps only what
+:class:`~doschema.validation.JSONSchemaValidator` looks at. Descriptions,
+examples and the other keywords are skipped without being decoded, and
+every ``enum`` is reduced to one value of each of its types, so memory is
+used for the structure of the schema and not for the size of the file.
+
+Subschemas under ``definitions`` and ``$defs`` are kept, as well as ``id``
+and ``$id``, so that references within the file can be resolved. References
+pointing to other parts of the file are not supported.
+"""
+
+import io
+import json
+import re
+
+import six
+
+from doschema.resolver import path_uri
+
+(_SKIP, _ANY, _SCHEMA, _SCHEMA_MAP, _SCHEMA_LIST, _ITEMS, _ENUM,
+ _DEPENDENCIES, _DEPENDENCY) = range(9)
+"""Modes telling which part of a value is kept."""
+
+SCHEMA_KEYWORDS = {
+    'type': _ANY,
+    '$ref': _ANY,
+    'id': _ANY,
+    '$id': _ANY,
+    'properties': _SCHEMA_MAP,
+    'definitions': _SCHEMA_MAP,
+    '$defs': _SCHEMA_MAP,
+    'items': _ITEMS,
+    'additionalItems': _SCHEMA,
+    'allOf': _SCHEMA_LIST,
+    'anyOf': _SCHEMA_LIST,
+    'oneOf': _SCHEMA_LIST,
+    'enum': _ENUM,
+    'dependencies': _DEPENDENCIES,
+}
+"""Keywords of a schema which are kept, with the mode of their value."""
+
+_OBJECT_MODES = {
+    _ANY: _ANY,
+    _SCHEMA: _SCHEMA,
+    _ITEMS: _SCHEMA,
+    _DEPENDENCY: _SCHEMA,
+    _SCHEMA_MAP: _SCHEMA_MAP,
+    _DEPENDENCIES: _DEPENDENCIES,
+}
+"""Mode of an object found where a value of a given mode is expected."""
+
+_ARRAY_MODES = {
+    _ANY: _ANY,
+    _SCHEMA: _ANY,
+    _ITEMS: _SCHEMA_LIST,
+    _SCHEMA_LIST: _SCHEMA_LIST,
+    _DEPENDENCY: _ANY,
+}
+"""Mode of an array found where a value of a given mode is expected."""
+
+_ELEMENT_MODES = {
+    _ANY: _ANY,
+    _SCHEMA_LIST: _SCHEMA,
+}
+"""Mode of the elements of an array of a given mode."""
+
+_MEMBER_MODES = {
+    _ANY: _ANY,
+    _SCHEMA_MAP: _SCHEMA,
+    _DEPENDENCIES: _DEPENDENCY,
+}
+"""Mode of the members of an object of a given mode, except schemas."""
+
+_SKIPPED = object()
+"""Value standing for a skipped member."""
+
+_OPENED = object()
+"""Value standing for the start of an object or an array."""
+
+_WHITESPACE = ' \t\n\r'
+_STRING_STOP = re.compile(r'["\\]')
+_SCALAR_STOP = re.compile(r'[\s,\]}]')
+_CONTAINER_RUN = re.compile(r'(?:[^\[\]{}"]+|"[^"\\]*(?:\\.[^"\\]*)*")*')
+# Runs are bounded, as the regular expression engine uses memory for every
+# repetition.
+_STRING_RUN = re.compile(r'(?:\s*"[^"\\]*(?:\\.[^"\\]*)*"\s*,){1,256}')
+_INTEGER_RUN = re.compile(r'(?:\s*-?[0-9]+\s*,){1,256}')
+
+
+class _Scanner(object):
+    """Reader of JSON text keeping only one chunk in memory."""
+
+    def __init__(self, fp, chunk_size):
+        """Constructor.
+
+        :param fp: Text file to read.
+        :param chunk_size: Number of characters read at once.
+        """
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.pos = 0
+
+    def fill(self):
+        """Read the next chunk, keeping the characters not consumed yet.
+
+        :returns: False at the end of the file.
+        """
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def _need_more(self):
+        """Read the next chunk or fail at the end of the file."""
+        if not self.fill():
+            raise ValueError('Unexpected end of JSON data.')
+
+    def peek(self):
+        """Skip whitespace and return the next character."""
+        while True:
+            buffer = self.buffer
+            pos = self.pos
+            while pos < len(buffer) and buffer[pos] in _WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            self._need_more()
+
+    def expect(self, char):
+        """Consume the next character, which has to be ``char``."""
+        if self.peek() != char:
+            raise ValueError('Expected {0!r} at {1!r}.'.format(
+                char, self.buffer[self.pos:self.pos + 20]
+            ))
+        self.pos += 1
+
+    def read_string(self):
+        """Read and decode the string starting at the next character."""
+        self.expect('"')
+        parts = []
+        while True:
+            match = _STRING_STOP.search(self.buffer, self.pos)
+            if match is None:
+                parts.append(self.buffer[self.pos:])
+                self.pos = len(self.buffer)
+                self._need_more()
+                continue
+            start = match.start()
+            if match.group() == '"':
+                parts.append(self.buffer[self.pos:start])
+                self.pos = start + 1
+                return json.loads('"' + ''.join(parts) + '"')
+            # An escape sequence, which is decoded with the whole string.
+            length = 6 if self.buffer[start + 1:start + 2] == 'u' else 2
+            if start + length > len(self.buffer):
+                parts.append(self.buffer[self.pos:start])
+                self.pos = start
+                self._need_more()
+                continue
+            parts.append(self.buffer[self.pos:start + length])
+            self.pos = start + length
+
+    def skip_string(self):
+        """Skip the string starting at the next character."""
+        self.expect('"')
+        while True:
+            match = _STRING_STOP.search(self.buffer, self.pos)
+            if match is None:
+                self.pos = len(self.buffer)
+                self._need_more()
+                continue
+            start = match.start()
+            if match.group() == '"':
+                self.pos = start + 1
+                return
+            if start + 2 > len(self.buffer):
+                self.pos = start
+                self._need_more()
+                continue
+            self.pos = start + 2
+
+    def read_scalar(self):
+        """Read a number, ``true``, ``false`` or ``null``."""
+        self.peek()
+        parts = []
+        while True:
+            match = _SCALAR_STOP.search(self.buffer, self.pos)
+            if match is None:
+                parts.append(self.buffer[self.pos:])
+                self.pos = len(self.buffer)
+                if not self.fill():
+                    break
+                continue
+            parts.append(self.buffer[self.pos:match.start()])
+            self.pos = match.start()
+            break
+        return json.loads(''.join(parts))
+
+    def skip_value(self):
+        """Skip the value starting at the next character."""
+        char = self.peek()
+        if char == '"':
+            self.skip_string()
+        elif char not in '{[':
+            self.read_scalar()
+        else:
+            self.pos += 1
+            depth = 1
+            while depth:
+                # Skip at once what is neither a bracket nor an unfinished
+                # string.
+                self.pos = _CONTAINER_RUN.match(self.buffer, self.pos).end()
+                if self.pos == len(self.buffer):
+                    self._need_more()
+                    continue
+                char = self.buffer[self.pos]
+                if char == '"':
+                    self.skip_string()
+                    continue
+                self.pos += 1
+                depth += 1 if char in '{[' else -1
+
+    def read_enum(self):
+        """Read the rest of an array, keeping one value of each type.
+
+        Runs of strings or of integers in the current chunk are skipped at
+        once, so long enums are read quickly.
+
+        :returns: List of one value of each type, where every value is
+                  replaced by the empty or zero value of its type, or None.
+        """
+        values = []
+        types = set()
+        while True:
+            char = self.peek()
+            if char == ']':
+                self.pos += 1
+                return values
+            elif char == ',':
+                self.pos += 1
+                continue
+            elif char == '"':
+                match = _STRING_RUN.match(self.buffer, self.pos)
+                if match is None:
+                    self.skip_string()
+                else:
+                    self.pos = match.end()
+                value = six.text_type()
+            elif char in '{[':
+                self.skip_value()
+                value = {} if char == '{' else []
+            else:
+                match = _INTEGER_RUN.match(self.buffer, self.pos)
+                if match is None:
+                    value = self.read_scalar()
+                    if value is not None:
+                        value = type(value)()
+                else:
+                    self.pos = match.end()
+                    value = 0
+            if type(value) not in types:
+                types.add(type(value))
+                values.append(value)
+
+
+def _read_value(scanner, mode):
+    """Read a scalar or a skipped value, or open a container.
+
+    :param scanner: :class:`_Scanner` positioned before the value.
+    :param mode: Mode of the value.
+    :returns: Tuple with the value, or ``_OPENED`` if the value is a
+              container which is read next, and the character starting it.
+    """
+    char = scanner.peek()
+    if mode == _SKIP:
+        scanner.skip_value()
+        return _SKIPPED, char
+    if mode == _ENUM and char == '[':
+        scanner.pos += 1
+        return scanner.read_enum(), char
+    if char in '{[':
+        scanner.pos += 1
+        return _OPENED, char
+    if char == '"':
+        return scanner.read_string(), char
+    return scanner.read_scalar(), char
+
+
+def load_structure(fp, chunk_size=64 * 1024):
+    """Read the parts of a schema used by the validator.
+
+    The schema is read without recursion, so its depth is not limited.
+
+    :param fp: Text file containing the schema.
+    :param chunk_size: Number of characters read at once.
+    :returns: Schema reduced to its structural keywords.
+    """
+    scanner = _Scanner(fp, chunk_size)
+    # Every frame is a list [container, mode, key of the current member].
+    stack = []
+    mode = _SCHEMA
+    while True:
+        value, char = _read_value(scanner, mode)
+        if value is _OPENED:
+            if char == '{':
+                stack.append([{}, _OBJECT_MODES.get(mode, _ANY), None, None])
+            else:
+                stack.append([[], _ARRAY_MODES.get(mode, _ANY), None])
+        else:
+            if not stack:
+                return value
+            _add(stack[-1], value)
+
+        # Close the finished containers and find the next value.
+        while True:
+            frame = stack[-1]
+            container, frame_mode = frame[0], frame[1]
+            char = scanner.peek()
+            if char in '}]':
+                scanner.pos += 1
+                stack.pop()
+                if not stack:
+                    return container
+                _add(stack[-1], container)
+                continue
+            if char == ',':
+                scanner.pos += 1
+            if isinstance(container, dict):
+                frame[2] = key = scanner.read_string()
+                scanner.expect(':')
+                if frame_mode == _SCHEMA:
+                    mode = SCHEMA_KEYWORDS.get(key, _SKIP)
+                else:
+                    mode = _MEMBER_MODES.get(frame_mode, _ANY)
+            else:
+                mode = _ELEMENT_MODES.get(frame_mode, _ANY)
+            break
+
+
+def _add(frame, value):
+    """Add a value to the container of a frame.
+
+    :param frame: Frame of the container, see :func:`load_structure`.
+    :param value: Value read.
+    """
+    container = frame[0]
+    if isinstance(container, dict):
+        if value is not _SKIPPED:
+            container[frame[2]] = value
+    else:
+        container.append(value)
+
+
+def validate_file(validator, filename, uri=None, resolver=None):
+    """Validate a schema file without loading all its content.
+
+    :param validator: :class:`~doschema.validation.JSONSchemaValidator`
+                      checking the schema.
+    :param filename: Path of the schema file.
+    :param uri: URI of the schema. If not provided the ``file`` URI of the
+                file is used.
+    :param resolver: Resolver used to retrieve referenced schemas.
+    :returns: :class:`~doschema.validation.ValidationResult` of the schema.
+    """
+    with io.open(filename, encoding='utf-8') as fp:
+        schema = load_structure(fp)
+    return validator.validate(schema, uri or path_uri(filename), resolver)
@@ -25,11 +25,16 @@
 """Transformation module."""
 
 import copy
-import jsonschema
+
 import six
+from six.moves.urllib.parse import urldefrag
+
+from doschema.resolver import default_resolver_factory
+from doschema.stats import timer
 
 
-def resolve_references(schema, uri='', ref_resolver=None, in_place=False):
+def resolve_references(schema, uri='', ref_resolver=None, in_place=False,
+                       stats=None):
     """Resolve references in schema.
 
     It is assumed that schemas have already been validated for backward
@@ -42,34 +47,67 @@ def resolve_references(schema, uri='', ref_resolver=None, in_place=False):
                          If not provided it will use default.
     :param in_place: If set to False it will not modify given schema.
                           Modified copy of the schema will be returned.
+    :param stats: :class:`~doschema.stats.Stats` counting the visited nodes
+                  and resolved references. If not provided nothing is
+                  measured.
     """
+    if stats is not None:
+        start = timer()
+
     if not in_place:
         schema = copy.deepcopy(schema)
 
     if ref_resolver is None:
-        ref_resolver = jsonschema.RefResolver(base_uri=uri, referrer=schema)
-    return _resolve_references_sub(schema, ref_resolver)
+        ref_resolver = default_resolver_factory(uri, schema)
+    schema = _resolve_references_sub(schema, ref_resolver, stats)
+
+    if stats is not None:
+        stats.add_schema(uri, timer() - start)
+    return schema
+
+
+def _resolve(ref_resolver, ref, stats):
+    """Retrieve a referenced schema.
+
+    A schema from another document is copied, as its references are
+    resolved in place and the document may be shared by several resolvers.
+
+    :param ref_resolver: Resolver used to retrieve referenced schemas.
+    :param ref: Value of the ``$ref`` keyword.
+    :param stats: :class:`~doschema.stats.Stats` or None.
+    """
+    if stats is None:
+        url, resolved = ref_resolver.resolve(ref)
+    else:
+        stats.ref_misses += 1
+        url, resolved = stats.timed('$ref', ref_resolver.resolve, ref)
+    if urldefrag(url)[0] != urldefrag(ref_resolver.base_uri)[0]:
+        resolved = copy.deepcopy(resolved)
+    return resolved
 
 
-def _resolve_references_sub(schema, ref_resolver):
+def _resolve_references_sub(schema, ref_resolver, stats=None):
     """Go through the schema and resolve references.
 
     :param schema: Schema that is currently processed.
     :param ref_resolver: Resolver used to retrieve referenced schemas.
+    :param stats: :class:`~doschema.stats.Stats` or None.
     """
     if isinstance(schema, dict):
+        if stats is not None:
+            stats.nodes += 1
         for key, json_value in six.iteritems(schema):
             if isinstance(json_value, dict):
                 if '$ref' in json_value:
                     ref = json_value.pop('$ref', None)
-                    schema[key] = ref_resolver.resolve(ref)[1]
-            _resolve_references_sub(schema[key], ref_resolver)
+                    schema[key] = _resolve(ref_resolver, ref, stats)
+            _resolve_references_sub(schema[key], ref_resolver, stats)
 
     elif isinstance(schema, list):
         for index, schema_part in enumerate(schema):
             if '$ref' in schema_part:
                 ref = schema_part.pop('$ref', None)
-                schema[index] = ref_resolver.resolve(ref)[1]
-            _resolve_references_sub(schema_part, ref_resolver)
+                schema[index] = _resolve(ref_resolver, ref, stats)
+            _resolve_references_sub(schema_part, ref_resolver, stats)
 
     return schema
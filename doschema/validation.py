@@ -26,12 +26,27 @@
 
 
 import collections
-import logging
+import copy
+import itertools
+import json
 
-import jsonschema
 import six
+from six.moves.urllib.parse import unquote, urldefrag, urljoin
 
 from doschema.errors import JSONSchemaCompatibilityError
+from doschema.plan import CONFLICT, ERROR, OBJECT, TYPED, UNTYPED, FieldPlan, \
+    schema_digest
+from doschema.resolver import default_resolver_factory, resolution_error
+from doschema.stats import timer
+
+_NODE, _TYPE, _PROPERTIES, _DEPENDENCIES, _DEPENDENCY, _LEAVE = range(6)
+"""Steps of a node processed by :meth:`JSONSchemaValidator._walk`."""
+
+_MERGE_KEYWORDS = {TYPED: 'type', UNTYPED: 'dependencies', CONFLICT: 'enum'}
+"""Keywords of the contributions, timed when they are merged."""
+
+_MISSING = object()
+"""Value standing for a schema not contributing to a field yet."""
 
 
 class JSONSchemaValidator(object):
@@ -50,256 +65,1003 @@ class JSONSchemaValidator(object):
         "str": "string"
     }
 
-    def __init__(self, ignore_index=True, resolver_factory=False):
+    def __init__(self, ignore_index=True, resolver_factory=False,
+                 plan_cache=None, collect_conflicts=False, stats=None,
+                 track_references=False):
         """Constructor.
 
         :param ignore_index: If set to True, which is default, it will ignore
                              array indexes.
         :param resolver_factory: Resolver used to retrieve referenced schemas.
-                                 If not provided it will use default.
+                                 If not provided it will use
+                                 :class:`jsonschema.RefResolver`.
+        :param plan_cache: :class:`~doschema.plan.PlanCache` used to reuse the
+                           plans of schemas validated before. If not provided
+                           schemas are always walked.
+        :param collect_conflicts: If set to True, conflicts are not raised
+                                  but all returned in
+                                  :attr:`ValidationResult.conflicts`, and
+                                  conflicting fields are not registered.
+        :param stats: :class:`~doschema.stats.Stats` collecting counters and
+                      timings. If not provided nothing is measured.
+        :param track_references: If set to True, the schemas contributing
+                                 to every field are recorded, so that
+                                 :meth:`remove` can withdraw a schema.
         """
         self.ignore_index = ignore_index
         self.fields_types_dict = {}
         self.uri = None
-        self.resolver_factory = resolver_factory or jsonschema.RefResolver
+        self.resolver_factory = resolver_factory or default_resolver_factory
+        self.plan_cache = plan_cache
+        self.collect_conflicts = collect_conflicts
+        self.stats = stats
+        self._conflicts = []
+        self._resolved_refs = {}
+        self._visited_refs = set()
+        self._active_refs = set()
+        self._documents = set()
+        self._local_refs = set()
+        self._versions = {}
+        self._references = None
+        self._uri_fields = None
+        self._uri_order = None
+        self._uri_counter = itertools.count()
+        self._register_counter = itertools.count()
+        if track_references:
+            self._references = {}
+            self._uri_fields = {}
+            self._uri_order = {}
+        self._untyped_fields = set()
+        self._untyped_in_schema = set()
+        self._journal = []
+        self._reference_journal = []
+
+    def set_registry(self, fields_types_dict, untyped_fields=None):
+        """Replace the fields registered by previously validated schemas.
+
+        :param fields_types_dict: Mapping of field paths to
+                                  :class:`FieldToAdd`.
+        :param untyped_fields: Paths of the fields registered without a type.
+                               If not provided they are looked up in the
+                               registry.
+
+        With ``track_references`` every field is counted as contributed by
+        the schema it is attributed to.
+        """
+        if untyped_fields is None:
+            untyped_fields = [
+                path for path, field in six.iteritems(fields_types_dict)
+                if field.field_type is None
+            ]
+        self.fields_types_dict = fields_types_dict
+        self._untyped_fields = set(untyped_fields)
+        if self._references is not None:
+            self._references = {}
+            self._uri_fields = {}
+            self._uri_order = {}
+            uri = self.uri
+            for path, field in six.iteritems(fields_types_dict):
+                self.uri = field.schema_index
+                self._reference(path, field.field_type, True)
+            self.uri = uri
+
+    def remove(self, uri):
+        """Withdraw the fields contributed by a schema.
+
+        Fields which no other schema contributes are removed from the
+        registry. The others get back the value which the remaining schema
+        registering them last gave them, or are attributed to the earliest
+        remaining schema giving them a type. Removing schemas in the reverse
+        order of their validation therefore restores the registry as it was
+        before they were validated. The time taken depends on the number of
+        fields of the schema only.
+        Contributions of other schemas which conflicted with the withdrawn
+        fields are not registered, the schemas have to be validated again.
+
+        :param uri: URI of a schema validated with ``track_references``.
+        :raises KeyError: If no fields were contributed under the URI.
+        """
+        if self._uri_fields is None:
+            raise ValueError(
+                'Schemas can only be removed with track_references.'
+            )
+        paths = self._uri_fields.pop(uri)
+        del self._uri_order[uri]
+        self._versions.pop(uri, None)
+        fields_types_dict = self.fields_types_dict
+        for path in paths:
+            uris = self._references[path]
+            del uris[uri]
+            if not uris:
+                del self._references[path]
+                fields_types_dict.pop(path, None)
+                self._untyped_fields.discard(path)
+                continue
+
+            field = fields_types_dict.get(path)
+            if field is None or field.schema_index != uri:
+                continue
+            writers = [(uris[other][1], other) for other in uris
+                       if uris[other][1] is not None]
+            if writers:
+                owner = max(writers)[1]
+            else:
+                typed = [other for other in uris if uris[other][0] is not None]
+                owner = min(typed or uris, key=self._uri_order.get)
+            field_type = uris[owner][0]
+            fields_types_dict[path] = FieldToAdd(owner, path, field_type)
+            if field_type is None:
+                self._untyped_fields.add(path)
+            else:
+                self._untyped_fields.discard(path)
+
+    def reference_count(self, path):
+        """Return the number of schemas contributing to a field.
 
-    def validate(self, schema, uri):
+        :param path: Tuple with path to a field.
+        """
+        if self._references is None:
+            raise ValueError(
+                'References are only counted with track_references.'
+            )
+        return len(self._references.get(path, ()))
+
+    def _reference(self, path, field_type, registered=False):
+        """Record that the current schema contributes to a field.
+
+        Every field keeps a dict of the contributing URIs to a tuple with
+        the type they give, which is the type they last registered if they
+        did, and the order in which they last registered the field, or None
+        if they only agreed with it.
+
+        :param path: Tuple with path to the field.
+        :param field_type: JSON type given by the schema or None.
+        :param registered: True if the schema registered the field.
+        """
+        uri = self.uri
+        uris = self._references.get(path)
+        if uris is None:
+            uris = self._references[path] = {}
+        previous = uris.get(uri, _MISSING)
+        if previous is _MISSING:
+            previous_type = previous_order = None
+        else:
+            previous_type, previous_order = previous
+        if registered:
+            reference = (field_type, next(self._register_counter))
+        elif field_type is None:
+            reference = (previous_type, previous_order)
+        else:
+            reference = (field_type, previous_order)
+        if reference != previous:
+            self._reference_journal.append((path, previous))
+            uris[uri] = reference
+        fields = self._uri_fields.get(uri)
+        if fields is None:
+            fields = self._uri_fields[uri] = set()
+            self._uri_order[uri] = next(self._uri_counter)
+        fields.add(path)
+
+    def validate(self, schema, uri, resolver=None):
         """Check that the given schema is compatible with previously validated schemas.
 
+        If an error is raised, the fields registered by the schema are
+        restored to their previous state.
+
         :param schema: Schema that is currently processed.
         :param uri: URI of the currently processed schema.
+        :param resolver: Resolver used to retrieve referenced schemas.
+                         If not provided it will be created with
+                         ``resolver_factory``.
+        :returns: :class:`ValidationResult` of the schema.
         """
-        self.uri = uri
-        self.resolver = self.resolver_factory(base_uri=uri, referrer=schema)
+        if self.stats is not None:
+            return self._timed_schema(
+                uri, self._transaction, self._validate, schema, uri, resolver
+            )
+        return self._transaction(self._validate, schema, uri, resolver)
+
+    def _validate(self, schema, uri, resolver):
+        """Check the schema, see :meth:`validate`."""
+        if self.plan_cache is not None:
+            return self._merge_fields(
+                self.compile(schema, uri, resolver).contributions, uri
+            )
+
+        self._start_walk(schema, uri, resolver)
+        self._untyped_in_schema = set()
+        self._conflicts = []
 
         self._validate_root(schema, ())
 
-        root = self.fields_types_dict.get(())
+        return self._finish_schema()
 
-        if not root or root.field_type != 'object':
-            err_msg = "Root field / type is not 'object' in {0}"
-            raise JSONSchemaCompatibilityError(
-                err_msg.format(self.uri),
-                self.uri
+    def revalidate(self, schema, uri, resolver=None):
+        """Check a new version of a schema validated before under the URI.
+
+        The first time a URI is given the schema is validated as with
+        :meth:`validate` and a copy of it is kept. Next times only the
+        subschemas of ``properties`` which differ from the kept version are
+        walked and checked against the registry, the fields of the others
+        being registered already. The whole schema is walked again if its
+        root changed besides ``properties``, if a document it references
+        changed or if a reference within the schema points into a changed
+        subschema.
+
+        Fields which the previous version registered and the new one does
+        not have stay registered. A version with conflicts is not kept, so
+        the next version is walked entirely.
+
+        :param schema: Schema that is currently processed.
+        :param uri: URI of the currently processed schema.
+        :param resolver: Resolver used to retrieve referenced schemas.
+                         If not provided it will be created with
+                         ``resolver_factory``.
+        :returns: :class:`ValidationResult` of the walked subschemas.
+        """
+        if self.stats is not None:
+            return self._timed_schema(
+                uri, self._transaction, self._revalidate, schema, uri,
+                resolver
             )
+        return self._transaction(self._revalidate, schema, uri, resolver)
 
-        for path, field in six.iteritems(self.fields_types_dict):
-            if field is None:
-                logging.warning(
-                    'No type in field ' + self.make_json_pointer(path)
-                )
+    def _revalidate(self, schema, uri, resolver):
+        """Check the changes of the schema, see :meth:`revalidate`."""
+        resolver = resolver or self.resolver_factory(
+            base_uri=uri, referrer=schema
+        )
+        version = self._versions.pop(uri, None)
+        changes = None
+        if version is not None and \
+                self._documents_unchanged(version.documents, resolver):
+            changes = version.changes(schema)
 
-        self.uri = None
-        self.resolver = None
+        self._start_walk(schema, uri, resolver)
+        self._untyped_in_schema = set()
+        self._conflicts = []
+        if changes is None:
+            self._validate_root(schema, ())
+        else:
+            self._documents.update(version.documents)
+            self._local_refs.update(version.local_refs)
+            for subschema, curr_field in changes:
+                self._validate_root(subschema, curr_field, schema)
 
-    def _validate_root(self, curr_schema, curr_field):
-        """Go through the schema and retrieve schema's particular fields.
+        documents = dict(
+            (document, schema_digest(resolver.resolve(document)[1]))
+            for document in self._documents
+        )
+        local_refs = self._local_refs
+        result = self._finish_schema()
+        if not result.conflicts:
+            if changes is None:
+                version = SchemaVersion(schema, documents, local_refs)
+            else:
+                version.documents = documents
+                version.local_refs = local_refs
+            self._versions[uri] = version
+        return result
 
-        :param curr_schema: Schema or subschema that is currently processed.
-        :param curr_field: Tuple with path to currently processed field.
-        """
-        while '$ref' in curr_schema:
-            path = curr_schema.get('$ref')
-            curr_schema = self.resolver.resolve(path)[1]
+    def validate_many(self, schemas):
+        """Check schemas one after another, in the given order.
 
-        self._validate_collection(curr_schema, curr_field)
+        The schemas are consumed lazily, so a generator can be given and only
+        the schema currently processed is kept in memory. Every schema gets
+        its own resolver, but the documents which a resolver retrieved are
+        given to the resolvers of the next schemas, so they are retrieved
+        once. The resolver of ``resolver_factory`` has to provide ``store``
+        like :class:`jsonschema.RefResolver` does.
 
-        field = self.fields_types_dict.get(curr_field)
+        :param schemas: Iterable of ``(schema, uri)`` tuples.
+        :returns: Generator of :class:`ValidationResult`, one per schema.
+        """
+        documents = {}
+        for schema, uri in schemas:
+            resolver = self.resolver_factory(base_uri=uri, referrer=schema)
+            store = resolver.store
+            document_uri = urldefrag(uri)[0]
+            for other_uri, document in six.iteritems(documents):
+                if other_uri != document_uri and other_uri not in store:
+                    store[other_uri] = document
+            known = set(store)
 
-        field_type = curr_schema.get('type')
-        if "type" in curr_schema:
-            if field is not None and field.field_type == 'null':
-                raise NotImplementedError(
-                        'JSON schema null type is not supported.'
-                    )
-            elif field and curr_schema['type'] != field.field_type:
-                err_msg = "{0} type mismatch in schemas {1} and {2}."
-                raise JSONSchemaCompatibilityError(
-                    err_msg.format(
-                        self.make_json_pointer(curr_field),
-                        field.schema_index,
-                        self.uri
-                    ),
-                    self.uri,
-                    field.schema_index
-                )
+            result = self.validate(schema, uri, resolver)
+            for other_uri in set(store) - known:
+                if urldefrag(other_uri)[0] != document_uri:
+                    documents[other_uri] = store[other_uri]
+            yield result
 
-            if field_type == 'null':
-                raise NotImplementedError(
-                    'JSON schema null type is not supported.'
-                )
+    def validate_parallel(self, schemas, processes=None, chunksize=1):
+        """Check schemas in order, extracting their fields in a process pool.
 
-            if field is None or field.field_type is None:
-                self.fields_types_dict[curr_field] = field = FieldToAdd(
-                    schema_index=self.uri,
-                    field_tuple=curr_field,
-                    field_type=field_type
-                )
+        The fields of every schema are extracted with :meth:`extract_fields`
+        by the worker processes, then merged with :meth:`merge_fields` one
+        schema after another in the given order. Errors are therefore the
+        same, and raised for the same schema, as with :meth:`validate_many`.
+        The schemas and the ``resolver_factory`` have to be picklable.
 
-            if curr_schema['type'] == 'array':
-                if curr_schema.get('items') is not None:
-                    self._validate_array(
-                        curr_schema['items'],
-                        curr_field + ('items',)
-                    )
-        if "enum" in curr_schema:
-            guessed_enum_type = self._validate_enum(
-                curr_schema['enum'],
-                curr_field
+        :param schemas: Iterable of ``(schema, uri)`` tuples.
+        :param processes: Number of worker processes. If not provided it will
+                          use the number of CPUs.
+        :param chunksize: Number of schemas sent to a worker at once.
+        :returns: Generator of :class:`ValidationResult`, one per schema.
+        """
+        import multiprocessing
+
+        pool = multiprocessing.Pool(processes)
+        try:
+            tasks = (
+                (self.__class__, self.ignore_index, self.resolver_factory,
+                 schema, uri)
+                for schema, uri in schemas
             )
-            if field_type and field_type != guessed_enum_type:
-                err_msg = "Predicted enum type {0} conflicting with " \
-                            "properties type {1} in schema {2}"
-                raise JSONSchemaCompatibilityError(
-                    err_msg.format(
-                        guessed_enum_type,
-                        field_type,
-                        self.uri
-                    ),
-                    self.uri,
-                    self.uri
-                )
+            for uri, contributions in pool.imap(
+                    _extract_fields, tasks, chunksize):
+                yield self.merge_fields(contributions, uri)
+        finally:
+            pool.terminate()
 
-        if 'properties' in curr_schema:
-            if field and field.field_type != "object":
-                err_msg = "Conflicting type for field {0} previously found " \
-                            "in schema {1} with type {2}, found next in {3} " \
-                            "where 'properties' imply type 'object'."
-                raise JSONSchemaCompatibilityError(
-                    err_msg.format(
-                        self.make_json_pointer(curr_field),
-                        field.schema_index,
-                        field.field_type,
-                        self.make_json_pointer(field.field_tuple)
-                    ),
-                    self.uri,
-                    field.schema_index
-                )
-            self.fields_types_dict[curr_field] = field = FieldToAdd(
-                schema_index=self.uri,
-                field_tuple=curr_field,
-                field_type='object'
+    def extract_fields(self, schema, uri, resolver=None):
+        """Walk the schema and return the fields it contributes.
+
+        The registry is neither read nor modified, so the fields of different
+        schemas can be extracted independently and merged later with
+        :meth:`merge_fields`. An error which does not depend on previously
+        validated schemas ends the returned list and is raised when it is
+        merged.
+
+        :param schema: Schema that is currently processed.
+        :param uri: URI of the currently processed schema.
+        :param resolver: Resolver used to retrieve referenced schemas.
+                         If not provided it will be created with
+                         ``resolver_factory``.
+        :returns: List of field contributions in the order of the walk.
+        """
+        self._start_walk(schema, uri, resolver)
+        contributions = []
+        try:
+            self._walk(schema, (), contributions.append)
+        except Exception as exc:
+            contributions.append((ERROR, None, exc))
+        self._end_walk()
+        return contributions
+
+    def merge_fields(self, contributions, uri):
+        """Check fields returned by :meth:`extract_fields` and register them.
+
+        As with :meth:`validate`, the registry is left unchanged if an error
+        is raised.
+
+        :param contributions: Field contributions of the schema.
+        :param uri: URI of the schema the fields were extracted from.
+        :returns: :class:`ValidationResult` of the schema.
+        """
+        if self.stats is not None:
+            return self._timed_schema(
+                uri, self._transaction, self._merge_fields, contributions, uri
             )
-            for prop in curr_schema['properties']:
-                if isinstance(curr_schema['properties'][prop], dict):
-                    self._validate_root(
-                        curr_schema['properties'][prop],
-                        curr_field + (prop,)
-                    )
+        return self._transaction(self._merge_fields, contributions, uri)
 
-        if "dependencies" in curr_schema:
-            if field and field.field_type != "object":
-                err_msg = "Conflicting type for field {0} previously found " \
-                            "in schema {1} with type {2}, found next in {3} " \
-                            "where 'dependencies' imply type 'object'."
-                raise JSONSchemaCompatibilityError(
-                    err_msg.format(
-                        self.make_json_pointer(curr_field),
-                        field.schema_index,
-                        field.field_type,
-                        self.make_json_pointer(field.field_tuple)
-                    ),
-                    self.uri,
-                    field.schema_index
-                )
-            self.fields_types_dict[curr_field] = field = FieldToAdd(
-                schema_index=self.uri,
-                field_tuple=curr_field,
-                field_type='object'
+    def _merge_fields(self, contributions, uri):
+        """Register the fields of a schema, see :meth:`merge_fields`."""
+        self.uri = uri
+        self._untyped_in_schema = set()
+        self._conflicts = []
+
+        if self.stats is not None:
+            for contribution in contributions:
+                self._timed_merge_field(contribution)
+            return self._finish_schema()
+        if self._references is not None:
+            for contribution in contributions:
+                self._merge_field(contribution)
+            return self._finish_schema()
+
+        fields_types_dict = self.fields_types_dict
+        untyped_fields = self._untyped_fields
+        journal = self._journal
+        merge_field = self._merge_field
+        for contribution in contributions:
+            kind, path, field_type = contribution
+            # Fast path for a new typed field, see _merge_field.
+            if kind == TYPED and path not in fields_types_dict \
+                    and field_type != 'null' and field_type is not None:
+                journal.append((path, None))
+                fields_types_dict[path] = FieldToAdd(uri, path, field_type)
+                if untyped_fields:
+                    untyped_fields.discard(path)
+            else:
+                merge_field(contribution)
+
+        return self._finish_schema()
+
+    def compile(self, schema, uri, resolver=None):
+        """Compile the schema into a plan of the fields it contributes.
+
+        When the validator has a ``plan_cache``, plans are cached by the hash
+        of the schema content, the base of its URI and ``ignore_index``, so
+        a schema with the same content is walked only once. The plan also
+        keeps the hash of every other document the schema references,
+        directly or not, and a cached plan is not used if one of them
+        changed.
+
+        :param schema: Schema that is currently processed.
+        :param uri: URI of the currently processed schema.
+        :param resolver: Resolver used to retrieve referenced schemas.
+                         If not provided it will be created with
+                         ``resolver_factory``.
+        :returns: :class:`~doschema.plan.FieldPlan` of the schema.
+        """
+        resolver = resolver or self.resolver_factory(
+            base_uri=uri, referrer=schema
+        )
+        key = None
+        if self.plan_cache is not None:
+            digest = schema_digest(schema)
+            if digest is not None:
+                key = (digest, urljoin(uri, '.'), self.ignore_index)
+                plan = self.plan_cache.get(key)
+                if plan is not None and \
+                        self._documents_unchanged(plan.documents, resolver):
+                    return plan
+
+        plan = FieldPlan(self.extract_fields(schema, uri, resolver), key)
+        # Errors found in the schema mention its URI, so they are not reused.
+        if key is not None and not plan.failed:
+            plan.documents = dict(
+                (document, schema_digest(resolver.resolve(document)[1]))
+                for document in self._documents
             )
-            self._validate_dependencies(curr_schema, curr_field)
+            self.plan_cache[key] = plan
+        return plan
 
-    def _validate_array(self, field_value, curr_field):
-        """Process each JSON object in the array according to ignore_index.
+    def apply_plan(self, plan, uri):
+        """Check the fields of a compiled schema and register them.
 
-        :param field_value: Type of the field.
-        :param curr_field: Tuple with path to currently processed field.
+        :param plan: :class:`~doschema.plan.FieldPlan` returned by
+                     :meth:`compile`.
+        :param uri: URI of the compiled schema.
+        :returns: :class:`ValidationResult` of the schema.
         """
-        field_path = curr_field
-        if isinstance(field_value, list):
-            for elem in field_value:
-                if self.ignore_index:
-                    new_field_path = field_path
-                else:
-                    new_field_path = field_path + (field_value.index(elem), )
+        return self.merge_fields(plan.contributions, uri)
 
-                self._validate_root(elem, new_field_path)
+    @staticmethod
+    def _documents_unchanged(documents, resolver):
+        """Check that referenced documents still have the same content.
 
-        elif isinstance(field_value, dict):
-            self._validate_root(field_value, curr_field)
+        :param documents: Dict of document URIs to their content hash.
+        :param resolver: Resolver used to retrieve the documents.
+        """
+        for document, digest in six.iteritems(documents):
+            try:
+                content = resolver.resolve(document)[1]
+            except resolution_error():
+                return False
+            if schema_digest(content) != digest:
+                return False
+        return True
 
-    def _validate_collection(self, curr_schema, curr_field):
-        """Check schema for allOf, anyOf and oneOf.
+    def _start_walk(self, schema, uri, resolver):
+        """Prepare the state used while walking one schema.
+
+        :param schema: Schema that is currently processed.
+        :param uri: URI of the currently processed schema.
+        :param resolver: Resolver used to retrieve referenced schemas or None.
+        """
+        self.uri = uri
+        self.resolver = resolver or self.resolver_factory(
+            base_uri=uri, referrer=schema
+        )
+        self._resolved_refs = {}
+        self._visited_refs = set()
+        self._active_refs = set()
+        self._documents = set()
+        self._local_refs = set()
+
+    def _end_walk(self):
+        """Release the state used while walking one schema."""
+        self.uri = None
+        self.resolver = None
+        self._resolved_refs = {}
+        self._visited_refs = set()
+
+    def _finish_schema(self):
+        """Check the root of the current schema and summarize its fields.
+
+        :returns: :class:`ValidationResult` of the current schema.
+        """
+        root = self.fields_types_dict.get(())
+
+        if not root or root.field_type != 'object':
+            self._conflict(Conflict(
+                'root', (), 'object', root and root.field_type, self.uri
+            ))
+
+        result = ValidationResult(
+            self.uri,
+            tuple(self._untyped_in_schema.intersection(self._untyped_fields)),
+            tuple(self._conflicts)
+        )
+        if result.untyped_fields:
+            import logging
+
+            logging.warning(
+                'No type in fields %s in schema %s',
+                ', '.join(sorted(result.untyped_pointers)),
+                self.uri
+            )
+
+        self._end_walk()
+        self._untyped_in_schema = set()
+        self._conflicts = []
+        return result
+
+    def _validate_root(self, curr_schema, curr_field, root=None):
+        """Go through the schema and retrieve schema's particular fields.
 
         :param curr_schema: Schema or subschema that is currently processed.
         :param curr_field: Tuple with path to currently processed field.
+        :param root: Root schema, see :meth:`_walk`.
         """
-        keys = self.COLLECTION_KEYS.intersection(curr_schema)
-        for key in keys:
-            subschema = curr_schema[key]
+        if self.stats is None:
+            self._walk(curr_schema, curr_field, self._merge_field, root)
+        else:
+            self._walk(
+                curr_schema, curr_field, self._timed_merge_field, root
+            )
+
+    def _walk(self, curr_schema, curr_field, emit, root=None):
+        """Go through the schema and find the fields it contributes.
 
-            for elem in subschema:
-                self._validate_root(elem, curr_field)
+        The schema is walked with an explicit work stack instead of recursion,
+        so the depth of the schema is not limited by the interpreter's
+        recursion limit. Every entry of the stack is a tuple
+        ``(step, schema, path)`` where ``step`` tells which part of the node
+        has to be processed next. Children are pushed in reverse order so
+        that the nodes are processed, and the errors raised, in the same
+        order as with a recursive descent.
 
-    def _validate_dependencies(self, curr_schema, curr_field):
-        """validate_root and check dependencies in schema.
+        Every field found is passed to ``emit`` as a contribution tuple
+        ``(kind, path, value)``. The walk itself does not depend on the
+        registry, which is only read and modified by :meth:`_merge_field`.
+
+        A referenced schema is walked only once for a given path. When a
+        reference points back to a schema which is still being walked (a
+        recursive definition), only its ``type`` is checked at that path
+        instead of expanding it again.
 
         :param curr_schema: Schema or subschema that is currently processed.
         :param curr_field: Tuple with path to currently processed field.
+        :param emit: Callable receiving the field contributions.
+        :param root: Schema containing ``curr_schema``, which is reached from
+                     it through ``properties`` only. The subschema is then
+                     walked as it is when the whole root is. If not provided
+                     ``curr_schema`` is the root.
         """
-        dependencies = curr_schema['dependencies']
+        visited_refs = self._visited_refs
+        active_refs = self._active_refs
+        stats = self.stats
+        root_id = id(curr_schema if root is None else root)
+        active_refs.add(root_id)
+        stack = [
+            (_LEAVE, root_id, None),
+            (_NODE, curr_schema, curr_field),
+        ]
+        push = stack.append
+        pop = stack.pop
+
+        while stack:
+            step, curr_schema, curr_field = pop()
+
+            if step == _LEAVE:
+                active_refs.discard(curr_schema)
+                continue
+
+            if step == _NODE:
+                if stats is not None:
+                    stats.nodes += 1
+                if '$ref' in curr_schema:
+                    curr_schema = self._resolve_ref(curr_schema)
+                    target = id(curr_schema)
+                    if (target, curr_field) in visited_refs:
+                        continue
+                    if target in active_refs:
+                        if "type" in curr_schema:
+                            emit((TYPED, curr_field, curr_schema['type']))
+                        continue
+                    visited_refs.add((target, curr_field))
+                    active_refs.add(target)
+                    push((_LEAVE, target, None))
 
-        while '$ref' in dependencies:
-            path = dependencies.get('$ref')
-            dependencies = self.resolver.resolve(path)[1]
+                keys = self.COLLECTION_KEYS.intersection(curr_schema)
+                if keys:
+                    push((_TYPE, curr_schema, curr_field))
+                    self._push_reversed(stack, [
+                        (_NODE, elem, curr_field)
+                        for key in keys for elem in curr_schema[key]
+                    ])
+                    continue
+                step = _TYPE
 
-        for field_name, field_value in six.iteritems(dependencies):
-            if curr_field + (field_name, ) not in self.fields_types_dict:
-                self.fields_types_dict[
-                    curr_field + (field_name, )
-                ] = FieldToAdd(
-                        schema_index=self.uri,
-                        field_tuple=curr_field + (field_name, ),
-                        field_type=None
+            if step == _TYPE:
+                if "type" in curr_schema:
+                    emit((TYPED, curr_field, curr_schema['type']))
+                    if curr_schema['type'] == 'array' and \
+                            curr_schema.get('items') is not None:
+                        children = self._array_children(
+                            curr_schema, curr_field
+                        )
+                        if children:
+                            push((_PROPERTIES, curr_schema, curr_field))
+                            self._push_reversed(stack, children)
+                            continue
+                step = _PROPERTIES
+
+            if step == _PROPERTIES:
+                if "enum" in curr_schema:
+                    if stats is None:
+                        self._validate_enum_type(
+                            curr_schema, curr_field, emit
+                        )
+                    else:
+                        stats.timed(
+                            'enum', self._validate_enum_type,
+                            curr_schema, curr_field, emit
+                        )
+
+                if 'properties' in curr_schema:
+                    emit((OBJECT, curr_field, 'properties'))
+                    properties = curr_schema['properties']
+                    children = [
+                        (_NODE, properties[prop], curr_field + (prop,))
+                        for prop in properties
+                        if isinstance(properties[prop], dict)
+                    ]
+                    if children:
+                        if "dependencies" in curr_schema:
+                            push((_DEPENDENCIES, curr_schema, curr_field))
+                        self._push_reversed(stack, children)
+                        continue
+                step = _DEPENDENCIES
+
+            if step == _DEPENDENCIES:
+                if "dependencies" in curr_schema:
+                    emit((OBJECT, curr_field, 'dependencies'))
+                    dependencies = self._resolve_ref(
+                        curr_schema['dependencies']
                     )
+                    self._push_reversed(stack, [
+                        (_DEPENDENCY, dependency, curr_field)
+                        for dependency in six.iteritems(dependencies)
+                    ])
+                continue
+
+            # step == _DEPENDENCY: ``curr_schema`` is a (name, value) pair.
+            field_name, field_value = curr_schema
+            path = curr_field + (field_name, )
+            emit((UNTYPED, path, path))
 
             if isinstance(field_value, dict):
-                self._validate_root(field_value, curr_field)
+                push((_NODE, field_value, curr_field))
 
             elif type(field_value) is list:
                 for field in field_value:
-                    path = curr_field + (field, )
-                    if path not in self.fields_types_dict:
-                        self.fields_types_dict[
-                            curr_field + (field_name, )
-                        ] = FieldToAdd(
-                                schema_index=self.uri,
-                                field_tuple=curr_field + (field_name, ),
-                                field_type=None
-                            )
+                    emit((UNTYPED, curr_field + (field, ), path))
             else:
                 raise ValueError(
                     'Dependencies value is not a dict nor a list.'
                 )
 
-    def _validate_enum(self, field_value, path):
-        """Process each element in enum field values.
+    def _resolve_ref(self, curr_schema):
+        """Follow ``$ref`` keywords until a schema without one is reached.
+
+        Resolved schemas are cached per base URI and reference for the
+        duration of one :meth:`validate` call. The URIs of the documents
+        other than the current schema are collected in ``_documents`` and
+        the fragments of the references within it in ``_local_refs``.
 
-        :param field_value: Type of the field.
-        :param path: Tuple with path to currently processed field.
+        :param curr_schema: Schema or subschema that is currently processed.
+        :returns: Referenced schema.
+        :raises jsonschema.RefResolutionError: If the references form a
+                                               cycle.
         """
-        types = map(lambda x: type(x), field_value)
-        types_inside_enum = list(set(types))
-        if len(types_inside_enum) > 1:
-            err_msg = "Conflicting types {0} found for enum {1} in schema {2}."
-            raise JSONSchemaCompatibilityError(
-                err_msg.format(
-                    types_inside_enum,
-                    self.make_json_pointer(path),
-                    self.uri
-                ),
+        chain = []
+        while '$ref' in curr_schema:
+            if id(curr_schema) in chain:
+                raise resolution_error()(
+                    'Reference cycle found for {0} in {1}'.format(
+                        curr_schema['$ref'], self.uri
+                    )
+                )
+            chain.append(id(curr_schema))
+
+            key = (self.uri, curr_schema['$ref'])
+            try:
+                curr_schema = self._resolved_refs[key]
+            except KeyError:
+                if self.stats is None:
+                    url, curr_schema = self.resolver.resolve(
+                        curr_schema['$ref']
+                    )
+                else:
+                    self.stats.ref_misses += 1
+                    url, curr_schema = self.stats.timed(
+                        '$ref', self.resolver.resolve, curr_schema['$ref']
+                    )
+                self._resolved_refs[key] = curr_schema
+                document, fragment = urldefrag(url)
+                if document != urldefrag(self.uri)[0]:
+                    self._documents.add(document)
+                else:
+                    self._local_refs.add(fragment)
+            else:
+                if self.stats is not None:
+                    self.stats.ref_hits += 1
+        return curr_schema
+
+    @staticmethod
+    def _push_reversed(stack, children):
+        """Push children on the work stack so that the first is popped first.
+
+        :param stack: Work stack of the walk.
+        :param children: List of stack entries in processing order.
+        """
+        children.reverse()
+        stack.extend(children)
+
+    def _merge_field(self, contribution):
+        """Check one field contribution against the registry and register it.
+
+        :param contribution: Tuple ``(kind, path, value)`` found by
+                             :meth:`_walk`.
+        """
+        kind, path, value = contribution
+        if kind == TYPED:
+            if path not in self.fields_types_dict and value != 'null':
+                self._add_field(path, value)
+            else:
+                self._validate_type(path, value)
+        elif kind == OBJECT:
+            if path not in self.fields_types_dict:
+                self._add_field(path, 'object')
+            else:
+                self._validate_object(path, value)
+        elif kind == UNTYPED:
+            # ``value`` is the path registered when ``path`` is unknown.
+            if path not in self.fields_types_dict:
+                self._add_field(value, None)
+            else:
+                if path in self._untyped_fields:
+                    self._untyped_in_schema.add(path)
+                if self._references is not None:
+                    self._reference(path, None)
+        elif kind == CONFLICT:
+            self._conflict(value)
+        else:
+            raise value
+
+    def _timed_merge_field(self, contribution):
+        """Merge one field contribution and add the time it took to stats.
+
+        :param contribution: Tuple ``(kind, path, value)`` found by
+                             :meth:`_walk`.
+        """
+        kind, _, value = contribution
+        if kind == OBJECT:
+            keyword = value
+        else:
+            keyword = _MERGE_KEYWORDS.get(kind)
+        if keyword is None:
+            self._merge_field(contribution)
+        else:
+            self.stats.timed(keyword, self._merge_field, contribution)
+
+    def _transaction(self, func, *args):
+        """Process one schema, undoing its changes to the registry if it fails.
+
+        The previous value of every field the schema registers is kept in a
+        journal, so a rollback takes time proportional to the number of
+        fields the schema touched.
+
+        :param func: Method processing the schema, called with ``args``.
+        :returns: :class:`ValidationResult` of the schema.
+        """
+        del self._journal[:]
+        del self._reference_journal[:]
+        try:
+            return func(*args)
+        except BaseException:
+            self._rollback()
+            raise
+        finally:
+            del self._journal[:]
+            del self._reference_journal[:]
+
+    def _rollback(self):
+        """Restore the fields changed by the current schema."""
+        fields_types_dict = self.fields_types_dict
+        untyped_fields = self._untyped_fields
+        for path, field in reversed(self._journal):
+            if field is None:
+                fields_types_dict.pop(path, None)
+                untyped_fields.discard(path)
+            else:
+                fields_types_dict[path] = field
+                if field.field_type is None:
+                    untyped_fields.add(path)
+                else:
+                    untyped_fields.discard(path)
+
+        uri = self.uri
+        for path, reference in reversed(self._reference_journal):
+            uris = self._references[path]
+            if reference is not _MISSING:
+                uris[uri] = reference
+                continue
+            del uris[uri]
+            if not uris:
+                del self._references[path]
+            fields = self._uri_fields[uri]
+            fields.discard(path)
+            if not fields:
+                del self._uri_fields[uri]
+                del self._uri_order[uri]
+        self._end_walk()
+
+    def _timed_schema(self, uri, func, *args):
+        """Process one schema and add its wall time to stats.
+
+        :param uri: URI of the schema.
+        :param func: Method processing the schema, called with ``args``.
+        :returns: :class:`ValidationResult` of the schema.
+        """
+        start = timer()
+        result = func(*args)
+        self.stats.add_schema(
+            uri, timer() - start, len(self.fields_types_dict)
+        )
+        return result
+
+    def _conflict(self, conflict):
+        """Raise the conflict or collect it if ``collect_conflicts`` is set.
+
+        :param conflict: :class:`Conflict` found in the current schema.
+        """
+        if not self.collect_conflicts:
+            raise conflict.error()
+        self._conflicts.append(conflict)
+
+    def _validate_type(self, curr_field, field_type):
+        """Check and register the type given by the ``type`` keyword.
+
+        :param curr_field: Tuple with path to currently processed field.
+        :param field_type: Type given in the schema.
+        """
+        field = self.fields_types_dict.get(curr_field)
+        if field is not None and field.field_type == 'null':
+            raise NotImplementedError(
+                    'JSON schema null type is not supported.'
+                )
+        elif field and field_type != field.field_type:
+            self._conflict(Conflict(
+                'type', curr_field, field.field_type, field_type, self.uri,
+                field.schema_index
+            ))
+            return
+
+        if field_type == 'null':
+            raise NotImplementedError(
+                'JSON schema null type is not supported.'
+            )
+
+        if field is None or field.field_type is None:
+            self._add_field(curr_field, field_type)
+        elif self._references is not None:
+            self._reference(curr_field, field_type)
+
+    def _validate_enum_type(self, curr_schema, curr_field, emit):
+        """Check that the enum values agree with the ``type`` keyword.
+
+        :param curr_schema: Schema or subschema that is currently processed.
+        :param curr_field: Tuple with path to currently processed field.
+        :param emit: Function receiving the conflicts found.
+        """
+        field_type = curr_schema.get('type')
+        enum_types = self._validate_enum(curr_schema['enum'])
+        if len(enum_types) > 1:
+            emit((CONFLICT, curr_field, Conflict(
+                'enum_values', curr_field, None, enum_types, self.uri
+            )))
+        elif field_type and field_type != enum_types[0]:
+            emit((CONFLICT, curr_field, Conflict(
+                'enum', curr_field, field_type, enum_types[0], self.uri,
                 self.uri
+            )))
+
+    def _validate_object(self, curr_field, keyword):
+        """Check and register the type ``object`` implied by a keyword.
+
+        :param curr_field: Tuple with path to currently processed field.
+        :param keyword: Keyword implying the type, ``properties`` or
+                        ``dependencies``.
+        """
+        field = self.fields_types_dict.get(curr_field)
+        if field and field.field_type != "object":
+            self._conflict(Conflict(
+                keyword, curr_field, field.field_type, 'object', self.uri,
+                field.schema_index
+            ))
+            return
+        self._add_field(curr_field, 'object')
+
+    def _add_field(self, path, field_type):
+        """Register a field found in the current schema.
+
+        :param path: Tuple with path to the field.
+        :param field_type: JSON type of the field or None if it is unknown.
+        :returns: Registered field.
+        """
+        self._journal.append((path, self.fields_types_dict.get(path)))
+        self.fields_types_dict[path] = field = FieldToAdd(
+            self.uri, path, field_type
+        )
+        if field_type is None:
+            self._untyped_fields.add(path)
+            self._untyped_in_schema.add(path)
+        else:
+            self._untyped_fields.discard(path)
+        if self._references is not None:
+            self._reference(path, field_type, True)
+        return field
+
+    def _array_children(self, curr_schema, curr_field):
+        """Return stack entries for the array items according to ignore_index.
+
+        Items given as a list are positional. Unless indexes are ignored,
+        the item at position ``n`` is a field under ``items/n`` and the
+        schema of ``additionalItems``, describing the items after the listed
+        ones, a field under ``additionalItems``.
+
+        :param curr_schema: Array schema with an ``items`` keyword.
+        :param curr_field: Tuple with path to the array field.
+        """
+        items = curr_schema['items']
+        items_field = curr_field + ('items', )
+        if isinstance(items, dict):
+            return [(_NODE, items, items_field)]
+        elif not isinstance(items, list):
+            return []
+
+        if self.ignore_index:
+            children = [(_NODE, elem, items_field) for elem in items]
+            additional_field = items_field
+        else:
+            children = [
+                (_NODE, elem, items_field + (index, ))
+                for index, elem in enumerate(items)
+            ]
+            additional_field = curr_field + ('additionalItems', )
+
+        additional_items = curr_schema.get('additionalItems')
+        if isinstance(additional_items, dict):
+            children.append((_NODE, additional_items, additional_field))
+        return children
+
+    def _validate_enum(self, field_value):
+        """Process each element in enum field values.
+
+        :param field_value: Values of the enum.
+        :returns: Sorted list of the JSON types of the values.
+        """
+        types_inside_enum = sorted(set(
+            self.python_to_json_types_map.get(
+                value.__class__.__name__, value.__class__.__name__
             )
+            for value in field_value
+        ))
+        if len(types_inside_enum) > 1:
+            return types_inside_enum
         if isinstance(field_value[0], dict) \
                 or isinstance(field_value[0], list):
             raise NotImplementedError(
@@ -307,7 +1069,9 @@ class JSONSchemaValidator(object):
                     field_value[0].__class__.__name__
                 )
             )
-        return self.python_to_json_types_map[field_value[0].__class__.__name__]
+        return [
+            self.python_to_json_types_map[field_value[0].__class__.__name__]
+        ]
 
     @staticmethod
     def make_json_pointer(path):
@@ -315,9 +1079,233 @@ class JSONSchemaValidator(object):
 
         :param path: tuple with current path
         """
-        return '/' + '/'.join(path)
+        return '/' + '/'.join(six.text_type(segment) for segment in path)
+
+
+class ValidationResult(object):
+    """Result of checking one schema with :class:`JSONSchemaValidator`."""
+
+    def __init__(self, uri, untyped_fields=(), conflicts=()):
+        """Constructor."""
+        self.uri = uri
+        """URI of the validated schema."""
+        self.untyped_fields = untyped_fields
+        """Paths of fields which became or stayed untyped in the schema."""
+        self.conflicts = conflicts
+        """Conflicts found when ``collect_conflicts`` is set."""
+
+    @property
+    def untyped_pointers(self):
+        """JSON pointers of :attr:`untyped_fields`."""
+        return [
+            JSONSchemaValidator.make_json_pointer(path)
+            for path in self.untyped_fields
+        ]
+
+
+class Conflict(object):
+    """Incompatibility between a schema and the registered fields.
+
+    Only the data is kept, the message is formatted when it is requested.
+    """
+
+    __slots__ = (
+        'kind', 'path', 'expected_type', 'found_type', 'uri', 'previous_uri'
+    )
+
+    MESSAGES = {
+        'type': "{pointer} type mismatch in schemas {previous_uri} and "
+                "{uri}.",
+        'properties': "Conflicting type for field {pointer} previously "
+                      "found in schema {previous_uri} with type "
+                      "{expected_type}, found next in {pointer} where "
+                      "'properties' imply type 'object'.",
+        'dependencies': "Conflicting type for field {pointer} previously "
+                        "found in schema {previous_uri} with type "
+                        "{expected_type}, found next in {pointer} where "
+                        "'dependencies' imply type 'object'.",
+        'enum': "Predicted enum type {found_type} conflicting with "
+                "properties type {expected_type} in schema {uri}",
+        'enum_values': "Conflicting types {found_type} found for enum "
+                       "{pointer} in schema {uri}.",
+        'root': "Root field / type is not 'object' in {uri}",
+    }
+    """Message templates of the kinds of conflicts."""
+
+    def __init__(self, kind, path, expected_type, found_type, uri,
+                 previous_uri=None):
+        """Constructor.
+
+        :param kind: Key of the conflict in :attr:`MESSAGES`.
+        :param path: Tuple with path to the conflicting field.
+        :param expected_type: Type the field has so far.
+        :param found_type: Type found in the schema.
+        :param uri: URI of the schema in which the conflict is found.
+        :param previous_uri: URI of the schema which gave the expected type.
+        """
+        self.kind = kind
+        self.path = path
+        self.expected_type = expected_type
+        self.found_type = found_type
+        self.uri = uri
+        self.previous_uri = previous_uri
+
+    @property
+    def pointer(self):
+        """JSON pointer of the conflicting field."""
+        return JSONSchemaValidator.make_json_pointer(self.path)
+
+    @property
+    def message(self):
+        """Message of the conflict."""
+        return self.MESSAGES[self.kind].format(
+            pointer=self.pointer,
+            expected_type=self.expected_type,
+            found_type=self.found_type,
+            uri=self.uri,
+            previous_uri=self.previous_uri
+        )
+
+    def error(self):
+        """Return the exception raised for the conflict."""
+        return JSONSchemaCompatibilityError(
+            self.message, self.uri, self.previous_uri
+        )
+
+    def to_dict(self):
+        """Return the conflict as a JSON serializable dict."""
+        return {
+            'kind': self.kind,
+            'pointer': self.pointer,
+            'expected_type': self.expected_type,
+            'found_type': self.found_type,
+            'uri': self.uri,
+            'previous_uri': self.previous_uri,
+        }
+
+
+class SchemaVersion(object):
+    """Version of a schema kept by :meth:`JSONSchemaValidator.revalidate`."""
+
+    __slots__ = ('schema', 'documents', 'local_refs')
+
+    def __init__(self, schema, documents, local_refs):
+        """Constructor.
+
+        :param schema: Validated schema, which is copied.
+        :param documents: Dict of the URIs of the other documents referenced
+                          by the schema to their
+                          :func:`~doschema.plan.schema_digest`.
+        :param local_refs: Fragments of the references within the schema.
+        """
+        self.schema = _copy(schema)
+        self.documents = documents
+        self.local_refs = local_refs
+
+    def changes(self, schema):
+        """Find the subschemas of a new version which have to be walked.
+
+        Subschemas are compared with ``==``, so identical parts are skipped
+        without looking at them in Python. The kept copy is updated to the
+        new version, copying only the changed subschemas.
+
+        :param schema: New version of the schema.
+        :returns: List of tuples with a changed subschema and the path of
+                  its field, or None if the whole schema has to be walked.
+        """
+        changes = []
+        if not self._diff(self.schema, schema, (), (), changes):
+            return None
+
+        targets = [
+            _pointer_segments(fragment) for fragment in self.local_refs
+        ]
+        for _, _, location in changes:
+            for target in targets:
+                if target[:len(location)] == location or \
+                        location[:len(target)] == target:
+                    return None
+        return [(subschema, path) for subschema, path, _ in changes]
+
+    def _diff(self, old, new, location, curr_field, changes):
+        """Collect the changed subschemas of a node and update the copy.
+
+        :param old: Node of the kept copy.
+        :param new: Node at the same location in the new version.
+        :param location: Tuple with the segments of the location of the node.
+        :param curr_field: Tuple with path to the field of the node.
+        :param changes: List receiving tuples with a changed subschema, the
+                        path of its field and its location.
+        :returns: False if the node changed besides its ``properties``, in
+                  which case it has to be walked and copied entirely.
+        """
+        old_properties = old.get('properties')
+        new_properties = new.get('properties')
+        if '$ref' in old or '$ref' in new \
+                or not isinstance(old_properties, dict) \
+                or not isinstance(new_properties, dict) \
+                or _without_properties(old) != _without_properties(new):
+            return False
+
+        for prop in [prop for prop in old_properties
+                     if prop not in new_properties]:
+            del old_properties[prop]
+        for prop, value in six.iteritems(new_properties):
+            old_value = old_properties.get(prop)
+            if value == old_value:
+                continue
+            prop_location = location + ('properties', prop)
+            prop_field = curr_field + (prop, )
+            if isinstance(old_value, dict) and isinstance(value, dict) and \
+                    self._diff(old_value, value, prop_location, prop_field,
+                               changes):
+                continue
+            old_properties[prop] = _copy(value)
+            if isinstance(value, dict):
+                changes.append((value, prop_field, prop_location))
+        return True
+
+
+def _copy(schema):
+    """Return a deep copy of a schema."""
+    try:
+        return json.loads(json.dumps(schema))
+    except (TypeError, ValueError):
+        return copy.deepcopy(schema)
+
+
+def _without_properties(schema):
+    """Return a schema without its ``properties`` keyword."""
+    return dict(
+        (key, value) for key, value in six.iteritems(schema)
+        if key != 'properties'
+    )
+
+
+def _pointer_segments(fragment):
+    """Return the tuple of segments of a JSON pointer fragment."""
+    fragment = unquote(fragment).lstrip('/')
+    if not fragment:
+        return ()
+    return tuple(
+        segment.replace('~1', '/').replace('~0', '~')
+        for segment in fragment.split('/')
+    )
+
 
 FieldToAdd = collections.namedtuple(
     'FieldToAdd',
     'schema_index field_tuple field_type'
 )
+
+
+def _extract_fields(task):
+    """Extract the fields of one schema in a worker process.
+
+    :param task: Tuple with validator class, ``ignore_index``,
+                 ``resolver_factory``, schema and its URI.
+    :returns: Tuple with the URI and the field contributions of the schema.
+    """
+    validator_class, ignore_index, resolver_factory, schema, uri = task
+    validator = validator_class(ignore_index, resolver_factory)
+    return uri, validator.extract_fields(schema, uri)
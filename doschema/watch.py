@@ -0,0 +1,440 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Watch mode module.
+
+A :class:`SchemaWatcher` checks a tree of schemas once and then keeps the
+compiled plan of every schema and the registry of their fields. When files
+change, only the changed schemas and the schemas referencing them are read
+and walked again. The schemas from the first changed one on are then
+withdrawn from the registry, with
+:meth:`~doschema.validation.JSONSchemaValidator.remove` in the reverse order
+of their merge, and their plans are merged again. The schemas before it are
+not merged again, so a change to the last versions of a tree only costs the
+fields of these versions::
+
+    watcher = SchemaWatcher('schemas')
+    for paths, seconds in watcher.watch():
+        for line in watcher.messages():
+            print(line)
+
+Changes are detected with inotify on Linux and by polling the files
+elsewhere, see :func:`observe`.
+"""
+
+import collections
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+
+from doschema.cli import load_schema, schema_files
+from doschema.errors import DoSchemaError
+from doschema.plan import ERROR, PlanCache
+from doschema.resolver import resolution_error
+from doschema.stats import timer
+from doschema.store import SchemaStore
+from doschema.validation import JSONSchemaValidator
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_IGNORED = 0x00008000
+_IN_ISDIR = 0x40000000
+_IN_CLOEXEC = 0o2000000
+
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO | \
+    _IN_CREATE | _IN_DELETE
+"""Events watched in every directory."""
+
+_EVENT = struct.Struct('iIII')
+"""Watch descriptor, mask, cookie and name length of an inotify event."""
+
+
+class InotifyObserver(object):
+    """Observer of the schema files of a directory tree using inotify."""
+
+    def __init__(self, directory, delay=0.05):
+        """Constructor.
+
+        :param directory: Root of the watched tree.
+        :param delay: Time to wait for more events after one is received,
+                      so that the steps of saving a file are reported once.
+        :raises OSError: If inotify is not available.
+        """
+        libc = ctypes.CDLL(
+            ctypes.util.find_library('c') or 'libc.so.6', use_errno=True
+        )
+        try:
+            self._add_watch_func = libc.inotify_add_watch
+            init = libc.inotify_init1
+        except AttributeError:
+            raise OSError(errno.ENOSYS, 'inotify is not available')
+        self._fd = init(os.O_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error))
+        self.delay = delay
+        self._directories = {}
+        for root, _, _ in os.walk(directory):
+            self._add_watch(root)
+
+    def _add_watch(self, directory):
+        """Watch one directory."""
+        name = directory
+        if not isinstance(name, bytes):
+            name = name.encode(sys.getfilesystemencoding())
+        descriptor = self._add_watch_func(self._fd, name, _WATCH_MASK)
+        if descriptor < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, os.strerror(error), directory)
+        self._directories[descriptor] = directory
+
+    def _read_events(self, changed):
+        """Read the pending events and add the changed files to a set."""
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except OSError as exc:
+            if exc.errno == errno.EAGAIN:
+                return
+            raise
+        offset = 0
+        while offset < len(data):
+            descriptor, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            directory = self._directories.get(descriptor)
+            if mask & _IN_IGNORED:
+                self._directories.pop(descriptor, None)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name.decode(
+                sys.getfilesystemencoding()
+            ))
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    # Files may be created before the directory is watched.
+                    for root, _, files in os.walk(path):
+                        self._add_watch(root)
+                        changed.update(
+                            os.path.join(root, filename) for filename in files
+                            if filename.endswith('.json')
+                        )
+                else:
+                    changed.add(path)
+            elif path.endswith('.json'):
+                changed.add(path)
+
+    def changes(self, timeout=None):
+        """Wait for schema files to change.
+
+        :param timeout: Maximum time to wait in seconds, forever if not
+                        provided.
+        :returns: Set of the paths of the changed, added or removed files
+                  and of the removed directories, empty if none changed
+                  before the timeout.
+        """
+        deadline = None if timeout is None else timer() + timeout
+        changed = set()
+        while not changed:
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - timer()
+                if remaining <= 0:
+                    break
+            ready = select.select([self._fd], [], [], remaining)[0]
+            while ready:
+                self._read_events(changed)
+                ready = select.select([self._fd], [], [], self.delay)[0]
+        return changed
+
+    def close(self):
+        """Stop watching."""
+        os.close(self._fd)
+
+
+class PollingObserver(object):
+    """Observer of the schema files of a directory tree checking them."""
+
+    def __init__(self, directory, interval=0.5):
+        """Constructor.
+
+        :param directory: Root of the watched tree.
+        :param interval: Time between two checks of the files in seconds.
+        """
+        self.directory = directory
+        self.interval = interval
+        self._state = self._stat()
+
+    def _stat(self):
+        """Return the modification time and size of every schema file."""
+        state = {}
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith('.json'):
+                    filename = os.path.join(root, name)
+                    try:
+                        stat = os.stat(filename)
+                    except OSError:
+                        continue
+                    state[filename] = (stat.st_mtime, stat.st_size)
+        return state
+
+    def changes(self, timeout=None):
+        """Wait for schema files to change.
+
+        :param timeout: Maximum time to wait in seconds, forever if not
+                        provided.
+        :returns: Set of the paths of the changed, added or removed files,
+                  empty if none changed before the timeout.
+        """
+        deadline = None if timeout is None else timer() + timeout
+        while True:
+            state = self._stat()
+            changed = set(
+                filename for filename in set(state).union(self._state)
+                if state.get(filename) != self._state.get(filename)
+            )
+            self._state = state
+            if changed:
+                return changed
+            delay = self.interval
+            if deadline is not None:
+                delay = min(delay, deadline - timer())
+                if delay <= 0:
+                    return changed
+            time.sleep(delay)
+
+    def close(self):
+        """Stop watching."""
+        pass
+
+
+def observe(directory, interval=0.5):
+    """Return an observer of the schema files of a directory tree.
+
+    :param directory: Root of the watched tree.
+    :param interval: Time between two checks when inotify is not available.
+    :returns: :class:`InotifyObserver` or else :class:`PollingObserver`.
+    """
+    try:
+        return InotifyObserver(directory)
+    except OSError:
+        return PollingObserver(directory, interval)
+
+
+class SchemaWatcher(object):
+    """Checker of a tree of schemas keeping their compiled plans."""
+
+    def __init__(self, directory, base_uri=None, ignore_index=True,
+                 include=None, exclude=()):
+        """Constructor.
+
+        All the schemas of the tree are checked.
+
+        :param directory: Root of the tree of schemas.
+        :param base_uri: URI the tree is published under. If not provided
+                         the ``file`` URIs of the schemas are used.
+        :param ignore_index: ``ignore_index`` of the validator.
+        :param include: Glob patterns of the schemas, see
+                        :func:`~doschema.cli.schema_files`.
+        :param exclude: Glob patterns of the files which are not schemas.
+        """
+        self.directory = os.path.abspath(directory)
+        self.include = include
+        self.exclude = exclude
+        self.base_uri = base_uri
+        self.ignore_index = ignore_index
+        if base_uri is None:
+            self.store = SchemaStore([self.directory])
+        else:
+            self.store = SchemaStore([(self.directory, base_uri)])
+        """:class:`~doschema.store.SchemaStore` resolving references."""
+        self.compiler = JSONSchemaValidator(
+            ignore_index, resolver_factory=self.store.resolver,
+            plan_cache=PlanCache()
+        )
+        self.validator = None
+        """Validator holding the fields of the whole tree."""
+        self.failures = collections.OrderedDict()
+        """Dict of the paths of the failed schemas to their messages."""
+        self._merged = []
+        self._plans = {}
+        self._documents = {}
+        self.refresh()
+
+    def _compile(self, path):
+        """Read and walk one schema.
+
+        :param path: Path of the schema relative to the tree.
+        """
+        try:
+            schema, uri = load_schema(self.directory, path, self.base_uri)
+        except (IOError, OSError, ValueError) as exc:
+            self._plans[path] = (path, [(ERROR, None, exc)])
+            self._documents[path] = None
+            return
+        plan = self.compiler.compile(schema, uri)
+        self._plans[path] = (uri, plan.contributions)
+        if plan.failed:
+            self._documents[path] = None
+        else:
+            self._documents[path] = set(
+                self.store.filename(document) for document in plan.documents
+            )
+
+    def refresh(self, filenames=None):
+        """Check the tree again after files changed.
+
+        The changed schemas, the schemas referencing them and the schemas
+        which failed are walked again, then the plans are merged again from
+        the first walked, added or removed schema on.
+
+        :param filenames: Paths of the changed files. If not provided all the
+                          schemas are walked again.
+        :returns: List of the paths, relative to the tree, of the walked
+                  schemas.
+        """
+        paths = schema_files(self.directory, self.include, self.exclude)
+        removed = set(self._plans).difference(paths)
+        if filenames is None:
+            stale = set(paths)
+        else:
+            changed = set(os.path.abspath(name) for name in filenames)
+            changed.update(
+                os.path.join(self.directory, path) for path in removed
+            )
+            for filename in changed:
+                self.store.update(filename)
+            stale = set(
+                path for path in paths
+                if path not in self._plans
+                or os.path.join(self.directory, path) in changed
+                # Failed schemas may be fixed by any change.
+                or self._documents[path] is None
+                or not self._documents[path].isdisjoint(changed)
+            )
+        for path in removed:
+            del self._plans[path]
+            del self._documents[path]
+
+        walked = [path for path in paths if path in stale]
+        for path in walked:
+            self._compile(path)
+        self._merge(paths, stale)
+        return walked
+
+    def _merge(self, paths, stale):
+        """Update the registry with the plans of the schemas.
+
+        :param paths: Paths of the schemas, in order.
+        :param stale: Paths of the schemas which were walked again.
+        """
+        first = 0
+        if self.validator is not None:
+            for (path, _), new_path in zip(self._merged, paths):
+                if path != new_path or path in stale:
+                    break
+                first += 1
+            # Schemas sharing a URI cannot be removed one by one.
+            kept_uris = set(uri for _, uri in self._merged[:first])
+            if any(uri in kept_uris for _, uri in self._merged[first:]):
+                first = 0
+        if first == 0:
+            self.validator = JSONSchemaValidator(
+                self.ignore_index, collect_conflicts=True,
+                track_references=True
+            )
+            self.failures = collections.OrderedDict()
+            self._merged = []
+
+        validator = self.validator
+        for path, uri in reversed(self._merged[first:]):
+            self.failures.pop(path, None)
+            try:
+                validator.remove(uri)
+            except KeyError:
+                # The schema failed, or its URI was removed already.
+                pass
+        del self._merged[first:]
+
+        for path in paths[first:]:
+            uri, contributions = self._plans[path]
+            self._merged.append((path, uri))
+            try:
+                result = validator.merge_fields(contributions, uri)
+            except (DoSchemaError, NotImplementedError, ValueError,
+                    resolution_error()) as exc:
+                self.failures[path] = ['{0}'.format(exc)]
+                continue
+            if result.conflicts:
+                self.failures[path] = [
+                    conflict.message for conflict in result.conflicts
+                ]
+
+    def __len__(self):
+        """Return the number of schemas of the tree."""
+        return len(self._plans)
+
+    def messages(self):
+        """Return the messages of the failed schemas.
+
+        :returns: List of ``path: message`` lines.
+        """
+        return [
+            u'{0}: {1}'.format(path, message)
+            for path, messages in self.failures.items()
+            for message in messages
+        ]
+
+    def watch(self, observer=None, timeout=None):
+        """Check the tree again every time files change.
+
+        :param observer: Observer of the files, :func:`observe` if not
+                         provided.
+        :param timeout: Stop after waiting this many seconds for a change,
+                        never if not provided.
+        :returns: Generator of tuples with the list of the walked schemas and
+                  the time the check took in seconds.
+        """
+        observer = observer or observe(self.directory)
+        try:
+            while True:
+                changed = observer.changes(timeout)
+                if not changed:
+                    return
+                start = timer()
+                walked = self.refresh(changed)
+                yield walked, timer() - start
+        finally:
+            observer.close()
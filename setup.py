@@ -61,7 +61,7 @@ install_requires = [
     'jsonschema>=2.5.1',
 ]
 
-packages = find_packages()
+packages = find_packages(exclude=['benchmarks'])
 
 
 # Get the version string. Cannot be done with import!
@@ -85,6 +85,9 @@ setup(
     include_package_data=True,
     platforms='any',
     entry_points={
+        'console_scripts': [
+            'doschema = doschema.cli:main',
+        ],
     },
     extras_require=extras_require,
     install_requires=install_requires,
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Command line interface tests."""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from doschema.cli import main, schema_files
+from doschema.validation import JSONSchemaValidator
+
+
+@pytest.fixture
+def tree(tmpdir):
+    """Write versions of a schema in a directory tree."""
+    directory = tmpdir.mkdir('schemas')
+    directory.mkdir('v1').join('record.json').write(json.dumps({
+        'type': 'object',
+        'definitions': {'title': {'type': 'string'}},
+        'properties': {'title': {'$ref': '#/definitions/title'}},
+    }))
+    directory.mkdir('v2').join('record.json').write(json.dumps({
+        'type': 'object',
+        'properties': {
+            'title': {'$ref': '../v1/record.json#/definitions/title'},
+            'year': {'type': 'integer'},
+        },
+    }))
+    directory.mkdir('v10').join('record.json').write(json.dumps({
+        'type': 'object',
+        'properties': {'year': {'type': 'integer'}, 'pages': {}},
+    }))
+    return directory
+
+
+def test_schema_files(tree):
+    """Test that versions are ordered by the value of their numbers."""
+    assert schema_files(tree.strpath) == [
+        os.path.join('v1', 'record.json'),
+        os.path.join('v2', 'record.json'),
+        os.path.join('v10', 'record.json'),
+    ]
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_main(tree, tmpdir, capsys, monkeypatch, jobs):
+    """Test validating a tree and writing the resolved schemas."""
+    output = tmpdir.join('output')
+    cache_dir = tmpdir.join('cache')
+    argv = [tree.strpath, '--jobs', str(jobs), '--output', output.strpath,
+            '--cache-dir', cache_dir.strpath]
+    assert main(argv) == 0
+    assert '3 schemas checked, 0 failed.' in capsys.readouterr()[0]
+
+    resolved = json.loads(output.join('v2', 'record.json').read())
+    assert resolved['properties']['title'] == {'type': 'string'}
+    assert len(cache_dir.join('plans').listdir()) == 3
+    assert cache_dir.join('index.json').check()
+
+    # The next run uses the cached plans and walks no schema.
+    def walk(*args, **kwargs):
+        raise AssertionError('A cached schema was walked.')
+
+    monkeypatch.setattr(JSONSchemaValidator, '_walk', walk)
+    assert main(argv) == 0
+    assert '3 schemas checked, 0 failed.' in capsys.readouterr()[0]
+
+
+def test_main_shared_definitions(tree, capsys):
+    """Test leaving out files which are only referenced by the schemas."""
+    tree.mkdir('common').join('defs.json').write(json.dumps({
+        'definitions': {'pages': {'type': 'integer'}},
+    }))
+    tree.join('v10', 'record.json').write(json.dumps({
+        'type': 'object',
+        'properties': {
+            'year': {'type': 'integer'},
+            'pages': {'$ref': '../common/defs.json#/definitions/pages'},
+        },
+    }))
+    assert main([tree.strpath]) == 1
+    assert os.path.join('common', 'defs.json') + ": Root field / type" \
+        in capsys.readouterr()[0]
+
+    assert main([tree.strpath, '--exclude', 'common/*']) == 0
+    assert '3 schemas checked, 0 failed.' in capsys.readouterr()[0]
+    assert main([tree.strpath, '--include', 'v*/record.json']) == 0
+    assert '3 schemas checked, 0 failed.' in capsys.readouterr()[0]
+    assert schema_files(tree.strpath, ['v1*'], ['v10/*']) == \
+        [os.path.join('v1', 'record.json')]
+
+
+def test_main_conflict(tree, tmpdir, capsys):
+    """Test that conflicts are reported and make the command fail."""
+    tree.mkdir('v11').join('record.json').write(json.dumps({
+        'type': 'object',
+        'properties': {'year': {'type': 'string'}},
+    }))
+    output = tmpdir.join('output')
+    report = tmpdir.join('report.jsonl')
+    assert main([tree.strpath, '--output', output.strpath,
+                 '--report', report.strpath]) == 1
+
+    out = capsys.readouterr()[0]
+    assert os.path.join('v11', 'record.json') + ': /year type mismatch' \
+        in out
+    assert '4 schemas checked, 1 failed.' in out
+    assert json.loads(report.read())['pointer'] == '/year'
+    assert not output.check()
+
+
+def test_main_error(tree, capsys):
+    """Test that unreadable schemas are reported."""
+    tree.join('v2', 'record.json').write('{')
+    assert main([tree.strpath]) == 1
+    assert os.path.join('v2', 'record.json') + ': ' in capsys.readouterr()[0]
+
+
+def test_main_lazy_imports(tree):
+    """Test that the command does not import jsonschema."""
+    script = '\n'.join([
+        'import sys',
+        'from doschema.cli import main',
+        'main([{0!r}])'.format(tree.strpath),
+        'print("jsonschema" in sys.modules)',
+    ])
+    output = subprocess.check_output([sys.executable, '-c', script])
+    assert output.decode('utf-8').strip().endswith('False')
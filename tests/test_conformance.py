@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Document type conformance tests."""
+
+from collections import OrderedDict
+
+from doschema.conformance import DocumentChecker, json_type
+from doschema.validation import JSONSchemaValidator
+
+SCHEMA = {
+    "type": "object",
+    "properties": {
+        "title": {"type": "string"},
+        "year": {"type": "integer"},
+        "score": {"type": "number"},
+        "open": {"type": "boolean"},
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "creators": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {"name": {"type": "string"}},
+            },
+        },
+    },
+    "dependencies": {"title": ["subtitle"]},
+}
+
+
+def _checker(schemas, ignore_index=True):
+    """Return a checker compiled from the registry of the schemas."""
+    obj = JSONSchemaValidator(ignore_index)
+    for index, schema in enumerate(schemas):
+        obj.validate(schema, 'v{0}'.format(index + 1))
+    return DocumentChecker(obj.fields_types_dict, obj.ignore_index)
+
+
+def test_json_type():
+    """Test the JSON types of decoded values."""
+    assert [json_type(value) for value in (
+        None, True, 1, 1.5, u'a', {}, [], object()
+    )] == [
+        'null', 'boolean', 'integer', 'number', 'string', 'object', 'array',
+        None
+    ]
+
+
+def test_conforming_document():
+    """Test that values having their registered types pass."""
+    checker = _checker([SCHEMA])
+    document = {
+        "title": u"Title",
+        "subtitle": 5,
+        "year": 2016,
+        "score": 3,
+        "open": False,
+        "tags": ["a", "b"],
+        "creators": [OrderedDict([("name", "A")]), {"name": "B"}],
+        "unknown": {"x": [1]},
+    }
+    assert checker.check(document) == []
+    assert checker.conforms(document)
+    assert checker.conforms({"year": 2016.0})
+
+
+def test_mismatches():
+    """Test that values not having their registered types are reported."""
+    checker = _checker([SCHEMA])
+    document = {
+        "year": True,
+        "score": "high",
+        "tags": ["a", 1, "c/~"],
+        "creators": [{"name": "A"}, {"name": ["B"]}, "C"],
+    }
+    mismatches = checker.check(document)
+    assert sorted(mismatch.to_dict()['pointer']
+                  for mismatch in mismatches) == [
+        '/creators/1/name', '/creators/2', '/score', '/tags/1', '/year',
+    ]
+    mismatch = [m for m in mismatches if m.path == ('creators', 1, 'name')]
+    assert mismatch[0].message == \
+        '/creators/1/name is of type array instead of string registered ' \
+        'by v1.'
+    assert not checker.conforms(document)
+    assert not checker.conforms([])
+    assert not checker.conforms({"year": 2016.5})
+    assert checker.check({"a/b": {"c~d": 1}}) == []
+
+
+def test_untyped_fields_not_checked():
+    """Test that fields registered without a type accept any value."""
+    checker = _checker([SCHEMA])
+    assert checker.conforms({"title": None, "subtitle": [1]})
+
+
+def test_mismatches_in_document_order():
+    """Test that the values are reported in the order of the document."""
+    checker = _checker([SCHEMA])
+    document = OrderedDict([
+        ("tags", [1, 2]),
+        ("year", "2016"),
+        ("creators", [{"name": 1}]),
+    ])
+    assert [mismatch.pointer for mismatch in checker.check(document)] == [
+        '/tags/0', '/tags/1', '/year', '/creators/0/name',
+    ]
+
+
+def test_positional_items():
+    """Test checking array items by their position."""
+    schema = {
+        "type": "object",
+        "properties": {
+            "point": {
+                "type": "array",
+                "items": [{"type": "number"}, {"type": "string"}],
+                "additionalItems": {"type": "boolean"},
+            },
+            "tags": {"type": "array", "items": {"type": "string"}},
+        },
+    }
+    document = {"point": [1, "a", True, False], "tags": ["a", "b", "c"]}
+    checker = _checker([schema], ignore_index=False)
+    assert checker.conforms(document)
+    document = {"point": ["a", 1, 2], "tags": ["a", 2]}
+    assert [mismatch.pointer for mismatch in checker.check(document)] == [
+        '/point/0', '/point/1', '/point/2', '/tags/1'
+    ]
+
+
+def test_fields_of_all_versions():
+    """Test that fields of every validated schema are checked."""
+    checker = _checker([SCHEMA, {
+        "type": "object",
+        "properties": {"doi": {"type": "string"}},
+    }])
+    mismatches = checker.check({"doi": 10, "year": "x"})
+    assert sorted((mismatch.pointer, mismatch.uri)
+                  for mismatch in mismatches) == [('/doi', 'v2'),
+                                                  ('/year', 'v1')]
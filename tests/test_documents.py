@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Document cache tests."""
+
+import json
+import pickle
+
+import jsonschema
+import pytest
+
+from doschema.documents import CachingResolverFactory, DocumentCache
+from doschema.transform import resolve_references
+from doschema.validation import JSONSchemaValidator
+
+ADDRESS = {
+    'type': 'object',
+    'properties': {
+        'street': {'type': 'string'},
+        'city': {'$ref': 'city.json'},
+    },
+}
+
+
+def _schema(tmpdir):
+    """Write the referenced document and return a schema and its URI."""
+    tmpdir.join('address.json').write(json.dumps(ADDRESS))
+    tmpdir.join('city.json').write(json.dumps({'type': 'string'}))
+    schema = {
+        'type': 'object',
+        'properties': {
+            'home': {'$ref': 'address.json'},
+        }
+    }
+    return schema, 'file://' + tmpdir.join('schema.json').strpath
+
+
+def test_documents_shared_between_resolvers(tmpdir):
+    """Test that a document is retrieved once for all the resolvers."""
+    schema, uri = _schema(tmpdir)
+    cache = DocumentCache()
+    factory = CachingResolverFactory(cache)
+
+    JSONSchemaValidator(resolver_factory=factory).validate(schema, uri)
+    tmpdir.join('address.json').remove()
+    validator = JSONSchemaValidator(resolver_factory=factory)
+    validator.validate(schema, uri)
+    resolved = resolve_references(
+        schema, uri, factory(base_uri=uri, referrer=schema)
+    )
+
+    assert validator.fields_types_dict[('home', 'street')].field_type == \
+        'string'
+    assert resolved['properties']['home']['properties']['street'] == \
+        {'type': 'string'}
+    assert (cache.hits, cache.misses) == (4, 2)
+    # Resolving references does not modify the cached document.
+    assert cache.get(uri.replace('schema.json', 'address.json')) == ADDRESS
+
+
+def test_documents_stored_on_disk(tmpdir):
+    """Test that another cache reuses the documents stored on disk."""
+    schema, uri = _schema(tmpdir)
+    directory = tmpdir.join('cache').strpath
+    factory = CachingResolverFactory(DocumentCache(directory=directory))
+    JSONSchemaValidator(resolver_factory=factory).validate(schema, uri)
+    tmpdir.join('address.json').remove()
+
+    # A pickled factory, as sent to the workers of validate_parallel.
+    factory = pickle.loads(pickle.dumps(factory))
+    assert len(factory.cache) == 0
+    JSONSchemaValidator(resolver_factory=factory).validate(schema, uri)
+    assert factory.cache.hits == 2
+
+    factory = CachingResolverFactory(DocumentCache(directory=directory,
+                                                   max_age=-1))
+    with pytest.raises(jsonschema.RefResolutionError):
+        JSONSchemaValidator(resolver_factory=factory).validate(schema, uri)
+
+
+def test_documents_size_eviction():
+    """Test that the least recently used documents are evicted."""
+    cache = DocumentCache(maxsize=40)
+    cache['a'] = {'type': 'string'}
+    cache['b'] = {'type': 'number'}
+    assert cache.get('a') == {'type': 'string'}
+    cache['c'] = {'type': 'object'}
+
+    assert 'b' not in cache
+    assert 'a' in cache and 'c' in cache
+    assert cache.size <= 40
+
+    cache['d'] = {'enum': ['x' * 100]}
+    assert 'd' not in cache
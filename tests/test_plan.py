@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+import json
+
+import pytest
+
+from doschema.errors import JSONSchemaCompatibilityError
+from doschema.plan import DiskPlanCache, FieldPlan, PlanCache, schema_digest
+from doschema.validation import JSONSchemaValidator
+
+
+class WalkCountingValidator(JSONSchemaValidator):
+    """Validator counting the schemas it walks."""
+
+    walks = 0
+
+    def _walk(self, curr_schema, curr_field, emit, root=None):
+        WalkCountingValidator.walks += 1
+        return super(WalkCountingValidator, self)._walk(
+            curr_schema, curr_field, emit, root
+        )
+
+
+def test_schema_digest_ignores_keys_order():
+    """Test that the digest does not depend on the order of the keys."""
+    assert schema_digest({"type": "object", "properties": {}}) == \
+        schema_digest({"properties": {}, "type": "object"})
+    assert schema_digest({"type": "object"}) != \
+        schema_digest({"type": "string"})
+    assert schema_digest({"type": object}) is None
+
+
+def test_cached_plan_is_applied_without_walk():
+    """Test that a schema with the same content is walked once."""
+    v1 = {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"}
+        }
+    }
+    v2 = {
+        "properties": {
+            "title": {"type": "integer"}
+        },
+        "type": "object"
+    }
+    cache = PlanCache()
+    WalkCountingValidator.walks = 0
+
+    first = WalkCountingValidator(plan_cache=cache)
+    first.validate(v1, 'first')
+    second = WalkCountingValidator(plan_cache=cache)
+    second.validate(dict(v1), 'first')
+    assert WalkCountingValidator.walks == 1
+    assert cache.hits == 1
+    assert second.fields_types_dict == first.fields_types_dict
+
+    with pytest.raises(JSONSchemaCompatibilityError) as excinfo:
+        second.validate(v2, 'second')
+    assert excinfo.value.prev_schema == 'first'
+    assert WalkCountingValidator.walks == 2
+
+
+def test_failed_plan_is_not_cached():
+    """Test that plans ending with an error are not reused."""
+    v1 = {
+        "type": "object",
+        "properties": {
+            "field_A": {"type": "integer", "enum": ["Text"]}
+        }
+    }
+    cache = PlanCache()
+    obj = JSONSchemaValidator(plan_cache=cache)
+    plan = obj.compile(v1, 'first')
+    assert plan.failed
+    assert len(cache) == 0
+    with pytest.raises(JSONSchemaCompatibilityError) as excinfo:
+        obj.apply_plan(plan, 'first')
+    assert 'first' in str(excinfo.value)
+
+
+def test_plan_cache_evicts_least_recently_used():
+    """Test that the cache keeps at most maxsize plans."""
+    cache = PlanCache(maxsize=2)
+    cache['a'] = FieldPlan([])
+    cache['b'] = FieldPlan([])
+    assert cache.get('a') is not None
+    cache['c'] = FieldPlan([])
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert len(cache) == 2
+
+
+def test_disk_plan_cache(tmpdir):
+    """Test that plans are reused until a referenced document changes."""
+    definitions = tmpdir.join('definitions.json')
+    definitions.write(json.dumps({
+        "definitions": {
+            "address": {"type": "object"}
+        }
+    }))
+    schema = {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"},
+            "address": {"$ref": "definitions.json#/definitions/address"}
+        },
+        "dependencies": {
+            "title": ["subtitle"]
+        }
+    }
+    uri = 'file://' + str(tmpdir.join('record.json'))
+    cache_dir = str(tmpdir.join('cache'))
+    WalkCountingValidator.walks = 0
+
+    first = WalkCountingValidator(plan_cache=DiskPlanCache(cache_dir))
+    first.validate(schema, uri)
+    assert WalkCountingValidator.walks == 1
+
+    second = WalkCountingValidator(plan_cache=DiskPlanCache(cache_dir))
+    result = second.validate(schema, uri)
+    assert WalkCountingValidator.walks == 1
+    assert second.plan_cache.hits == 1
+    assert second.fields_types_dict == first.fields_types_dict
+    assert result.untyped_pointers == ['/title']
+
+    definitions.write(json.dumps({
+        "definitions": {
+            "address": {"type": "string"}
+        }
+    }))
+    third = WalkCountingValidator(plan_cache=DiskPlanCache(cache_dir))
+    third.validate(schema, uri)
+    assert WalkCountingValidator.walks == 2
+    assert third.fields_types_dict[('address',)].field_type == 'string'
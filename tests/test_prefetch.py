@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Remote documents prefetching tests."""
+
+import json
+import threading
+import time
+
+import jsonschema
+import pytest
+from six.moves import BaseHTTPServer, socketserver
+
+from doschema.prefetch import PrefetchResolverFactory, RemotePrefetcher
+from doschema.transform import resolve_references
+from doschema.validation import JSONSchemaValidator
+
+
+class _Server(socketserver.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """HTTP server standing in for a remote schema host."""
+
+    daemon_threads = True
+
+    def __init__(self, documents):
+        """Constructor."""
+        BaseHTTPServer.HTTPServer.__init__(
+            self, ('127.0.0.1', 0), _Handler
+        )
+        self.documents = documents
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+
+    @property
+    def base_uri(self):
+        """URI of the root of the server."""
+        return 'http://127.0.0.1:{0}/'.format(self.server_address[1])
+
+
+class _Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Serve the documents of the server, slowly."""
+
+    protocol_version = 'HTTP/1.1'
+
+    def setup(self):
+        """Count the connections."""
+        BaseHTTPServer.BaseHTTPRequestHandler.setup(self)
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        """Return a document or a 404 error."""
+        server = self.server
+        with server.lock:
+            server.requests.append(self.path)
+            server.active += 1
+            server.max_active = max(server.max_active, server.active)
+        time.sleep(0.05)
+        with server.lock:
+            server.active -= 1
+
+        document = server.documents.get(self.path.lstrip('/'))
+        if document is None:
+            body = b'Not found'
+            self.send_response(404)
+        else:
+            body = json.dumps(document).encode('utf-8')
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        """Do not log the requests."""
+        pass
+
+
+@pytest.fixture
+def server():
+    """Run a local HTTP server with schema documents."""
+    documents = dict(
+        ('field_{0}.json'.format(index), {'type': 'integer'})
+        for index in range(6)
+    )
+    documents['address.json'] = {
+        'type': 'object',
+        'properties': {
+            'street': {'type': 'string'},
+            'city': {'$ref': 'city.json#/definitions/city'},
+        }
+    }
+    documents['city.json'] = {'definitions': {'city': {'type': 'string'}}}
+
+    server = _Server(documents)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_prefetch_concurrency_limit(server):
+    """Test that documents are fetched concurrently up to the limit."""
+    schema = {
+        'type': 'object',
+        'properties': dict(
+            ('field_{0}'.format(index),
+             {'$ref': 'field_{0}.json'.format(index)})
+            for index in range(6)
+        )
+    }
+    prefetcher = RemotePrefetcher(concurrency=2)
+    store = prefetcher.prefetch(schema, server.base_uri + 'root.json')
+    prefetcher.close()
+
+    assert len(store) == 6
+    assert server.max_active == 2
+    # Connections are kept open and reused for the following documents.
+    assert server.connections == 2
+
+
+def test_prefetch_referenced_documents(server):
+    """Test that documents referenced by fetched ones are fetched too."""
+    uri = server.base_uri + 'root.json'
+    schema = {
+        'type': 'object',
+        'properties': {
+            'home': {'$ref': 'address.json'},
+            'work': {'$ref': 'address.json'},
+        }
+    }
+    factory = PrefetchResolverFactory(RemotePrefetcher())
+    validator = JSONSchemaValidator(resolver_factory=factory)
+    validator.validate(schema, uri)
+    resolved = resolve_references(
+        schema, uri, factory(base_uri=uri, referrer=schema)
+    )
+
+    assert sorted(server.requests) == ['/address.json', '/city.json']
+    assert validator.fields_types_dict[('home', 'city')].field_type == \
+        'string'
+    assert resolved['properties']['work']['properties']['city'] == \
+        {'type': 'string'}
+
+
+def test_prefetch_missing_document(server):
+    """Test that a missing document is reported by the resolver."""
+    uri = server.base_uri + 'root.json'
+    schema = {
+        'type': 'object',
+        'properties': {'field': {'$ref': 'missing.json'}}
+    }
+    prefetcher = RemotePrefetcher()
+    validator = JSONSchemaValidator(
+        resolver_factory=PrefetchResolverFactory(prefetcher)
+    )
+    with pytest.raises(jsonschema.RefResolutionError):
+        validator.validate(schema, uri)
+    assert list(prefetcher.errors) == [server.base_uri + 'missing.json']
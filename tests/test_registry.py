@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+import pytest
+
+from doschema.errors import JSONSchemaCompatibilityError
+from doschema.registry import CompactRegistry, pointer_path
+from doschema.validation import FieldToAdd, JSONSchemaValidator
+
+SCHEMAS = [
+    ({
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"},
+            "creators": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "name": {"type": "string"},
+                        "affiliation": {"type": "string"}
+                    }
+                }
+            }
+        },
+        "dependencies": {
+            "title": ["subtitle"]
+        }
+    }, 'first'),
+    ({
+        "type": "object",
+        "properties": {
+            "creators": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "orcid": {"type": "string"}
+                    }
+                }
+            }
+        }
+    }, 'second'),
+]
+
+
+def test_compact_registry_same_fields_as_dict():
+    """Test that the compact registry registers the same fields."""
+    expected = JSONSchemaValidator()
+    obj = JSONSchemaValidator()
+    obj.set_registry(CompactRegistry())
+    for schema, uri in SCHEMAS:
+        assert obj.validate(schema, uri).untyped_fields == \
+            expected.validate(schema, uri).untyped_fields
+
+    registry = obj.fields_types_dict
+    assert len(registry) == len(expected.fields_types_dict)
+    assert dict(registry) == expected.fields_types_dict
+    assert registry.uris() == ['first', 'second']
+
+    with pytest.raises(JSONSchemaCompatibilityError) as excinfo:
+        obj.validate({
+            "type": "object",
+            "properties": {"title": {"type": "integer"}}
+        }, 'third')
+    assert excinfo.value.prev_schema == 'first'
+
+
+def test_compact_registry_interns_segments():
+    """Test that equal path segments are stored once."""
+    registry = CompactRegistry()
+    registry[('a', 'name')] = FieldToAdd('first', ('a', 'name'), 'string')
+    registry[('b', 'na' + 'me')] = FieldToAdd('first', ('b', 'name'), 'string')
+    segments = [
+        next(iter(node.children)) for node in registry.root.children.values()
+    ]
+    assert segments[0] is segments[1]
+
+
+def test_compact_registry_delete_prunes_nodes():
+    """Test that removing fields removes the nodes leading to them."""
+    registry = CompactRegistry([
+        ((), FieldToAdd('first', (), 'object')),
+        (('a', 'b', 'c'), FieldToAdd('first', ('a', 'b', 'c'), 'string')),
+    ])
+    assert ('a', 'b') not in registry
+    assert registry.get(('a', 'b')) is None
+    del registry[('a', 'b', 'c')]
+    assert registry.root.children is None
+    assert list(registry) == [()]
+    with pytest.raises(KeyError):
+        del registry[('a', 'b', 'c')]
+
+
+def test_compact_registry_json_pointer():
+    """Test that JSON pointers are built once and cached."""
+    registry = CompactRegistry()
+    registry[('a', 0, 'b')] = FieldToAdd('first', ('a', 0, 'b'), 'string')
+    pointer = registry.json_pointer(('a', 0, 'b'))
+    assert pointer == JSONSchemaValidator.make_json_pointer(('a', 0, 'b'))
+    assert registry.json_pointer(('a', 0, 'b')) is pointer
+    with pytest.raises(KeyError):
+        registry.json_pointer(('a', 0))
+
+
+def test_pointer_path():
+    """Test splitting JSON pointers into path segments."""
+    assert pointer_path('/') == ()
+    assert pointer_path('') == ()
+    assert pointer_path('/a/0/') == ('a', '0', '')
+    assert pointer_path('/a~1b/c~0d~01') == ('a/b', 'c~d~1')
+    with pytest.raises(ValueError):
+        pointer_path('a/b')
+
+
+def test_compact_registry_lookup():
+    """Test looking fields up by JSON pointer."""
+    obj = JSONSchemaValidator(False)
+    obj.set_registry(CompactRegistry())
+    for schema, uri in SCHEMAS:
+        obj.validate(schema, uri)
+    obj.validate({
+        "type": "object",
+        "properties": {
+            "points": {"type": "array", "items": [{"type": "number"}]},
+            "a/b": {"type": "string"},
+        },
+    }, 'third')
+    registry = obj.fields_types_dict
+
+    assert registry.lookup('/') == registry[()]
+    assert registry.lookup('/creators/items/properties/orcid') is None
+    assert registry.lookup('/creators/items/orcid') == \
+        FieldToAdd('second', ('creators', 'items', 'orcid'), 'string')
+    assert registry.lookup('/points/items/0') == \
+        FieldToAdd('third', ('points', 'items', 0), 'number')
+    assert registry.lookup('/a~1b').field_type == 'string'
+    assert registry.lookup('/creators/items/name/first') is None
+
+
+def test_compact_registry_subtree():
+    """Test iterating over the fields under a JSON pointer in order."""
+    registry = CompactRegistry()
+    for path in [('b', ), ('a', 'y'), ('a', 'x', 1), ('a', 'x', 0), ('ab', ),
+                 ('a', 'x', 'name'), ('a', 'x', 10), ('a', 'x', 2), ()]:
+        registry[path] = FieldToAdd('first', path, 'string')
+
+    assert [field.field_tuple for field in registry.subtree('/a')] == [
+        ('a', 'x', 0), ('a', 'x', 1), ('a', 'x', 2), ('a', 'x', 10),
+        ('a', 'x', 'name'), ('a', 'y'),
+    ]
+    assert [field.field_tuple for field in registry.subtree('/a/x/1')] == \
+        [('a', 'x', 1)]
+    assert [field.field_tuple for field in registry.subtree('/')] == \
+        [(), ('a', 'x', 0), ('a', 'x', 1), ('a', 'x', 2), ('a', 'x', 10),
+         ('a', 'x', 'name'), ('a', 'y'), ('ab', ), ('b', )]
+    assert list(registry.subtree('/c')) == []
+
+    assert [field.field_tuple for field in registry.prefix('/a')] == [
+        ('a', 'x', 0), ('a', 'x', 1), ('a', 'x', 2), ('a', 'x', 10),
+        ('a', 'x', 'name'), ('a', 'y'), ('ab', ),
+    ]
+    assert [field.field_tuple for field in registry.prefix('/a/x/1')] == \
+        [('a', 'x', 1), ('a', 'x', 10)]
+    assert [field.field_tuple for field in registry.prefix('/a/')] == [
+        ('a', 'x', 0), ('a', 'x', 1), ('a', 'x', 2), ('a', 'x', 10),
+        ('a', 'x', 'name'), ('a', 'y'),
+    ]
+    assert list(registry.prefix('/c/d')) == []
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Conflict report tests."""
+
+import json
+
+from six import StringIO
+
+from doschema.report import write_json_lines
+from doschema.validation import JSONSchemaValidator
+
+
+def test_write_json_lines():
+    """Test that conflicts are written one per line."""
+    schemas = [
+        ({"type": "object", "properties": {"A": {"type": "string"}}}, 'a'),
+        ({"type": "object", "properties": {"A": {"type": "number"}}}, 'b'),
+        ({"type": "object", "properties": {"A": {"type": "string"}}}, 'c'),
+        ({"type": "object", "properties": {"A": {"type": "array"}}}, 'd'),
+    ]
+    obj = JSONSchemaValidator(collect_conflicts=True)
+    fp = StringIO()
+
+    assert write_json_lines(obj.validate_many(schemas), fp) == 2
+    lines = [json.loads(line) for line in fp.getvalue().splitlines()]
+    assert [line['uri'] for line in lines] == ['b', 'd']
+    assert lines[1] == {
+        'kind': 'type',
+        'pointer': '/A',
+        'expected_type': 'string',
+        'found_type': 'array',
+        'uri': 'd',
+        'previous_uri': 'a',
+        'message': '/A type mismatch in schemas a and d.',
+    }
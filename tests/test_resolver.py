@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Reference resolvers tests."""
+
+import subprocess
+import sys
+
+import jsonschema
+import pytest
+
+from doschema.resolver import LocalRefResolver
+from doschema.transform import resolve_references
+from doschema.validation import JSONSchemaValidator
+
+SCHEMA = {
+    'type': 'object',
+    'definitions': {
+        'name': {'type': 'string'},
+        'a/b': {'type': 'integer'},
+        'pair': [{'type': 'number'}, {'type': 'boolean'}],
+    },
+    'properties': {
+        'name': {'$ref': '#/definitions/name'},
+        'slash': {'$ref': '#/definitions/a~1b'},
+        'second': {'$ref': '#/definitions/pair/1'},
+        'code': {'$ref': 'other.json#/definitions/code'},
+    },
+}
+
+OTHER = {'definitions': {'code': {'type': 'integer'}}}
+
+
+def test_local_resolver():
+    """Test resolving references within the known documents."""
+    resolver = LocalRefResolver(
+        'http://example.org/schema.json', SCHEMA,
+        {'http://example.org/other.json': OTHER}
+    )
+    assert resolver.resolve('#/definitions/a~1b') == (
+        'http://example.org/schema.json#/definitions/a~1b',
+        {'type': 'integer'}
+    )
+    assert resolver.resolve('other.json#/definitions/code')[1] == \
+        {'type': 'integer'}
+    assert resolver.resolve('#')[1] is SCHEMA
+
+    resolver.push_scope('other.json')
+    assert resolver.base_uri == 'http://example.org/other.json'
+    assert resolver.resolve('#/definitions/code')[1] == {'type': 'integer'}
+    resolver.pop_scope()
+    assert resolver.base_uri == 'http://example.org/schema.json'
+
+
+def test_local_resolver_errors():
+    """Test that unknown documents and pointers raise RefResolutionError."""
+    resolver = LocalRefResolver('http://example.org/schema.json', SCHEMA)
+    with pytest.raises(jsonschema.RefResolutionError):
+        resolver.resolve('other.json#/definitions/code')
+    with pytest.raises(jsonschema.RefResolutionError):
+        resolver.resolve('#/definitions/missing')
+    with pytest.raises(jsonschema.RefResolutionError):
+        resolver.resolve('#/definitions/pair/x')
+
+
+def test_local_resolver_factory():
+    """Test validating and transforming with the local resolver."""
+    uri = 'http://example.org/schema.json'
+    schema = dict(SCHEMA, properties=dict(SCHEMA['properties']))
+    del schema['properties']['code']
+
+    obj = JSONSchemaValidator(resolver_factory=LocalRefResolver)
+    obj.validate(schema, uri)
+    expected = JSONSchemaValidator()
+    expected.validate(schema, uri)
+    assert obj.fields_types_dict == expected.fields_types_dict
+
+    resolved = resolve_references(
+        schema, uri, LocalRefResolver(uri, schema)
+    )
+    assert resolved['properties']['second'] == {'type': 'boolean'}
+
+
+def test_lazy_imports():
+    """Test that validating with the local resolver imports no jsonschema."""
+    script = '\n'.join([
+        'import sys',
+        'from doschema.resolver import LocalRefResolver',
+        'from doschema.validation import JSONSchemaValidator',
+        'obj = JSONSchemaValidator(resolver_factory=LocalRefResolver)',
+        'obj.validate({0!r}, "schema.json")'.format({
+            'type': 'object',
+            'definitions': {'a': {'type': 'string'}},
+            'properties': {'a': {'$ref': '#/definitions/a'}},
+        }),
+        'print(sorted(name for name in ("jsonschema", "multiprocessing")',
+        '             if name in sys.modules))',
+    ])
+    output = subprocess.check_output([sys.executable, '-c', script])
+    assert output.decode('utf-8').strip() == '[]'
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+import pytest
+
+from doschema.errors import JSONSchemaCompatibilityError
+from doschema.snapshot import RegistrySnapshot, SnapshotError, dump_registry, \
+    load_registry
+from doschema.validation import JSONSchemaValidator
+
+
+def _validated():
+    """Return a validator which has validated two schemas."""
+    v1 = {
+        "type": "object",
+        "properties": {
+            "title": {"type": "string"},
+            "creators": {
+                "type": "array",
+                "items": [
+                    {"type": "object"},
+                    {"type": "string"}
+                ]
+            }
+        },
+        "dependencies": {
+            "title": ["subtitle"]
+        }
+    }
+    v2 = {
+        "type": "object",
+        "properties": {
+            "year": {"type": "integer"}
+        }
+    }
+    obj = JSONSchemaValidator(ignore_index=False)
+    obj.validate(v1, 'first')
+    obj.validate(v2, 'second')
+    return obj
+
+
+def test_snapshot_round_trip(tmpdir):
+    """Test that a loaded snapshot contains the registered fields."""
+    filename = str(tmpdir.join('registry.snapshot'))
+    obj = _validated()
+    dump_registry(obj, filename)
+
+    snapshot = RegistrySnapshot(filename)
+    assert len(snapshot) == len(obj.fields_types_dict)
+    assert dict(snapshot) == obj.fields_types_dict
+    assert snapshot[('creators', 'items', 1)].field_type == 'string'
+    assert ('creators', 'items', '1') not in snapshot
+    assert snapshot.untyped_paths() == [('title',)]
+    snapshot.close()
+
+
+def test_snapshot_validate_new_schema(tmpdir):
+    """Test that new schemas are checked against a loaded snapshot."""
+    filename = str(tmpdir.join('registry.snapshot'))
+    dump_registry(_validated(), filename)
+
+    obj = JSONSchemaValidator(ignore_index=False)
+    load_registry(obj, filename)
+    obj.validate({
+        "type": "object",
+        "properties": {
+            "pages": {"type": "integer"}
+        }
+    }, 'third')
+    assert obj.fields_types_dict[('pages',)].schema_index == 'third'
+    assert obj.fields_types_dict[('year',)].schema_index == 'second'
+
+    with pytest.raises(JSONSchemaCompatibilityError) as excinfo:
+        obj.validate({
+            "type": "object",
+            "properties": {
+                "year": {"type": "string"}
+            }
+        }, 'fourth')
+    assert excinfo.value.prev_schema == 'second'
+
+    # The snapshot itself is not modified.
+    assert ('pages',) not in RegistrySnapshot(filename)
+
+
+def test_snapshot_registry_delete(tmpdir):
+    """Test that fields can be removed from a loaded snapshot."""
+    filename = str(tmpdir.join('registry.snapshot'))
+    dump_registry(_validated(), filename)
+
+    obj = JSONSchemaValidator()
+    load_registry(obj, filename)
+    registry = obj.fields_types_dict
+    size = len(registry)
+    del registry[('year',)]
+    assert ('year',) not in registry
+    assert registry.get(('year',)) is None
+    assert len(registry) == size - 1
+    assert ('year',) not in list(registry)
+
+
+def test_not_a_snapshot(tmpdir):
+    """Test that loading another file fails."""
+    filename = tmpdir.join('registry.snapshot')
+    filename.write('{"type": "object", "properties": {}}')
+    with pytest.raises(SnapshotError):
+        RegistrySnapshot(str(filename))
@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Statistics tests."""
+
+from doschema.stats import Stats
+from doschema.transform import resolve_references
+from doschema.validation import JSONSchemaValidator
+
+SCHEMA = {
+    "definitions": {
+        "address": {
+            "type": "object",
+            "properties": {"street": {"type": "string"}}
+        }
+    },
+    "type": "object",
+    "properties": {
+        "billing": {"$ref": "#/definitions/address"},
+        "shipping": {"$ref": "#/definitions/address"},
+        "kind": {"type": "string", "enum": ["a", "b"]}
+    }
+}
+
+
+def test_validator_stats():
+    """Test that the validator counts nodes, references and fields."""
+    stats = Stats()
+    obj = JSONSchemaValidator(stats=stats)
+    obj.validate(SCHEMA, 'first')
+
+    assert stats.nodes == 6
+    assert (stats.ref_hits, stats.ref_misses) == (1, 1)
+    assert stats.keyword_calls['type'] == 6
+    assert stats.keyword_calls['properties'] == 3
+    assert stats.keyword_calls['enum'] == 1
+    assert stats.keyword_calls['$ref'] == 1
+    assert list(stats.schema_seconds) == ['first']
+    assert stats.registry_size == len(obj.fields_types_dict) == 6
+
+
+def test_merge_stats():
+    """Test that merged fields are timed as the validated ones."""
+    stats = Stats()
+    obj = JSONSchemaValidator(stats=stats)
+    obj.merge_fields(JSONSchemaValidator().extract_fields(SCHEMA, 'u'), 'u')
+
+    assert stats.nodes == 0
+    assert stats.keyword_calls['type'] == 6
+    assert stats.schemas == 1
+    assert stats.registry_size == 6
+
+
+def test_resolve_references_stats():
+    """Test that reference resolution counts nodes and references."""
+    stats = Stats()
+    resolve_references(SCHEMA, stats=stats)
+
+    assert stats.ref_misses == 2
+    assert stats.keyword_calls['$ref'] == 2
+    assert stats.schemas == 1
+    assert stats.to_dict()['ref_misses'] == 2
+
+
+def test_prometheus_format():
+    """Test the Prometheus text format of the statistics."""
+    stats = Stats()
+    stats.nodes = 3
+    stats.add_time('type', 0.5)
+    stats.add_schema('a', 0.25, 2)
+
+    lines = stats.to_prometheus().splitlines()
+    assert '# TYPE doschema_nodes_total counter' in lines
+    assert 'doschema_nodes_total 3' in lines
+    assert 'doschema_ref_resolutions_total{result="hit"} 0' in lines
+    assert 'doschema_keyword_calls_total{keyword="type"} 1' in lines
+    assert 'doschema_keyword_seconds_total{keyword="type"} 0.5' in lines
+    assert 'doschema_schema_seconds_count 1' in lines
+    assert 'doschema_schema_seconds_sum 0.25' in lines
+    assert 'doschema_registry_fields 2' in lines
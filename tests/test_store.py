@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Offline schema store tests."""
+
+import json
+
+import jsonschema
+import pytest
+
+from doschema.store import SchemaStore, path_uri
+from doschema.transform import resolve_references
+from doschema.validation import JSONSchemaValidator
+
+SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'home': {'$ref': 'http://example.org/schemas/address.json'},
+        'city': {'$ref': 'http://example.org/cities/city.json#/definitions/c'},
+    }
+}
+
+
+@pytest.fixture
+def schemas(tmpdir):
+    """Write schemas in a directory."""
+    directory = tmpdir.mkdir('schemas')
+    directory.join('address.json').write(json.dumps({
+        '$id': 'http://example.org/schemas/address.json',
+        'type': 'object',
+        'properties': {'street': {'type': 'string'}},
+    }))
+    directory.mkdir('nested').join('city.json').write(json.dumps({
+        'definitions': {'c': {'type': 'string'}},
+    }))
+    return directory
+
+
+def test_store_resolves_by_id_and_path(schemas):
+    """Test that schemas are resolved by identifier and by path."""
+    store = SchemaStore([
+        schemas.strpath,
+        (schemas.join('nested').strpath, 'http://example.org/cities/'),
+    ])
+    validator = JSONSchemaValidator(resolver_factory=store.resolver)
+    validator.validate(SCHEMA, 'http://example.org/schemas/root.json')
+    resolved = resolve_references(
+        SCHEMA, 'root.json', store.resolver('root.json', SCHEMA)
+    )
+
+    assert len(store) == 2
+    assert path_uri(schemas.join('address.json').strpath) in store
+    assert validator.fields_types_dict[('home', 'street')].field_type == \
+        'string'
+    assert resolved['properties']['city'] == {'type': 'string'}
+
+
+def test_store_loads_lazily(schemas):
+    """Test that the scanned schemas are only kept once referenced."""
+    store = SchemaStore([schemas.strpath])
+    assert store._documents == {}
+    assert 'http://example.org/schemas/address.json' in store
+    store.load('http://example.org/schemas/address.json')
+    assert len(store._documents) == 1
+
+
+def test_store_does_not_access_network(schemas):
+    """Test that a schema missing from the store is not downloaded."""
+    store = SchemaStore([schemas.strpath])
+    validator = JSONSchemaValidator(resolver_factory=store.resolver)
+    with pytest.raises(jsonschema.RefResolutionError) as excinfo:
+        validator.validate(SCHEMA, 'root.json')
+    assert 'not in the schema store' in str(excinfo.value)
+
+
+def test_store_index_file(schemas, tmpdir):
+    """Test that the index file avoids parsing unchanged schemas."""
+    index_file = tmpdir.join('index.json').strpath
+    SchemaStore([schemas.strpath], index_file)
+
+    store = SchemaStore([schemas.strpath], index_file)
+    assert store._documents == {}
+    assert 'http://example.org/schemas/address.json' in store
+    store.load('http://example.org/schemas/address.json')
+    assert len(store._documents) == 1
+
+    schemas.join('address.json').write(json.dumps({
+        '$id': 'http://example.org/schemas/other.json'
+    }))
+    store = SchemaStore([schemas.strpath], index_file)
+    assert 'http://example.org/schemas/other.json' in store
+    assert 'http://example.org/schemas/address.json' not in store
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Streaming schema ingestion tests."""
+
+import io
+import json
+
+import pytest
+
+from doschema.store import path_uri
+from doschema.stream import load_structure, validate_file
+from doschema.validation import JSONSchemaValidator
+
+SCHEMA = {
+    'title': 'Record',
+    'description': u'Long "quoted" text with \\ escapes and é☃.',
+    'type': 'object',
+    'definitions': {
+        'name': {'type': 'string', 'examples': [{'type': 'integer'}]},
+    },
+    'properties': {
+        u'café': {'$ref': '#/definitions/name'},
+        'kind': {
+            'type': 'string',
+            'enum': ['a', 'b\\"', u'é', 'c'],
+            'description': '{[not a bracket',
+        },
+        'mixed': {'enum': [1, 2.5, 3, True, None, {'x': [1]}, [2], 'd']},
+        'points': {
+            'type': 'array',
+            'items': [{'type': 'number'}, {'type': 'number'}],
+            'additionalItems': False,
+        },
+        'tags': {'type': 'array', 'items': {'type': 'string'}},
+        'either': {'anyOf': [{'type': 'string'}, {'default': None}]},
+    },
+    'dependencies': {'kind': ['tags'], 'tags': {'properties': {}}},
+    'required': ['kind'],
+}
+
+STRUCTURE = {
+    'type': 'object',
+    'definitions': {'name': {'type': 'string'}},
+    'properties': {
+        u'café': {'$ref': '#/definitions/name'},
+        'kind': {'type': 'string', 'enum': [u'']},
+        'mixed': {'enum': [0, 0.0, False, None, {}, [], u'']},
+        'points': {
+            'type': 'array',
+            'items': [{'type': 'number'}, {'type': 'number'}],
+            'additionalItems': False,
+        },
+        'tags': {'type': 'array', 'items': {'type': 'string'}},
+        'either': {'anyOf': [{'type': 'string'}, {}]},
+    },
+    'dependencies': {'kind': ['tags'], 'tags': {'properties': {}}},
+}
+
+
+@pytest.mark.parametrize('chunk_size', [1, 5, 64 * 1024])
+@pytest.mark.parametrize('indent', [None, 2])
+def test_load_structure(chunk_size, indent):
+    """Test that only the structural keywords are kept."""
+    fp = io.StringIO(json.dumps(SCHEMA, indent=indent))
+    assert load_structure(fp, chunk_size) == STRUCTURE
+
+
+def test_validate_file(tmpdir):
+    """Test that validating a file registers the fields of the schema."""
+    schema_file = tmpdir.join('schema.json')
+    schema = dict(SCHEMA, properties=dict(SCHEMA['properties']))
+    del schema['properties']['mixed']
+    schema_file.write(json.dumps(schema))
+    obj = JSONSchemaValidator(False)
+    result = validate_file(obj, schema_file.strpath)
+
+    expected = JSONSchemaValidator(False)
+    expected.validate(schema, result.uri)
+    assert result.uri == path_uri(schema_file.strpath)
+    assert obj.fields_types_dict == expected.fields_types_dict
+
+
+def test_load_structure_memory(tmpdir):
+    """Test that the memory used does not depend on the size of the file."""
+    tracemalloc = pytest.importorskip('tracemalloc')
+    schema_file = tmpdir.join('schema.json')
+    schema_file.write(json.dumps({
+        'type': 'object',
+        'description': 'x' * 4000000,
+        'properties': {
+            'kind': {'type': 'string', 'enum': [
+                'value {0}'.format(index) for index in range(100000)
+            ]},
+        },
+    }))
+
+    tracemalloc.start()
+    try:
+        with io.open(schema_file.strpath, encoding='utf-8') as fp:
+            schema = load_structure(fp)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    assert schema['properties']['kind'] == {'type': 'string', 'enum': ['']}
+    assert peak < schema_file.size() / 4
@@ -22,11 +22,17 @@
 # waive the privileges and immunities granted to it by virtue of its status
 # as an Intergovernmental Organization or submit itself to any jurisdiction.
 
+import logging
+import os
+import sys
+
 import jsonschema
 import pytest
 
 from doschema.errors import JSONSchemaCompatibilityError
-from doschema.validation import JSONSchemaValidator
+from doschema.plan import PlanCache
+from doschema.stats import Stats
+from doschema.validation import FieldToAdd, JSONSchemaValidator
 
 
 def test_no_conflicting_fields():
@@ -689,3 +695,664 @@ def test_ignoring_indices():
     obj = JSONSchemaValidator()
     with pytest.raises(JSONSchemaCompatibilityError):
         obj.validate(v1, 'first')
+
+
+def test_positional_items_with_equal_schemas():
+    """Test that equal item schemas get their own positions."""
+    v1 = {
+        "type": "object",
+        "properties": {
+            "point": {
+                "type": "array",
+                "items": [{"type": "number"}] * 2000 + [{"type": "string"}]
+            }
+        }
+    }
+    obj = JSONSchemaValidator(False)
+    obj.validate(v1, 'first')
+    assert obj.fields_types_dict[('point', 'items', 1999)].field_type == \
+        'number'
+    assert obj.fields_types_dict[('point', 'items', 2000)].field_type == \
+        'string'
+
+
+def test_additional_items():
+    """Test that the schema of additional array items is checked."""
+    v1 = {
+        "type": "object",
+        "properties": {
+            "row": {
+                "type": "array",
+                "items": [{"type": "string"}],
+                "additionalItems": {"type": "integer"}
+            }
+        }
+    }
+    obj = JSONSchemaValidator(False)
+    obj.validate(v1, 'first')
+    assert obj.fields_types_dict[('row', 'additionalItems')].field_type == \
+        'integer'
+
+    obj = JSONSchemaValidator()
+    with pytest.raises(JSONSchemaCompatibilityError):
+        obj.validate(v1, 'first')
+
+
+def _nested_schema(depth, leaf_type):
+    """Build a schema with ``depth`` nested object properties."""
+    schema = {"type": leaf_type}
+    for _ in range(depth):
+        schema = {"type": "object", "properties": {"nested": schema}}
+    return schema
+
+
+def test_deeply_nested_schema_pass():
+    """Test that a schema nested deeper than the recursion limit passes."""
+    depth = sys.getrecursionlimit() * 2
+    obj = JSONSchemaValidator()
+    obj.validate(_nested_schema(depth, "string"), 'first')
+    assert obj.fields_types_dict[('nested',) * depth].field_type == 'string'
+
+
+def test_deeply_nested_schema_conflict():
+    """Test that a conflict deeper than the recursion limit is found."""
+    depth = sys.getrecursionlimit() * 2
+    obj = JSONSchemaValidator()
+    obj.validate(_nested_schema(depth, "string"), 'first')
+    with pytest.raises(JSONSchemaCompatibilityError):
+        obj.validate(_nested_schema(depth, "integer"), 'second')
+
+
+def test_first_conflict_in_walk_order():
+    """Test that the first conflict in walk order is reported."""
+    v1 = {
+        "type": "object",
+        "properties": {
+            "field_A": {"type": "string"},
+            "field_B": {"type": "string"}
+        }
+    }
+    v2 = {
+        "type": "object",
+        "allOf": [
+            {"properties": {"field_B": {"type": "integer"}}}
+        ],
+        "properties": {
+            "field_A": {"type": "integer"}
+        }
+    }
+    obj = JSONSchemaValidator()
+    obj.validate(v1, 'first')
+    with pytest.raises(JSONSchemaCompatibilityError) as excinfo:
+        obj.validate(v2, 'second')
+    assert str(excinfo.value).startswith('/field_B ')
+
+
+def test_recursive_ref_pass():
+    """Test that a self-referencing definition passes."""
+    v1 = {
+        "definitions": {
+            "node": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "children": {
+                        "type": "array",
+                        "items": {"$ref": "#/definitions/node"}
+                    }
+                }
+            }
+        },
+        "type": "object",
+        "properties": {
+            "tree": {"$ref": "#/definitions/node"}
+        }
+    }
+    obj = JSONSchemaValidator()
+    obj.validate(v1, 'first')
+    fields = obj.fields_types_dict
+    assert fields[('tree', 'children', 'items')].field_type == 'object'
+    assert ('tree', 'children', 'items', 'name') not in fields
+
+
+def test_recursive_ref_conflict():
+    """Test that a conflict with a recursive field fails."""
+    v1 = {
+        "type": "object",
+        "properties": {
+            "children": {
+                "type": "array",
+                "items": {"$ref": "#"}
+            }
+        }
+    }
+    v2 = {
+        "type": "object",
+        "properties": {
+            "children": {
+                "type": "array",
+                "items": {"type": "string"}
+            }
+        }
+    }
+    obj = JSONSchemaValidator()
+    obj.validate(v1, 'first')
+    with pytest.raises(JSONSchemaCompatibilityError):
+        obj.validate(v2, 'second')
+
+
+def test_ref_cycle():
+    """Test that references pointing at each other raise
+    RefResolutionError."""
+    v1 = {
+        "definitions": {
+            "a": {"$ref": "#/definitions/b"},
+            "b": {"$ref": "#/definitions/a"}
+        },
+        "type": "object",
+        "properties": {
+            "field_A": {"$ref": "#/definitions/a"}
+        }
+    }
+    obj = JSONSchemaValidator()
+    with pytest.raises(jsonschema.exceptions.RefResolutionError):
+        obj.validate(v1, 'first')
+
+
+def test_ref_resolved_once():
+    """Test that a reference used in many places is resolved once."""
+    resolved = []
+
+    class CountingResolver(jsonschema.RefResolver):
+
+        def resolve(self, ref):
+            resolved.append(ref)
+            return super(CountingResolver, self).resolve(ref)
+
+    v1 = {
+        "definitions": {
+            "address": {
+                "type": "object",
+                "properties": {
+                    "street_address": {"type": "string"}
+                }
+            }
+        },
+        "type": "object",
+        "properties": {
+            "billing_address": {"$ref": "#/definitions/address"},
+            "shipping_address": {"$ref": "#/definitions/address"}
+        }
+    }
+    obj = JSONSchemaValidator(resolver_factory=CountingResolver)
+    obj.validate(v1, 'first')
+    assert resolved == ['#/definitions/address']
+    assert ('shipping_address', 'street_address') in obj.fields_types_dict
+
+
+def test_untyped_fields_result(caplog):
+    """Test that untyped fields are reported once per schema."""
+    v1 = {
+        "type": "object",
+        "properties": {
+            "credit_card": {"type": "number"}
+        },
+        "dependencies": {
+            "billing_address": ["credit_card"],
+            "shipping_address": ["credit_card"]
+        }
+    }
+    v2 = {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string"}
+        }
+    }
+    v3 = {
+        "type": "object",
+        "dependencies": {
+            "billing_address": ["name"]
+        }
+    }
+    obj = JSONSchemaValidator()
+    with caplog.at_level(logging.WARNING):
+        result = obj.validate(v1, 'first')
+    assert result.uri == 'first'
+    assert sorted(result.untyped_pointers) == [
+        '/billing_address', '/shipping_address'
+    ]
+    assert len(caplog.records) == 1
+
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        result = obj.validate(v2, 'second')
+    assert result.untyped_fields == ()
+    assert not caplog.records
+
+    result = obj.validate(v3, 'third')
+    assert result.untyped_pointers == ['/billing_address']
+
+
+def test_validate_many():
+    """Test that schemas are validated lazily one after another."""
+    consumed = []
+
+    def schemas():
+        for index, field_type in enumerate(['string', 'string', 'integer']):
+            consumed.append(index)
+            yield {
+                "type": "object",
+                "properties": {
+                    "field_A": {"type": field_type}
+                }
+            }, 'schema{0}'.format(index)
+
+    obj = JSONSchemaValidator()
+    results = obj.validate_many(schemas())
+    assert consumed == []
+    assert next(results).uri == 'schema0'
+    assert consumed == [0]
+    assert next(results).uri == 'schema1'
+    with pytest.raises(JSONSchemaCompatibilityError):
+        next(results)
+
+
+def test_validate_many_shares_resolver_store():
+    """Test that remote documents are retrieved once for a base URI."""
+    retrieved = []
+
+    class CountingResolver(jsonschema.RefResolver):
+
+        def resolve_remote(self, uri):
+            retrieved.append(uri)
+            return super(CountingResolver, self).resolve_remote(uri)
+
+    base_uri = 'file://' + os.path.join(
+        os.path.dirname(os.path.realpath(__file__)), 'test_outside', ''
+    )
+    schemas = [
+        ({
+            "type": "object",
+            "definitions": {
+                "name": {"type": "string"}
+            },
+            "properties": {
+                "name": {"$ref": "#/definitions/name"},
+                "address": {
+                    "$ref": "test_outside.json#/definitions/address"
+                }
+            }
+        }, base_uri + 'v{0}.json'.format(version))
+        for version in range(3)
+    ]
+    obj = JSONSchemaValidator(resolver_factory=CountingResolver)
+    results = list(obj.validate_many(iter(schemas)))
+    assert [result.uri for result in results] == [
+        uri for _, uri in schemas
+    ]
+    assert len(retrieved) == 1
+    assert obj.fields_types_dict[('name',)].field_type == 'string'
+
+
+def _parallel_schemas():
+    """Yield schemas for the parallel validation tests."""
+    yield {
+        "type": "object",
+        "properties": {
+            "field_A": {"type": "string"},
+            "field_B": {"type": "object"}
+        }
+    }, 'first'
+    yield {
+        "type": "object",
+        "properties": {
+            "field_C": {"type": "string", "enum": ["Text"]}
+        }
+    }, 'second'
+    yield {
+        "type": "object",
+        "properties": {
+            "field_A": {"type": "string"},
+            "field_B": {
+                "properties": {"field_D": {"type": "integer"}}
+            },
+            "field_C": {"type": "integer", "enum": ["Text"]}
+        }
+    }, 'third'
+    yield {
+        "type": "object",
+        "properties": {
+            "field_A": {"type": "integer"}
+        }
+    }, 'fourth'
+
+
+def test_extract_and_merge_fields():
+    """Test that extracted fields do not depend on the registry."""
+    obj = JSONSchemaValidator()
+    obj.validate({"type": "object"}, 'first')
+    contributions = obj.extract_fields(
+        {"type": "string", "properties": {"field_A": {"type": "string"}}},
+        'second'
+    )
+    assert obj.fields_types_dict.keys() == set([()])
+    with pytest.raises(JSONSchemaCompatibilityError) as excinfo:
+        obj.merge_fields(contributions, 'second')
+    assert excinfo.value.prev_schema == 'first'
+
+
+def test_validate_parallel_same_errors_as_sequential():
+    """Test that parallel validation reports the sequential error."""
+    sequential = JSONSchemaValidator()
+    results = sequential.validate_many(_parallel_schemas())
+    with pytest.raises(JSONSchemaCompatibilityError) as expected:
+        for result in results:
+            pass
+
+    parallel = JSONSchemaValidator()
+    results = parallel.validate_parallel(_parallel_schemas(), processes=2)
+    assert [next(results).uri for _ in range(2)] == ['first', 'second']
+    with pytest.raises(JSONSchemaCompatibilityError) as excinfo:
+        next(results)
+
+    assert str(excinfo.value) == str(expected.value)
+    assert excinfo.value.schema == expected.value.schema == 'third'
+    assert parallel.fields_types_dict == sequential.fields_types_dict
+
+
+def test_collect_conflicts():
+    """Test that all conflicts of a schema are collected."""
+    obj = JSONSchemaValidator(collect_conflicts=True)
+    obj.validate({
+        "type": "object",
+        "properties": {
+            "field_A": {"type": "string"},
+            "field_B": {"type": "integer"}
+        }
+    }, 'first')
+    result = obj.validate({
+        "type": "object",
+        "properties": {
+            "field_A": {"type": "integer"},
+            "field_B": {"properties": {"field_C": {"type": "string"}}},
+            "field_D": {"type": "string", "enum": [1, 2]},
+            "field_E": {"enum": [1, "a"]}
+        }
+    }, 'second')
+
+    assert [(c.kind, c.pointer) for c in result.conflicts] == [
+        ('type', '/field_A'),
+        ('properties', '/field_B'),
+        ('enum', '/field_D'),
+        ('enum_values', '/field_E'),
+    ]
+    conflict = result.conflicts[0]
+    assert conflict.expected_type == 'string'
+    assert conflict.found_type == 'integer'
+    assert (conflict.uri, conflict.previous_uri) == ('second', 'first')
+    # Conflicting fields keep the type registered before.
+    assert obj.fields_types_dict[('field_A',)].field_type == 'string'
+    assert obj.fields_types_dict[('field_B',)].field_type == 'integer'
+    assert obj.fields_types_dict[('field_B', 'field_C')].field_type == \
+        'string'
+
+
+def test_collected_conflict_message():
+    """Test that a collected conflict has the message of the error."""
+    schemas = [
+        ({"type": "object", "properties": {"A": {"type": "string"}}}, 'a'),
+        ({"type": "array", "properties": {"A": {"type": "number"}}}, 'b'),
+    ]
+    obj = JSONSchemaValidator()
+    with pytest.raises(JSONSchemaCompatibilityError) as excinfo:
+        list(obj.validate_many(schemas))
+
+    obj = JSONSchemaValidator(collect_conflicts=True)
+    results = list(obj.validate_many(schemas))
+    assert [c.kind for c in results[1].conflicts] == ['type', 'type']
+    assert results[1].conflicts[0].message == str(excinfo.value)
+
+    result = JSONSchemaValidator(collect_conflicts=True).validate(
+        {"type": "array"}, 'c'
+    )
+    assert result.conflicts[-1].to_dict() == {
+        'kind': 'root',
+        'pointer': '/',
+        'expected_type': 'object',
+        'found_type': 'array',
+        'uri': 'c',
+        'previous_uri': None,
+    }
+
+
+def _record(group_type='string'):
+    """Return a schema with groups of string fields."""
+    return {
+        "type": "object",
+        "definitions": {"name": {"type": "string"}},
+        "properties": dict(
+            ("group_{0}".format(group), {
+                "type": "object",
+                "properties": dict(
+                    ("field_{0}".format(field), {"type": group_type})
+                    for field in range(20)
+                ),
+            })
+            for group in range(20)
+        ),
+    }
+
+
+def test_revalidate():
+    """Test that only the changed subschemas of a version are walked."""
+    stats = Stats()
+    obj = JSONSchemaValidator(stats=stats)
+    schema = _record()
+    obj.revalidate(schema, 'record')
+    assert stats.nodes == 421
+
+    schema = _record()
+    group = schema['properties']['group_3']['properties']
+    group['field_0'] = {"type": "string", "description": "Changed."}
+    group['field_20'] = {"$ref": "#/definitions/name"}
+    group['field_21'] = {"properties": {"nested": {"type": "integer"}}}
+    result = obj.revalidate(schema, 'record')
+    assert stats.nodes == 421 + 4
+    assert result.conflicts == ()
+    assert obj.fields_types_dict[('group_3', 'field_21', 'nested')] == \
+        FieldToAdd('record', ('group_3', 'field_21', 'nested'), 'integer')
+
+    group['field_1'] = {"type": "integer"}
+    with pytest.raises(JSONSchemaCompatibilityError):
+        obj.revalidate(schema, 'record')
+    # The failed version is not kept, the next one is walked entirely.
+    del group['field_1']
+    stats.nodes = 0
+    obj.revalidate(schema, 'record')
+    assert stats.nodes == 423
+
+
+def test_revalidate_whole_schema():
+    """Test the changes making the whole version be walked again."""
+    stats = Stats()
+    obj = JSONSchemaValidator(stats=stats)
+    schema = _record()
+    obj.revalidate(schema, 'record')
+
+    # A change of the root besides its properties.
+    schema['definitions']['name']['type'] = 'integer'
+    stats.nodes = 0
+    obj.revalidate(schema, 'record')
+    assert stats.nodes == 421
+
+    # A reference into a changed subschema.
+    schema['properties']['copy'] = {"$ref": "#/properties/group_0"}
+    obj.revalidate(schema, 'record')
+    schema['properties']['group_0']['properties']['field_0'] = {}
+    stats.nodes = 0
+    obj.revalidate(schema, 'record')
+    assert stats.nodes == 442
+
+
+def test_remove():
+    """Test withdrawing the fields of a schema."""
+    obj = JSONSchemaValidator(track_references=True)
+    obj.validate({
+        "type": "object",
+        "properties": {"title": {"type": "string"}, "year": {}},
+        "dependencies": {"year": ["title"]},
+    }, 'v1')
+    obj.validate({
+        "type": "object",
+        "properties": {"title": {"type": "string"},
+                       "tags": {"type": "array"}},
+    }, 'v2')
+    obj.validate({
+        "type": "object",
+        "properties": {"title": {"type": "string"}},
+    }, 'v3')
+    assert obj.reference_count(('title', )) == 3
+    assert obj.reference_count(('tags', )) == 1
+
+    obj.remove('v3')
+    obj.remove('v2')
+    assert obj.fields_types_dict == {
+        (): FieldToAdd('v1', (), 'object'),
+        ('title', ): FieldToAdd('v1', ('title', ), 'string'),
+        ('year', ): FieldToAdd('v1', ('year', ), None),
+    }
+    assert obj.reference_count(('tags', )) == 0
+
+    obj.remove('v1')
+    assert obj.fields_types_dict == {}
+    # The fields can receive other types.
+    obj.validate({
+        "type": "object",
+        "properties": {"title": {"type": "integer"}},
+    }, 'v4')
+    with pytest.raises(KeyError):
+        obj.remove('v1')
+
+
+def test_remove_same_as_rebuild():
+    """Test that removing a schema registers the fields of the others."""
+    schemas = [
+        ('v1', {"type": "object", "properties": {
+            "a": {"type": "string"}, "b": {"type": "object"}}}),
+        ('v2', {"type": "object", "properties": {
+            "b": {"properties": {"c": {"type": "number"}}},
+            "d": {"type": "array", "items": {"type": "string"}}}}),
+        ('v3', {"type": "object", "properties": {
+            "d": {"items": {}}, "a": {}}}),
+    ]
+    for removed, _ in schemas:
+        obj = JSONSchemaValidator(track_references=True)
+        expected = JSONSchemaValidator()
+        for uri, schema in schemas:
+            obj.validate(schema, uri)
+            if uri != removed:
+                expected.validate(schema, uri)
+        obj.remove(removed)
+        assert {path: field.field_type
+                for path, field in obj.fields_types_dict.items()} == \
+            {path: field.field_type
+             for path, field in expected.fields_types_dict.items()}
+
+
+def test_remove_in_reverse_order():
+    """Test that removing the last schemas restores the previous registry."""
+    schemas = [
+        ({"type": "object", "properties": {
+            "group": {"type": "object", "properties": {
+                "a": {"type": "string"}}}}}, 'v1'),
+        ({"type": "object", "properties": {
+            "group": {"properties": {"b": {"type": "integer"}}}}}, 'v2'),
+        ({"type": "object", "properties": {
+            "group": {"properties": {"a": {"type": "string"}}}}}, 'v3'),
+    ]
+    obj = JSONSchemaValidator(track_references=True)
+    for schema, uri in schemas:
+        obj.validate(schema, uri)
+    assert obj.fields_types_dict[('group', )].schema_index == 'v3'
+
+    expected = JSONSchemaValidator()
+    for schema, uri in schemas[:2]:
+        expected.validate(schema, uri)
+    obj.remove('v3')
+    assert obj.fields_types_dict == expected.fields_types_dict
+    assert obj.fields_types_dict[('group', )].schema_index == 'v2'
+
+
+def test_remove_requires_tracking():
+    """Test that schemas are only removed with track_references."""
+    obj = JSONSchemaValidator()
+    obj.validate({"type": "object"}, 'v1')
+    with pytest.raises(ValueError):
+        obj.remove('v1')
+
+
+def test_failed_validation_rolled_back():
+    """Test that a failing schema leaves the registry unchanged."""
+    v1 = {
+        "type": "object",
+        "properties": {"title": {"type": "string"}},
+        "dependencies": {"title": ["year"]},
+    }
+    v2 = {
+        "type": "object",
+        "properties": {
+            "authors": {"type": "array"},
+            "year": {"type": "integer"},
+            "title": {"type": "integer"},
+        },
+    }
+    for obj in (JSONSchemaValidator(), JSONSchemaValidator(
+            plan_cache=PlanCache(), stats=Stats(), track_references=True)):
+        obj.validate(v1, 'v1')
+        expected = dict(obj.fields_types_dict)
+        with pytest.raises(JSONSchemaCompatibilityError):
+            obj.validate(v2, 'v2')
+        assert obj.fields_types_dict == expected
+        assert obj.uri is None
+
+        # The fields of the rejected schema can get other types.
+        obj.validate({
+            "type": "object",
+            "properties": {"authors": {"type": "string"}},
+        }, 'v3')
+    assert obj.reference_count(('authors', )) == 1
+    with pytest.raises(KeyError):
+        obj.remove('v2')
+
+
+def test_failed_merge_rolled_back():
+    """Test that failing to merge fields leaves the registry unchanged."""
+    obj = JSONSchemaValidator()
+    obj.validate({"type": "object"}, 'v1')
+    contributions = JSONSchemaValidator().extract_fields({
+        "type": "object",
+        "properties": {"title": {"type": "null"}, "year": {"type": "integer"}},
+    }, 'v2')
+    with pytest.raises(NotImplementedError):
+        obj.merge_fields(contributions, 'v2')
+    assert list(obj.fields_types_dict) == [()]
+
+
+def test_validate_many_resolves_each_schema():
+    """Test that schemas sharing a URI resolve their own references."""
+    def schema(field_type):
+        return {
+            "type": "object",
+            "definitions": {"x": {"type": field_type}},
+            "properties": {"a": {"$ref": "#/definitions/x"}},
+        }
+
+    obj = JSONSchemaValidator()
+    results = obj.validate_many([
+        (schema('string'), 'http://h/a.json'),
+        (schema('integer'), 'http://h/a.json'),
+    ])
+    next(results)
+    with pytest.raises(JSONSchemaCompatibilityError) as excinfo:
+        next(results)
+    assert '/a type mismatch' in str(excinfo.value)
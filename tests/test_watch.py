@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+#
+# This file is part of DoSchema.
+# Copyright (C) 2016 CERN.
+#
+# DoSchema is free software; you can redistribute it
+# and/or modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation; either version 2 of the
+# License, or (at your option) any later version.
+#
+# DoSchema is distributed in the hope that it will be
+# useful, but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with DoSchema; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA 02111-1307, USA.
+#
+# In applying this license, CERN does not
+# waive the privileges and immunities granted to it by virtue of its status
+# as an Intergovernmental Organization or submit itself to any jurisdiction.
+
+
+"""Watch mode tests."""
+
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from doschema.cli import main, watch_tree
+from doschema.resolver import path_uri
+from doschema.watch import InotifyObserver, PollingObserver, SchemaWatcher
+
+
+@pytest.fixture
+def tree(tmpdir):
+    """Write versions of a schema in a directory tree."""
+    directory = tmpdir.mkdir('schemas')
+    directory.mkdir('common').join('defs.json').write(json.dumps({
+        'type': 'object',
+        'definitions': {'title': {'type': 'string'}},
+    }))
+    directory.mkdir('v1').join('record.json').write(json.dumps({
+        'type': 'object',
+        'properties': {
+            'title': {'$ref': '../common/defs.json#/definitions/title'},
+        },
+    }))
+    directory.mkdir('v2').join('record.json').write(json.dumps({
+        'type': 'object',
+        'properties': {'year': {'type': 'integer'}},
+    }))
+    return directory
+
+
+class ScriptedObserver(object):
+    """Observer returning given changes."""
+
+    def __init__(self, changes):
+        """Constructor."""
+        self._changes = list(changes)
+        self.closed = False
+
+    def changes(self, timeout=None):
+        """Return the next changes."""
+        return self._changes.pop(0) if self._changes else set()
+
+    def close(self):
+        """Stop watching."""
+        self.closed = True
+
+
+def test_refresh(tree):
+    """Test that only changed and referencing schemas are walked again."""
+    watcher = SchemaWatcher(tree.strpath)
+    assert len(watcher) == 3
+    assert watcher.failures == {}
+
+    defs = tree.join('common', 'defs.json')
+    defs.write(json.dumps({
+        'type': 'object',
+        'definitions': {'title': {'type': 'integer'}},
+    }))
+    tree.join('v2', 'record.json').write(json.dumps({
+        'type': 'object',
+        'properties': {'title': {'type': 'string'}},
+    }))
+    walked = watcher.refresh([defs.strpath])
+    # The referenced document is read again, not taken from the store.
+    assert walked == [os.path.join('common', 'defs.json'),
+                      os.path.join('v1', 'record.json')]
+    assert watcher.validator.fields_types_dict[('title', )].field_type == \
+        'integer'
+
+    walked = watcher.refresh([tree.join('v2', 'record.json').strpath])
+    assert walked == [os.path.join('v2', 'record.json')]
+    assert list(watcher.failures) == [os.path.join('v2', 'record.json')]
+    assert watcher.messages()[0].startswith(
+        os.path.join('v2', 'record.json') + ': /title type mismatch'
+    )
+
+
+def test_refresh_keeps_registry(tree, monkeypatch):
+    """Test that only the schemas from the first changed one are merged."""
+    watcher = SchemaWatcher(tree.strpath)
+    validator = watcher.validator
+    record = tree.join('v2', 'record.json')
+    merged = []
+    merge_fields = validator.merge_fields
+
+    def merge(contributions, uri):
+        merged.append(uri)
+        return merge_fields(contributions, uri)
+
+    monkeypatch.setattr(validator, 'merge_fields', merge)
+    for field_type in ('string', 'integer'):
+        record.write(json.dumps({
+            'type': 'object',
+            'properties': {'year': {'type': field_type}},
+        }))
+        watcher.refresh([record.strpath])
+    assert watcher.validator is validator
+    assert merged == [path_uri(record.strpath)] * 2
+    assert validator.fields_types_dict == \
+        SchemaWatcher(tree.strpath).validator.fields_types_dict
+
+
+def test_refresh_excluded(tree):
+    """Test that excluded files are not schemas but are still watched."""
+    watcher = SchemaWatcher(tree.strpath, exclude=['common/*'])
+    assert len(watcher) == 2
+    defs = tree.join('common', 'defs.json')
+    defs.write(json.dumps({'definitions': {'title': {'type': 'integer'}}}))
+    assert watcher.refresh([defs.strpath]) == \
+        [os.path.join('v1', 'record.json')]
+    assert watcher.failures == {}
+    assert watcher.validator.fields_types_dict[('title', )].field_type == \
+        'integer'
+
+
+def test_refresh_removed(tree):
+    """Test that schemas referencing a removed file are walked again."""
+    watcher = SchemaWatcher(tree.strpath)
+    tree.join('common').remove()
+    walked = watcher.refresh([tree.join('common').strpath])
+    assert walked == [os.path.join('v1', 'record.json')]
+    assert len(watcher) == 2
+    assert list(watcher.failures) == [os.path.join('v1', 'record.json')]
+
+    tree.mkdir('common').join('defs.json').write(json.dumps({
+        'type': 'object',
+        'definitions': {'title': {'type': 'string'}},
+    }))
+    watcher.refresh([tree.join('common', 'defs.json').strpath])
+    assert watcher.failures == {}
+
+
+def test_watch(tree):
+    """Test that the tree is checked again on every change."""
+    filename = tree.join('v2', 'record.json').strpath
+    observer = ScriptedObserver([set([filename]), set([filename])])
+    watcher = SchemaWatcher(tree.strpath)
+    results = list(watcher.watch(observer))
+    assert [walked for walked, _ in results] == \
+        [[os.path.join('v2', 'record.json')]] * 2
+    assert observer.closed
+
+
+def _observe(observer, tree):
+    """Write a file while the observer waits for changes."""
+    filename = tree.join('v3', 'record.json')
+
+    def write():
+        time.sleep(0.2)
+        tree.mkdir('v3')
+        filename.write('{}')
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    try:
+        changed = observer.changes(timeout=5)
+    finally:
+        thread.join()
+        observer.close()
+    assert changed == set([filename.strpath])
+
+
+def test_polling_observer(tree):
+    """Test detecting changes by polling the files."""
+    observer = PollingObserver(tree.strpath, interval=0.05)
+    assert observer.changes(timeout=0.1) == set()
+    _observe(observer, tree)
+
+
+def test_inotify_observer(tree):
+    """Test detecting changes with inotify."""
+    try:
+        observer = InotifyObserver(tree.strpath)
+    except OSError:
+        pytest.skip('inotify is not available')
+    assert observer.changes(timeout=0.1) == set()
+    _observe(observer, tree)
+
+
+def test_watch_tree(tree, capsys):
+    """Test the watch mode of the command."""
+    assert watch_tree(tree.strpath, timeout=0.1) == 0
+    assert '3 schemas checked, 0 failed.' in capsys.readouterr()[0]
+
+
+def test_main_watch_exit_status(tree, capsys, monkeypatch):
+    """Test that the watch mode exits with status 1 if schemas failed."""
+    monkeypatch.setattr('doschema.watch.observe',
+                        lambda directory: ScriptedObserver([]))
+    assert main([tree.strpath, '--watch']) == 0
+    tree.join('v2', 'record.json').write('{')
+    assert main([tree.strpath, '--watch']) == 1
+    assert '3 schemas checked, 1 failed.' in capsys.readouterr()[0]
+
+    # The number of failures does not wrap around as an exit status.
+    monkeypatch.setattr('doschema.cli.watch_tree', lambda *args, **kwargs: 256)
+    assert main([tree.strpath, '--watch']) == 1